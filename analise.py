@@ -0,0 +1,301 @@
+import numpy as np
+from armazenamento import TURNOS
+
+PERCENTIS = (50, 90, 99)
+LIMITE_PARETO = 80.0
+SEGUNDOS_DIA = 86400
+# início de cada turno em segundos do dia, na ordem de TURNOS
+INICIOS_TURNOS = np.array([sum(int(p) * f for p, f in zip(de.split(':'), (3600, 60, 1))) for _, de, _ in TURNOS],
+                          dtype=np.float64)
+NOME_LINHA = 'Linha (qualquer processo)'
+
+
+class ColunasHistorico:
+    # histórico em colunas NumPy: categorias viram códigos inteiros e os tempos, float64
+    def __init__(self, inicio, duracao, processos, motivos, nomes_processos, nomes_motivos):
+        self.inicio = inicio            # segundos desde a época (início de cada parada)
+        self.duracao = duracao          # minutos
+        self.fim = inicio + duracao * 60.0
+        self.processos = processos      # códigos em nomes_processos
+        self.motivos = motivos          # códigos em nomes_motivos
+        self.nomes_processos = nomes_processos
+        self.nomes_motivos = nomes_motivos
+
+    def __len__(self):
+        return len(self.duracao)
+
+    def grupo(self, chave):
+        if chave == 'processo':
+            return self.processos, self.nomes_processos
+        return self.motivos, self.nomes_motivos
+
+
+def _codificar(valor, dicionario, nomes):
+    codigo = dicionario.get(valor)
+    if codigo is None:
+        codigo = dicionario[valor] = len(nomes)
+        nomes.append(valor)
+    return codigo
+
+
+def _converter_instantes(textos):
+    # o NumPy converte strings ISO em C; só cai para a conversão item a item se houver lixo
+    try:
+        instantes = np.array(textos, dtype='datetime64[s]')
+    except ValueError:
+        instantes = np.empty(len(textos), dtype='datetime64[s]')
+        for i, texto in enumerate(textos):
+            try:
+                instantes[i] = np.datetime64(texto, 's')
+            except ValueError:
+                instantes[i] = np.datetime64('NaT')
+    return instantes
+
+
+def carregar_colunas(registros):
+    # mesmo critério dos gráficos: só entram paradas com processo, motivo e duração
+    textos = []
+    duracoes = []
+    processos = []
+    motivos = []
+    dic_processos, nomes_processos = {}, []
+    dic_motivos, nomes_motivos = {}, []
+    for registro in registros:
+        processo = registro.get('processo')
+        motivo = registro.get('motivo')
+        duracao = registro.get('duracao')
+        if not (processo and motivo and duracao):
+            continue
+        textos.append(f"{registro.get('data')}T{registro.get('inicio')}")
+        duracoes.append(duracao)
+        processos.append(_codificar(processo, dic_processos, nomes_processos))
+        motivos.append(_codificar(motivo, dic_motivos, nomes_motivos))
+
+    instantes = _converter_instantes(textos)
+    validos = ~np.isnat(instantes)
+    inicio = instantes[validos].astype('int64').astype(np.float64)
+    return ColunasHistorico(
+        inicio,
+        np.asarray(duracoes, dtype=np.float64)[validos],
+        np.asarray(processos, dtype=np.int32)[validos],
+        np.asarray(motivos, dtype=np.int32)[validos],
+        nomes_processos,
+        nomes_motivos
+    )
+
+
+def percentis_por_grupo(codigos, valores, n_grupos, percentis=PERCENTIS):
+    # ordena por (grupo, valor) uma única vez e interpola os percentis de todos os grupos juntos
+    ordem = np.lexsort((valores, codigos))
+    ordenados = valores[ordem]
+    contagens = np.bincount(codigos, minlength=n_grupos)
+    inicios = np.concatenate(([0], np.cumsum(contagens)[:-1]))
+    resultado = np.full((n_grupos, len(percentis)), np.nan)
+    com_dados = contagens > 0
+    for j, p in enumerate(percentis):
+        posicao = inicios[com_dados] + (contagens[com_dados] - 1) * (p / 100.0)
+        baixo = np.floor(posicao).astype(np.int64)
+        alto = np.ceil(posicao).astype(np.int64)
+        fracao = posicao - baixo
+        resultado[com_dados, j] = ordenados[baixo] + (ordenados[alto] - ordenados[baixo]) * fracao
+    return resultado
+
+
+def calcular_indicadores(colunas, chave='processo'):
+    # MTTR, MTBF, frequência, percentis de duração e classificação de Pareto por grupo
+    codigos, nomes = colunas.grupo(chave)
+    n_grupos = len(nomes)
+    if len(colunas) == 0 or n_grupos == 0:
+        return []
+
+    contagem = np.bincount(codigos, minlength=n_grupos)
+    tempo_total = np.bincount(codigos, weights=colunas.duracao, minlength=n_grupos)
+    mttr = tempo_total / np.maximum(contagem, 1)
+
+    # período observado: do primeiro início ao último fim do histórico inteiro
+    periodo_min = max((colunas.fim.max() - colunas.inicio.min()) / 60.0, 1.0)
+    dias = max(periodo_min / 1440.0, 1.0)
+    frequencia = contagem / dias
+    # MTBF = tempo operando entre paradas / número de paradas
+    mtbf_h = np.maximum(periodo_min - tempo_total, 0.0) / np.maximum(contagem, 1) / 60.0
+
+    percentis = percentis_por_grupo(codigos, colunas.duracao, n_grupos)
+
+    total_geral = tempo_total.sum()
+    participacao = tempo_total / total_geral * 100.0 if total_geral > 0 else np.zeros(n_grupos)
+    ordem = np.argsort(-tempo_total, kind='stable')
+    acumulado = np.empty(n_grupos)
+    acumulado[ordem] = np.cumsum(participacao[ordem])
+    # classe A do Pareto: grupos que, somados do maior para o menor, formam os primeiros 80%
+    pareto = (acumulado - participacao) < LIMITE_PARETO
+
+    return [
+        {
+            'nome': nomes[i],
+            'paradas': int(contagem[i]),
+            'tempo_total': float(tempo_total[i]),
+            'mttr': float(mttr[i]),
+            'mtbf_h': float(mtbf_h[i]),
+            'frequencia_dia': float(frequencia[i]),
+            'p50': float(percentis[i, 0]),
+            'p90': float(percentis[i, 1]),
+            'p99': float(percentis[i, 2]),
+            'participacao': float(participacao[i]),
+            'acumulado': float(acumulado[i]),
+            'pareto': bool(pareto[i])
+        }
+        for i in ordem
+    ]
+
+
+def formatar_indicadores(indicadores, titulo):
+    linhas = [titulo, '-' * len(titulo)]
+    if not indicadores:
+        linhas.append('Sem dados.')
+        return '\n'.join(linhas)
+    for item in indicadores:
+        marca = '★' if item['pareto'] else ' '
+        linhas.append(
+            f"{marca} {item['nome']}\n"
+            f"    Paradas: {item['paradas']}  ({item['frequencia_dia']:.2f}/dia)\n"
+            f"    Tempo: {item['tempo_total']:.1f} min  ({item['participacao']:.1f}%, acum. {item['acumulado']:.1f}%)\n"
+            f"    MTTR: {item['mttr']:.1f} min  MTBF: {item['mtbf_h']:.1f} h\n"
+            f"    P50/P90/P99: {item['p50']:.1f} / {item['p90']:.1f} / {item['p99']:.1f} min"
+        )
+    linhas.append(f"★ = classe A do Pareto (primeiros {LIMITE_PARETO:.0f}% do tempo parado)")
+    return '\n'.join(linhas)
+
+
+def uniao_intervalos(inicio, fim, grupos):
+    # varredura ordenada: por grupo, junta os intervalos que se sobrepõem ou se tocam.
+    # cada grupo é deslocado para uma faixa própria do eixo do tempo, então o máximo acumulado
+    # dos fins recomeça sozinho na troca de grupo e tudo sai de uma ordenação e de um accumulate
+    if len(inicio) == 0:
+        return np.empty(0), np.empty(0), np.empty(0, dtype=np.int64)
+    grupos = np.asarray(grupos, dtype=np.int64)
+    deslocamento = float(max(np.max(fim) - np.min(inicio), 1.0)) * 2 + 1
+    base = float(np.min(inicio))
+    ordem = np.lexsort((inicio, grupos))
+    a = (inicio[ordem] - base) + grupos[ordem] * deslocamento
+    b = (fim[ordem] - base) + grupos[ordem] * deslocamento
+    maior_fim = np.maximum.accumulate(b)
+    # começa um novo trecho onde o início passa do maior fim visto até a linha anterior
+    novos = np.flatnonzero(np.concatenate(([True], a[1:] > maior_fim[:-1])))
+    grupo = grupos[ordem][novos]
+    offset = grupo * deslocamento - base
+    return a[novos] - offset, maior_fim[np.append(novos[1:] - 1, len(b) - 1)] - offset, grupo
+
+
+def _turno_absoluto(instantes):
+    # número sequencial do turno que contém cada instante (dia * turnos + posição no dia);
+    # antes do primeiro turno do dia ainda é o último turno do dia anterior
+    dia = np.floor(instantes / SEGUNDOS_DIA)
+    posicao = np.searchsorted(INICIOS_TURNOS, instantes - dia * SEGUNDOS_DIA, side='right') - 1
+    return (dia * len(INICIOS_TURNOS) + posicao).astype(np.int64)
+
+
+def _inicio_turno(absoluto):
+    dia, posicao = np.divmod(absoluto, len(INICIOS_TURNOS))
+    return dia * SEGUNDOS_DIA + INICIOS_TURNOS[posicao]
+
+
+def _parado_por_turno(inicio, fim, grupos, n_grupos, dias_producao):
+    # corta cada trecho parado nas viradas de turno e soma os pedaços por (grupo, turno);
+    # pedaços de turnos fora dos dias de produção são somados à parte
+    n_turnos = len(INICIOS_TURNOS)
+    primeiro = _turno_absoluto(inicio)
+    ultimo = np.maximum(_turno_absoluto(fim), primeiro)
+    pedacos = ultimo - primeiro + 1
+    trecho = np.repeat(np.arange(len(inicio)), pedacos)
+    absoluto = primeiro[trecho] + (np.arange(len(trecho)) - np.repeat(np.cumsum(pedacos) - pedacos, pedacos))
+    duracao = (np.minimum(fim[trecho], _inicio_turno(absoluto + 1))
+               - np.maximum(inicio[trecho], _inicio_turno(absoluto))) / 60.0
+    duracao = np.maximum(duracao, 0.0)
+    # dia da semana do dia em que o turno começa (01/01/1970 foi uma quinta-feira)
+    dia_semana = (absoluto // n_turnos + 3) % 7
+    planejado = np.isin(dia_semana, dias_producao)
+    indice = grupos[trecho] * n_turnos + absoluto % n_turnos
+    parado = np.bincount(indice[planejado], weights=duracao[planejado], minlength=n_grupos * n_turnos)
+    fora = np.bincount(grupos[trecho][~planejado], weights=duracao[~planejado], minlength=n_grupos)
+    return parado.reshape(n_grupos, n_turnos), fora
+
+
+def calcular_disponibilidade(colunas, planejado_turno, dias_producao=range(7), data_inicial=None, data_final=None):
+    # tempo realmente parado por processo e turno (paradas simultâneas do mesmo processo contam
+    # uma vez só) contra o tempo planejado; a linha inteira conta como parada enquanto qualquer
+    # processo estiver parado. planejado_turno: {nome do turno: minutos planejados por dia}
+    if len(colunas) == 0:
+        return []
+    dias_producao = np.array(sorted(set(dias_producao)), dtype=np.int64)
+    n_processos = len(colunas.nomes_processos)
+    n_turnos = len(TURNOS)
+
+    # período: os dias do filtro ou, sem filtro, do primeiro ao último dia com parada
+    primeiro_dia = (np.datetime64(data_inicial, 'D').astype(np.int64) if data_inicial is not None
+                    else int(colunas.inicio.min() // SEGUNDOS_DIA))
+    ultimo_dia = (np.datetime64(data_final, 'D').astype(np.int64) if data_final is not None
+                  else int(colunas.inicio.max() // SEGUNDOS_DIA))
+    dias = np.arange(primeiro_dia, ultimo_dia + 1)
+    dias_planejados = int(np.isin((dias + 3) % 7, dias_producao).sum())
+    minutos_turno = np.array([float(planejado_turno.get(nome, 0)) for nome, _, _ in TURNOS])
+    planejado = minutos_turno * dias_planejados
+
+    # processos nos grupos 0..n-1 e a linha inteira no grupo n
+    inicio = np.concatenate((colunas.inicio, colunas.inicio))
+    fim = np.concatenate((colunas.fim, colunas.fim))
+    grupos = np.concatenate((colunas.processos, np.full(len(colunas), n_processos)))
+    trechos_inicio, trechos_fim, trechos_grupo = uniao_intervalos(inicio, fim, grupos)
+    parado, fora = _parado_por_turno(trechos_inicio, trechos_fim, trechos_grupo, n_processos + 1, dias_producao)
+    # o 'parado' exibido é o mesmo da conta da disponibilidade: só turnos dos dias de produção,
+    # limitado ao planejado de cada turno; o que caiu fora dos dias de produção vai para 'fora_do_planejado'
+    parado = np.minimum(parado, planejado)
+    bruto = np.bincount(colunas.processos, weights=colunas.duracao, minlength=n_processos)
+    bruto = np.append(bruto, bruto.sum())
+    real = np.bincount(trechos_grupo, weights=(trechos_fim - trechos_inicio) / 60.0, minlength=n_processos + 1)
+
+    def percentual(parado_min, planejado_min):
+        return float((planejado_min - parado_min) / planejado_min * 100.0) if planejado_min > 0 else None
+
+    resultado = []
+    for grupo in list(np.argsort(-parado.sum(axis=1)[:n_processos], kind='stable')) + [n_processos]:
+        resultado.append({
+            'nome': colunas.nomes_processos[grupo] if grupo < n_processos else NOME_LINHA,
+            'parado_somado': float(bruto[grupo]),
+            'parado': float(parado[grupo].sum()),
+            'sobreposto': float(max(bruto[grupo] - real[grupo], 0.0)),
+            'fora_do_planejado': float(fora[grupo]),
+            'planejado': float(planejado.sum()),
+            'disponibilidade': percentual(parado[grupo].sum(), planejado.sum()),
+            'turnos': [
+                {
+                    'turno': nome,
+                    'parado': float(parado[grupo, i]),
+                    'planejado': float(planejado[i]),
+                    'disponibilidade': percentual(parado[grupo, i], planejado[i])
+                }
+                for i, (nome, _, _) in enumerate(TURNOS)
+            ]
+        })
+    return resultado
+
+
+def formatar_disponibilidade(disponibilidade, titulo):
+    linhas = [titulo, '-' * len(titulo)]
+    if not disponibilidade:
+        linhas.append('Sem dados.')
+        return '\n'.join(linhas)
+
+    def porcentagem(valor):
+        return '  -  ' if valor is None else f"{valor:.1f}%"
+
+    for item in disponibilidade:
+        linhas.append(
+            f"{item['nome']}: {porcentagem(item['disponibilidade'])}\n"
+            f"    Parado: {item['parado']:.1f} min de {item['planejado']:.0f} planejados"
+            f"  (soma das paradas {item['parado_somado']:.1f}, sobreposição {item['sobreposto']:.1f})"
+        )
+        if item['fora_do_planejado'] > 0:
+            linhas[-1] += f"\n    Fora dos dias de produção: {item['fora_do_planejado']:.1f} min"
+        linhas.append('    ' + '  '.join(f"{turno['turno']} {porcentagem(turno['disponibilidade'])}"
+                                          for turno in item['turnos']))
+    return '\n'.join(linhas)
@@ -0,0 +1,1047 @@
+import csv
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from desempenho import medir
+
+ARQUIVO_CONFIG = 'config_app.json'
+DIRETORIO_PADRAO = os.path.expanduser('~/Documents/ControleParadas')
+ARQUIVO_JOURNAL = 'paradas.jsonl'
+ARQUIVO_EXCEL = 'paradas.xlsx'
+ARQUIVO_ROLLUPS = 'paradas_rollups.json'
+ARQUIVO_CSV_LEGADO = 'paradas.csv'
+ARQUIVO_INDICE = 'paradas_indice.bin'
+# bytes do começo do journal e do trecho antes do offset que identificam o arquivo processado
+BYTES_IDENTIDADE = 4096
+
+# esquema fixo de cada linha do journal (um objeto JSON por parada finalizada)
+CAMPOS_HISTORICO = ('id', 'data', 'processo', 'funcionario', 'motivo', 'inicio', 'fim', 'duracao')
+# turnos pelo horário de início da parada; o 3º atravessa a meia-noite
+TURNOS = (
+    ('1º turno', '06:00:00', '14:00:00'),
+    ('2º turno', '14:00:00', '22:00:00'),
+    ('3º turno', '22:00:00', '06:00:00'),
+)
+CABECALHO_EXCEL = ['Data', 'Processo', 'Funcionário', 'Motivo', 'Início', 'Fim', 'Duração (min)']
+LARGURAS_EXCEL = {'A': 15, 'B': 15, 'C': 20, 'D': 30, 'E': 15, 'F': 15, 'G': 15}
+# no modo 'xlsx' o id da parada vai numa coluna oculta depois das visíveis: é o que permite
+# saber, depois de uma queda, se um fim pendente já chegou à planilha
+COLUNA_ID_EXCEL = 'H'
+
+
+def registro_de_parada(parada):
+    # converte a parada finalizada (com datetimes) para o registro do journal
+    return {
+        'id': parada.get('id') or uuid.uuid4().hex,
+        'data': parada['inicio'].strftime('%Y-%m-%d'),
+        'processo': parada['processo'],
+        'funcionario': parada['funcionario'],
+        'motivo': parada['motivo'],
+        'inicio': parada['inicio'].strftime('%H:%M:%S'),
+        'fim': parada['fim'].strftime('%H:%M:%S'),
+        'duracao': round(float(parada['duracao']), 4)
+    }
+
+
+def parada_serializada(parada):
+    # parada em andamento no formato do log das ativas (início em texto)
+    serializada = parada.copy()
+    serializada['inicio'] = serializada['inicio'].strftime('%Y-%m-%d %H:%M:%S')
+    return serializada
+
+
+def turno_de(inicio):
+    if not inicio:
+        return ''
+    for nome, de, ate in TURNOS:
+        if (de <= inicio < ate) if de < ate else (inicio >= de or inicio < ate):
+            return nome
+    return ''
+
+
+def linha_excel(registro):
+    # mesma ordem das colunas da aba 'Paradas'
+    return (
+        registro['data'], registro['processo'], registro['funcionario'], registro['motivo'],
+        registro['inicio'], registro['fim'], registro['duracao']
+    )
+
+
+def _texto(valor, formato):
+    if isinstance(valor, datetime):
+        return valor.strftime(formato)
+    if hasattr(valor, 'strftime'):  # date/time vindos de células formatadas no Excel
+        return valor.strftime(formato)
+    return '' if valor is None else str(valor)
+
+
+def registro_de_linha_excel(row, numero_linha=None):
+    # aceita linhas da aba 'Paradas' (values_only); retorna None para linhas inválidas.
+    # linhas gravadas pelo modo 'xlsx' trazem o id na coluna oculta; nas demais, com o número
+    # da linha o id é determinístico: importar a mesma planilha em duas
+    # estações gera os mesmos ids, e a consolidação descarta a duplicata
+    if not row or len(row) < 7 or row[0] in (None, 'TOTAL') or not row[1]:
+        return None
+    try:
+        duracao = float(row[6] or 0)
+    except (TypeError, ValueError):
+        return None
+    if len(row) > 7 and row[7]:
+        id_registro = str(row[7])
+    elif numero_linha is None:
+        id_registro = uuid.uuid4().hex
+    else:
+        id_registro = uuid.uuid5(uuid.NAMESPACE_OID, f'{numero_linha}|{row!r}').hex
+    return {
+        'id': id_registro,
+        'data': _texto(row[0], '%Y-%m-%d'),
+        'processo': str(row[1]),
+        'funcionario': '' if row[2] is None else str(row[2]),
+        'motivo': '' if row[3] is None else str(row[3]),
+        'inicio': _texto(row[4], '%H:%M:%S'),
+        'fim': _texto(row[5], '%H:%M:%S'),
+        'duracao': duracao
+    }
+
+
+def registro_de_linha_csv(row, numero_linha=None):
+    # linha do paradas.csv da ferramenta antiga: processo, funcionário, motivo,
+    # início e fim ('%Y-%m-%d %H:%M:%S') e duração em minutos; None se inválida
+    if not row or len(row) < 6 or not row[0]:
+        return None
+    try:
+        inicio = datetime.strptime(row[3].strip(), '%Y-%m-%d %H:%M:%S')
+        fim = datetime.strptime(row[4].strip(), '%Y-%m-%d %H:%M:%S')
+        duracao = float(row[5])
+    except (TypeError, ValueError):
+        return None
+    if len(row) > 7 and row[7]:
+        id_registro = str(row[7])
+    elif numero_linha is None:
+        id_registro = uuid.uuid4().hex
+    else:
+        id_registro = uuid.uuid5(uuid.NAMESPACE_OID, f'csv|{numero_linha}|{row!r}').hex
+    return {
+        'id': id_registro,
+        'data': inicio.strftime('%Y-%m-%d'),
+        'processo': row[0],
+        'funcionario': row[1],
+        'motivo': row[2],
+        'inicio': inicio.strftime('%H:%M:%S'),
+        'fim': fim.strftime('%H:%M:%S'),
+        'duracao': duracao
+    }
+
+
+def _serializar(registro):
+    linha = {campo: registro.get(campo) for campo in CAMPOS_HISTORICO}
+    return (json.dumps(linha, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+class JournalHistorico:
+    # histórico append-only: cada parada finalizada custa uma única escrita no fim do arquivo
+    def __init__(self, caminho):
+        self.caminho = caminho
+
+    def existe(self):
+        return os.path.exists(self.caminho)
+
+    def tamanho(self):
+        try:
+            return os.path.getsize(self.caminho)
+        except OSError:
+            return 0
+
+    def anexar(self, registro):
+        return self.anexar_varios([registro])
+
+    def anexar_varios(self, registros):
+        dados = b''.join(_serializar(r) for r in registros)
+        if not dados:
+            return self.tamanho()
+        with open(self.caminho, 'a+b') as f:
+            # se a última gravação foi interrompida no meio da linha, começa uma linha nova
+            f.seek(0, os.SEEK_END)
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    dados = b'\n' + dados
+            f.write(dados)
+            f.flush()
+            os.fsync(f.fileno())
+            return f.tell()
+
+    def iterar(self, offset=0):
+        for registro, _ in self.iterar_com_offset(offset):
+            yield registro
+
+    def iterar_com_offset(self, offset=0):
+        # percorre os registros a partir de um offset em bytes, ignorando linhas corrompidas;
+        # junto com cada registro devolve o offset logo após a sua linha
+        try:
+            with open(self.caminho, 'rb') as f:
+                f.seek(offset)
+                for linha in f:
+                    if not linha.endswith(b'\n'):
+                        break  # linha incompleta: gravação ainda em andamento ou interrompida
+                    offset += len(linha)
+                    try:
+                        yield json.loads(linha), offset
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            return
+
+    def identidade(self, ate):
+        # hash do começo do arquivo e do trecho que termina em `ate`: muda quando o journal é
+        # trocado por outro (reescrito, consolidado, restaurado), mesmo de tamanho igual ou maior
+        try:
+            with open(self.caminho, 'rb') as f:
+                resumo = hashlib.sha1(f.read(min(ate, BYTES_IDENTIDADE)))
+                inicio = max(0, ate - BYTES_IDENTIDADE)
+                f.seek(inicio)
+                resumo.update(f.read(ate - inicio))
+        except OSError:
+            return None
+        return resumo.hexdigest()
+
+    def ids_no_final(self, max_bytes=1 << 20):
+        # ids das paradas gravadas por último (as únicas que podem ter ficado sem confirmação)
+        tamanho = self.tamanho()
+        if tamanho == 0:
+            return set()
+        inicio = max(0, tamanho - max_bytes)
+        ids = set()
+        with open(self.caminho, 'rb') as f:
+            f.seek(inicio)
+            if inicio:
+                f.readline()  # descarta a linha cortada no meio
+            for linha in f:
+                try:
+                    ids.add(json.loads(linha).get('id'))
+                except ValueError:
+                    continue
+        return ids
+
+    def apagar(self):
+        if self.existe():
+            os.remove(self.caminho)
+
+
+class PaginasJournal:
+    # acesso aleatório às linhas do journal para a lista virtual: guarda só o offset
+    # de início de cada linha e mantém poucas páginas já decodificadas em memória
+    def __init__(self, journal, tamanho_pagina=50, paginas_em_cache=20):
+        self.journal = journal
+        self.tamanho_pagina = tamanho_pagina
+        self.paginas_em_cache = paginas_em_cache
+        self._offsets = array('q')
+        self._indexado = 0
+        self._paginas = OrderedDict()
+
+    def total(self):
+        self._indexar()
+        return len(self._offsets)
+
+    def _indexar(self):
+        # indexa apenas os bytes anexados desde a última chamada
+        tamanho = self.journal.tamanho()
+        if tamanho < self._indexado:
+            self._offsets = array('q')
+            self._indexado = 0
+            self._paginas.clear()
+        if tamanho == self._indexado:
+            return
+        # a última página pode ter ficado incompleta
+        self._paginas.pop(len(self._offsets) // self.tamanho_pagina, None)
+        with open(self.journal.caminho, 'rb') as f:
+            f.seek(self._indexado)
+            inicio_linha = posicao = self._indexado
+            while True:
+                bloco = f.read(1 << 20)
+                if not bloco:
+                    break
+                i = bloco.find(b'\n')
+                while i != -1:
+                    self._offsets.append(inicio_linha)
+                    inicio_linha = posicao + i + 1
+                    i = bloco.find(b'\n', i + 1)
+                posicao += len(bloco)
+        self._indexado = inicio_linha  # uma linha sem '\n' no fim ainda não é indexada
+
+    def linha(self, indice):
+        numero = indice // self.tamanho_pagina
+        pagina = self._paginas.get(numero)
+        if pagina is None:
+            pagina = self._carregar_pagina(numero)
+            self._paginas[numero] = pagina
+            if len(self._paginas) > self.paginas_em_cache:
+                self._paginas.popitem(last=False)
+        else:
+            self._paginas.move_to_end(numero)
+        return pagina[indice - numero * self.tamanho_pagina]
+
+    def _carregar_pagina(self, numero):
+        primeiro = numero * self.tamanho_pagina
+        ultimo = min(primeiro + self.tamanho_pagina, len(self._offsets))
+        inicio = self._offsets[primeiro]
+        fim = self._offsets[ultimo] if ultimo < len(self._offsets) else self._indexado
+        with open(self.journal.caminho, 'rb') as f:
+            f.seek(inicio)
+            dados = f.read(fim - inicio)
+        pagina = []
+        for linha in dados.splitlines():
+            try:
+                pagina.append(linha_excel(json.loads(linha)))
+            except (ValueError, KeyError, TypeError):
+                pagina.append(None)  # linha corrompida
+        return pagina
+
+
+def _segundos(texto):
+    # 'HH:MM:SS' -> segundos do dia; None para qualquer outro formato ou horário fora do dia
+    # ('24:00:00', '10:75:00'), que a tabela guarda como texto livre
+    if len(texto) == 8 and texto[2] == ':' and texto[5] == ':':
+        try:
+            horas, minutos, segundos = int(texto[:2]), int(texto[3:5]), int(texto[6:])
+        except ValueError:
+            return None
+        if 0 <= horas < 24 and 0 <= minutos < 60 and 0 <= segundos < 60:
+            return horas * 3600 + minutos * 60 + segundos
+    return None
+
+
+class _Dicionario:
+    # textos repetidos guardados uma única vez; as colunas guardam só o código
+    def __init__(self):
+        self.codigos = {}
+        self.textos = []
+
+    def codificar(self, texto):
+        codigo = self.codigos.get(texto)
+        if codigo is None:
+            codigo = self.codigos[texto] = len(self.textos)
+            self.textos.append(texto)
+        return codigo
+
+
+class TabelaHistorico:
+    # histórico em memória por colunas: processo, motivo, funcionário e data viram códigos
+    # de dicionário, horários viram segundos do dia e durações, float. nada de tupla ou dict
+    # por linha: a linha só é montada quando a lista virtual pede (mesma interface de
+    # PaginasJournal). horários fora do formato HH:MM:SS ficam num dicionário à parte
+    # (código negativo na coluna)
+    def __init__(self, com_ids=False):
+        self.datas = _Dicionario()
+        self.processos = _Dicionario()
+        self.funcionarios = _Dicionario()
+        self.motivos = _Dicionario()
+        self.horarios_livres = _Dicionario()
+        self.data = array('I')
+        self.processo = array('I')
+        self.funcionario = array('I')
+        self.motivo = array('I')
+        self.inicio = array('i')
+        self.fim = array('i')
+        self.duracao = array('d')
+        # ids em binário (16 bytes por linha), só quando o backend precisa deles
+        self.ids = bytearray() if com_ids else None
+
+    @classmethod
+    def de_registros(cls, registros, com_ids=False):
+        tabela = cls(com_ids)
+        for registro in registros:
+            tabela.acrescentar(registro)
+        return tabela
+
+    def _horario(self, texto):
+        texto = '' if texto is None else str(texto)
+        segundos = _segundos(texto)
+        return segundos if segundos is not None else -1 - self.horarios_livres.codificar(texto)
+
+    def _texto_horario(self, valor):
+        if valor < 0:
+            return self.horarios_livres.textos[-1 - valor]
+        return f'{valor // 3600:02d}:{valor // 60 % 60:02d}:{valor % 60:02d}'
+
+    def acrescentar(self, registro):
+        self.data.append(self.datas.codificar(registro.get('data') or ''))
+        self.processo.append(self.processos.codificar(registro.get('processo') or ''))
+        self.funcionario.append(self.funcionarios.codificar(registro.get('funcionario') or ''))
+        self.motivo.append(self.motivos.codificar(registro.get('motivo') or ''))
+        self.inicio.append(self._horario(registro.get('inicio')))
+        self.fim.append(self._horario(registro.get('fim')))
+        self.duracao.append(float(registro.get('duracao') or 0))
+        if self.ids is not None:
+            id_registro = registro.get('id') or ''
+            try:
+                self.ids += bytes.fromhex(id_registro) if len(id_registro) == 32 else bytes(16)
+            except ValueError:
+                self.ids += bytes(16)
+
+    def total(self):
+        return len(self.duracao)
+
+    def __len__(self):
+        return len(self.duracao)
+
+    def linha(self, indice):
+        # mesma ordem das colunas da aba 'Paradas'
+        return (
+            self.datas.textos[self.data[indice]], self.processos.textos[self.processo[indice]],
+            self.funcionarios.textos[self.funcionario[indice]], self.motivos.textos[self.motivo[indice]],
+            self._texto_horario(self.inicio[indice]), self._texto_horario(self.fim[indice]), self.duracao[indice]
+        )
+
+    def registro(self, indice):
+        data, processo, funcionario, motivo, inicio, fim, duracao = self.linha(indice)
+        registro = {'data': data, 'processo': processo, 'funcionario': funcionario, 'motivo': motivo,
+                    'inicio': inicio, 'fim': fim, 'duracao': duracao}
+        if self.ids is not None:
+            registro = dict(id=self.ids[indice * 16:indice * 16 + 16].hex(), **registro)
+        return registro
+
+    def iterar(self, posicoes=None):
+        for indice in range(len(self)) if posicoes is None else posicoes:
+            yield self.registro(indice)
+
+    def contem_ids(self, ids):
+        if self.ids is None:
+            return set()
+        procurados = {bytes.fromhex(i) for i in ids if isinstance(i, str) and len(i) == 32}
+        ids_tabela = bytes(self.ids)
+        return {ids_tabela[p:p + 16].hex() for p in range(0, len(ids_tabela), 16) if ids_tabela[p:p + 16] in procurados}
+
+    def posicoes(self, data_inicial=None, data_final=None, turno=None, processo=None, motivo=None,
+                 funcionario=None):
+        # mesmos critérios de consultar(), comparando só códigos inteiros
+        criterios = []
+        if data_inicial or data_final:
+            aceitas = bytearray(
+                (not data_inicial or texto >= data_inicial) and (not data_final or texto <= data_final)
+                for texto in self.datas.textos)
+            criterios.append((self.data, aceitas))
+        for coluna, dicionario, valor in ((self.processo, self.processos, processo),
+                                          (self.motivo, self.motivos, motivo),
+                                          (self.funcionario, self.funcionarios, funcionario)):
+            if valor:
+                codigo = dicionario.codigos.get(valor)
+                if codigo is None:
+                    return array('I')
+                aceitas = bytearray(len(dicionario.textos))
+                aceitas[codigo] = 1
+                criterios.append((coluna, aceitas))
+        if turno:
+            # um byte por segundo do dia; os horários livres (códigos -1, -2, ...) caem no fim do
+            # bytearray pelo índice negativo e passam pelo mesmo turno_de() dos outros armazenamentos
+            no_turno = bytearray(86400)
+            for nome, de, ate in TURNOS:
+                if nome == turno:
+                    de, ate = _segundos(de), _segundos(ate)
+                    for a, b in (((de, ate),) if de < ate else ((de, 86400), (0, ate))):
+                        no_turno[a:b] = b'\x01' * (b - a)
+            no_turno += bytes(turno_de(texto) == turno for texto in reversed(self.horarios_livres.textos))
+            criterios.append((self.inicio, no_turno))
+        posicoes = range(len(self))
+        for coluna, aceitas in criterios:
+            posicoes = [i for i in posicoes if aceitas[coluna[i]]]
+        return array('I', posicoes)
+
+    def filtrar(self, **filtros):
+        if not any(filtros.values()):
+            return self
+        return VisaoTabela(self, self.posicoes(**filtros))
+
+    def totais(self, **filtros):
+        # mesmo critério de _somar(): ignora linhas sem processo, motivo ou duração
+        processo, motivo, duracao = self.processo, self.motivo, self.duracao
+        por_processo = [0.0] * len(self.processos.textos)
+        por_motivo = [0.0] * len(self.motivos.textos)
+        usados_processo = bytearray(len(por_processo))
+        usados_motivo = bytearray(len(por_motivo))
+        vazio_processo = self.processos.codigos.get('')
+        vazio_motivo = self.motivos.codigos.get('')
+        total_tempo = 0
+        for i in (range(len(self)) if not any(filtros.values()) else self.posicoes(**filtros)):
+            d = duracao[i]
+            p = processo[i]
+            m = motivo[i]
+            if d and p != vazio_processo and m != vazio_motivo:
+                total_tempo += d
+                por_processo[p] += d
+                por_motivo[m] += d
+                usados_processo[p] = 1
+                usados_motivo[m] = 1
+        return (
+            {texto: por_processo[c] for c, texto in enumerate(self.processos.textos) if usados_processo[c]},
+            {texto: por_motivo[c] for c, texto in enumerate(self.motivos.textos) if usados_motivo[c]},
+            total_tempo
+        )
+
+
+class VisaoTabela:
+    # linhas filtradas de uma TabelaHistorico: guarda só as posições
+    def __init__(self, tabela, posicoes):
+        self.tabela = tabela
+        self.posicoes = posicoes
+
+    def total(self):
+        return len(self.posicoes)
+
+    def linha(self, indice):
+        return self.tabela.linha(self.posicoes[indice])
+
+
+@contextmanager
+def trava_arquivo(caminho, esperar=True):
+    # trava consultiva entre processos/estações (inclusive em pasta de rede);
+    # com esperar=False devolve False em vez de bloquear se outro já estiver com a trava
+    f = open(caminho, 'a+b')
+    obtida = False
+    try:
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if esperar else msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if esperar else fcntl.LOCK_NB))
+            obtida = True
+        except OSError:
+            if esperar:
+                raise
+        yield obtida
+    finally:
+        if obtida:
+            if os.name == 'nt':
+                import msvcrt
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        f.close()
+
+
+def gravar_json_atomico(caminho, dados, sincronizar=False):
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, ensure_ascii=False)
+        if sincronizar:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(temporario, caminho)
+
+
+class ParadasAtivasWAL:
+    # paradas em andamento à prova de queda de energia: cada início e cada fim viram uma
+    # linha com fsync no log; o snapshot JSON só é regravado na compactação.
+    # um fim continua no log até o histórico confirmar a gravação da parada
+    def __init__(self, arquivo_snapshot, arquivo_log, limite_compactacao=200):
+        self.arquivo_snapshot = arquivo_snapshot
+        self.arquivo_log = arquivo_log
+        self.limite_compactacao = limite_compactacao
+        self._trava = threading.Lock()
+        self._ativas = OrderedDict()
+        self._pendentes = OrderedDict()
+        self._eventos_no_log = 0
+
+    def carregar(self):
+        # snapshot + replay do log; devolve (paradas ativas, registros finalizados ainda não confirmados)
+        with self._trava:
+            os.makedirs(os.path.dirname(self.arquivo_log) or '.', exist_ok=True)
+            self._ativas.clear()
+            self._pendentes.clear()
+            self._eventos_no_log = 0
+            try:
+                with open(self.arquivo_snapshot, 'r', encoding='utf-8') as f:
+                    for parada in json.load(f):
+                        parada.setdefault('id', uuid.uuid4().hex)
+                        self._ativas[parada['id']] = parada
+            except (FileNotFoundError, ValueError):
+                pass
+            try:
+                valido = 0
+                with open(self.arquivo_log, 'r+b') as f:
+                    for linha in f:
+                        if not linha.endswith(b'\n'):
+                            break  # última linha incompleta: o evento não chegou a ser confirmado
+                        valido += len(linha)
+                        try:
+                            evento = json.loads(linha)
+                        except ValueError:
+                            continue
+                        self._aplicar(evento)
+                        self._eventos_no_log += 1
+                    # descarta o pedaço da gravação interrompida para os próximos eventos
+                    f.truncate(valido)
+            except FileNotFoundError:
+                pass
+            return [dict(p) for p in self._ativas.values()], list(self._pendentes.values())
+
+    def _aplicar(self, evento):
+        if evento.get('op') == 'inicio':
+            self._ativas.setdefault(evento['parada']['id'], evento['parada'])
+        elif evento.get('op') == 'fim':
+            self._ativas.pop(evento['id'], None)
+            self._pendentes[evento['id']] = evento['registro']
+
+    def _anexar(self, evento):
+        self._anexar_varios([evento])
+
+    def _anexar_varios(self, eventos):
+        # o lote inteiro numa escrita e num fsync só
+        dados = b''.join((json.dumps(evento, ensure_ascii=False) + '\n').encode('utf-8') for evento in eventos)
+        with open(self.arquivo_log, 'ab') as f:
+            f.write(dados)
+            f.flush()
+            os.fsync(f.fileno())
+        self._eventos_no_log += len(eventos)
+
+    def iniciar(self, parada):
+        # parada já serializada (datas em texto) e com 'id'
+        with self._trava:
+            self._anexar({'op': 'inicio', 'parada': parada})
+            self._ativas[parada['id']] = parada
+
+    def finalizar(self, id_parada, registro):
+        with self._trava:
+            self._anexar({'op': 'fim', 'id': id_parada, 'registro': registro})
+            self._ativas.pop(id_parada, None)
+            self._pendentes[id_parada] = registro
+
+    def iniciar_varios(self, paradas):
+        with self._trava:
+            if paradas:
+                self._anexar_varios([{'op': 'inicio', 'parada': parada} for parada in paradas])
+            for parada in paradas:
+                self._ativas[parada['id']] = parada
+
+    def finalizar_varios(self, fins):
+        # fins = [(id, registro)]; só finaliza as que ainda estão ativas (uma parada finalizada
+        # pelo botão não pode ganhar um segundo fim) e devolve os ids finalizados
+        with self._trava:
+            fins = [(id_parada, registro) for id_parada, registro in fins if id_parada in self._ativas]
+            if fins:
+                self._anexar_varios([{'op': 'fim', 'id': id_parada, 'registro': registro}
+                                     for id_parada, registro in fins])
+            for id_parada, registro in fins:
+                self._ativas.pop(id_parada, None)
+                self._pendentes[id_parada] = registro
+            return [id_parada for id_parada, _ in fins]
+
+    def confirmar(self, id_parada):
+        # o registro já está no histórico; a compactação pode descartar o fim do log
+        with self._trava:
+            self._pendentes.pop(id_parada, None)
+
+    def precisa_compactar(self):
+        return self._eventos_no_log >= self.limite_compactacao
+
+    def compactar(self):
+        # snapshot com as ativas e um log novo só com os fins ainda não confirmados
+        with self._trava:
+            os.makedirs(os.path.dirname(self.arquivo_snapshot) or '.', exist_ok=True)
+            gravar_json_atomico(self.arquivo_snapshot, list(self._ativas.values()), sincronizar=True)
+            temporario = self.arquivo_log + '.tmp'
+            with open(temporario, 'wb') as f:
+                for id_parada, registro in self._pendentes.items():
+                    evento = {'op': 'fim', 'id': id_parada, 'registro': registro}
+                    f.write((json.dumps(evento, ensure_ascii=False) + '\n').encode('utf-8'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporario, self.arquivo_log)
+            self._eventos_no_log = len(self._pendentes)
+
+
+class RollupsHistorico:
+    # totais por processo e por motivo mantidos junto com o offset do journal já processado;
+    # cada parada nova só custa a leitura da própria linha
+    def __init__(self, caminho, journal):
+        self.caminho = caminho
+        self.journal = journal
+        # atualizado tanto pela thread de gravação quanto pela interface
+        self._trava = threading.RLock()
+        self._zerar()
+        self.carregar()
+
+    def _zerar(self):
+        self.offset = 0
+        self.identidade = None
+        self.linhas = 0
+        self.total_tempo = 0.0
+        self.processos = {}
+        self.motivos = {}
+
+    def carregar(self):
+        try:
+            with open(self.caminho, 'r', encoding='utf-8') as f:
+                dados = json.load(f)
+            self.offset = int(dados['offset'])
+            self.identidade = dados.get('identidade')
+            self.linhas = int(dados['linhas'])
+            self.total_tempo = float(dados['total_tempo'])
+            self.processos = dados['processos']
+            self.motivos = dados['motivos']
+        except (FileNotFoundError, ValueError, KeyError, TypeError):
+            self._zerar()
+
+    def salvar(self):
+        gravar_json_atomico(self.caminho, {
+            'offset': self.offset,
+            'identidade': self.identidade,
+            'linhas': self.linhas,
+            'total_tempo': self.total_tempo,
+            'processos': self.processos,
+            'motivos': self.motivos
+        })
+
+    def acumular(self, registro):
+        self.linhas += 1
+        processo = registro.get('processo')
+        motivo = registro.get('motivo')
+        duracao = registro.get('duracao')
+        # mesmo critério usado nos gráficos: ignora linhas sem processo, motivo ou duração
+        if not (processo and motivo and duracao):
+            return
+        self.total_tempo += duracao
+        for grupo, chave in ((self.processos, processo), (self.motivos, motivo)):
+            item = grupo.setdefault(chave, {'total': 0.0, 'contagem': 0})
+            item['total'] += duracao
+            item['contagem'] += 1
+
+    def atualizar(self):
+        # processa só o que foi anexado depois do último offset; se o journal encolheu ou foi
+        # substituído por outro arquivo, os totais estão obsoletos e são refeitos do zero
+        with self._trava:
+            tamanho = self.journal.tamanho()
+            if self.offset > tamanho or (self.offset and self.journal.identidade(self.offset) != self.identidade):
+                self._zerar()
+            if self.offset == tamanho:
+                return False
+            for registro, fim in self.journal.iterar_com_offset(self.offset):
+                self.acumular(registro)
+                self.offset = fim
+            self.identidade = self.journal.identidade(self.offset)
+            self.salvar()
+            return True
+
+    def reconstruir(self):
+        with self._trava:
+            self._zerar()
+            self.atualizar()
+            self.salvar()
+
+    def totais_processos(self):
+        with self._trava:
+            return {chave: item['total'] for chave, item in self.processos.items()}
+
+    def totais_motivos(self):
+        with self._trava:
+            return {chave: item['total'] for chave, item in self.motivos.items()}
+
+    def contagem_motivos(self):
+        with self._trava:
+            return {chave: item['contagem'] for chave, item in self.motivos.items()}
+
+    def apagar(self):
+        with self._trava:
+            self._zerar()
+            if os.path.exists(self.caminho):
+                os.remove(self.caminho)
+
+
+class CacheArquivo:
+    # guarda o resultado de uma leitura enquanto mtime e tamanho do arquivo não mudarem
+    def __init__(self, carregar):
+        self.carregar = carregar
+        self._entradas = {}
+
+    def obter(self, caminho):
+        try:
+            st = os.stat(caminho)
+        except OSError:
+            self._entradas.pop(caminho, None)
+            return None
+        chave = (st.st_mtime_ns, st.st_size)
+        entrada = self._entradas.get(caminho)
+        if entrada and entrada[0] == chave:
+            return entrada[1]
+        valor = self.carregar(caminho)
+        self._entradas[caminho] = (chave, valor)
+        return valor
+
+    def invalidar(self, caminho=None):
+        if caminho is None:
+            self._entradas.clear()
+        else:
+            self._entradas.pop(caminho, None)
+
+
+def _ler_paradas_planilha(arquivo):
+    # modo read-only do openpyxl: lê em streaming e nunca grava no arquivo.
+    # openpyxl é importado só aqui e nas outras funções de planilha: a inicialização não paga por ele
+    from openpyxl import load_workbook
+    wb = load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        if 'Paradas' not in wb.sheetnames:
+            return None
+        # as linhas vão direto para a tabela em colunas, sem guardar as tuplas do openpyxl
+        tabela = TabelaHistorico(com_ids=True)
+        for numero_linha, row in enumerate(wb['Paradas'].iter_rows(min_row=2, max_col=8, values_only=True), start=2):
+            registro = registro_de_linha_excel(row, numero_linha)
+            if registro:
+                tabela.acrescentar(registro)
+        return tabela
+    finally:
+        wb.close()
+
+
+_cache_planilhas = CacheArquivo(_ler_paradas_planilha)
+
+
+def ler_planilha_paradas(arquivo):
+    # snapshot da aba 'Paradas' como TabelaHistorico (None se não há arquivo ou aba)
+    return _cache_planilhas.obter(arquivo)
+
+
+@contextmanager
+def abrir_planilha(arquivo):
+    from openpyxl import Workbook, load_workbook
+    wb = None
+    try:
+        # leitura e regravação medidas à parte: são elas que pesam numa planilha grande
+        with medir('abrir_planilha'):
+            if os.path.exists(arquivo):
+                wb = load_workbook(arquivo)
+            else:
+                wb = Workbook()
+                wb.remove(wb.active)
+        yield wb
+    except Exception as e:
+        raise RuntimeError(f"Erro ao acessar planilha: {str(e)}")
+    finally:
+        if wb:
+            try:
+                with medir('salvar_planilha'):
+                    wb.save(arquivo)
+                wb.close()
+            except:
+                pass
+
+
+def _criar_aba_paradas(wb):
+    from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
+    ws = wb.create_sheet('Paradas')
+    ws.append(CABECALHO_EXCEL)
+    for coluna, largura in LARGURAS_EXCEL.items():
+        ws.column_dimensions[coluna].width = largura
+    for cell in ws[1]:
+        cell.font = Font(bold=True)
+        cell.alignment = Alignment(horizontal='center')
+        cell.border = Border(bottom=Side(style='thin'))
+        cell.fill = PatternFill(start_color="DDDDDD", end_color="DDDDDD", fill_type="solid")
+    return ws
+
+
+def _anexar_linha_formatada(ws, registro, centro, direita):
+    ws.append(linha_excel(registro) + (registro.get('id'),))
+    linha = ws.max_row
+    ws[f'E{linha}'].alignment = centro
+    ws[f'F{linha}'].alignment = centro
+    ws[f'G{linha}'].number_format = '0.00'
+    ws[f'G{linha}'].alignment = direita
+
+
+class PlanilhaHistorico:
+    # modo antigo ('armazenamento': 'xlsx'): cada lote abre e regrava a planilha inteira
+    def __init__(self, arquivo):
+        self.arquivo = arquivo
+
+    def anexar_varios(self, registros):
+        from openpyxl.styles import Alignment
+        with abrir_planilha(self.arquivo) as wb:
+            ws = wb['Paradas'] if 'Paradas' in wb.sheetnames else _criar_aba_paradas(wb)
+            if ws[f'{COLUNA_ID_EXCEL}1'].value is None:
+                ws[f'{COLUNA_ID_EXCEL}1'] = 'ID'  # planilhas antigas ganham a coluna na primeira gravação
+            ws.column_dimensions[COLUNA_ID_EXCEL].hidden = True
+            centro = Alignment(horizontal='center')
+            direita = Alignment(horizontal='right')
+            for registro in registros:
+                _anexar_linha_formatada(ws, registro, centro, direita)
+
+
+_FIM = object()
+
+
+class GravadorEmSegundoPlano:
+    # uma única thread faz toda a gravação em disco; o que a interface enfileira durante
+    # o intervalo de gravação vira uma escrita só por destino (group commit)
+    def __init__(self, intervalo=0.5):
+        self.intervalo = intervalo
+        self.fila = queue.Queue()
+        self.confirmacoes = queue.Queue()
+        self.ganchos = {}
+        self.thread = None
+
+    def iniciar(self):
+        if not self.ativo():
+            self.thread = threading.Thread(target=self._executar, name='gravador-paradas', daemon=True)
+            self.thread.start()
+
+    def ativo(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def registrar_gancho(self, destino, funcao):
+        # executado na thread de gravação depois de cada lote gravado no destino
+        self.ganchos[destino] = funcao
+
+    def anexar(self, destino, registro, ao_concluir=None):
+        self.fila.put(('anexar', destino, registro, ao_concluir))
+
+    def substituir(self, chave, gravar, ao_concluir=None):
+        # só a versão mais recente enfileirada para cada chave chega ao disco
+        self.fila.put(('substituir', chave, gravar, ao_concluir))
+
+    def executar(self, funcao, ao_concluir=None):
+        self.fila.put(('executar', None, funcao, ao_concluir))
+
+    def pendentes(self):
+        return self.fila.qsize()
+
+    def _executar(self):
+        encerrar = False
+        while not encerrar:
+            lote = [self.fila.get()]
+            # junta tudo o que chegar durante o intervalo numa gravação só
+            limite = time.monotonic() + self.intervalo
+            while lote[-1] is not _FIM:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(self.fila.get(timeout=restante))
+                except queue.Empty:
+                    break
+            encerrar = lote[-1] is _FIM
+            if encerrar:
+                lote.pop()
+                # ao encerrar, drena também o que ainda estiver na fila
+                while True:
+                    try:
+                        item = self.fila.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not _FIM:
+                        lote.append(item)
+            self._gravar_lote(lote)
+
+    def _gravar_lote(self, lote):
+        anexos = {}
+        substituicoes = {}
+        execucoes = []
+        for tipo, chave, valor, ao_concluir in lote:
+            if tipo == 'anexar':
+                registros, callbacks = anexos.setdefault(chave, ([], []))
+                registros.append(valor)
+                callbacks.append(ao_concluir)
+            elif tipo == 'substituir':
+                callbacks = substituicoes.get(chave, (None, []))[1]
+                substituicoes[chave] = (valor, callbacks + [ao_concluir])
+            else:
+                execucoes.append((valor, [ao_concluir]))
+
+        for destino, (registros, callbacks) in anexos.items():
+            with medir('gravar_lote'):
+                erro = self._tentar(destino.anexar_varios, registros)
+                if erro is None and destino in self.ganchos:
+                    # falha no gancho (ex.: totais derivados) não invalida a gravação feita
+                    self._tentar(self.ganchos[destino])
+            self._confirmar(callbacks, erro)
+        for gravar, callbacks in list(substituicoes.values()) + execucoes:
+            self._confirmar(callbacks, self._tentar(gravar))
+
+    def _tentar(self, funcao, *args):
+        try:
+            funcao(*args)
+        except Exception as e:
+            return e
+        return None
+
+    def _confirmar(self, callbacks, erro):
+        for ao_concluir in callbacks:
+            if ao_concluir is not None:
+                self.confirmacoes.put((ao_concluir, erro))
+
+    def processar_confirmacoes(self):
+        # deve ser chamado na thread da interface (via after)
+        while True:
+            try:
+                ao_concluir, erro = self.confirmacoes.get_nowait()
+            except queue.Empty:
+                return
+            ao_concluir(erro)
+
+    def encerrar(self, timeout=None):
+        # grava tudo o que ainda estiver pendente e finaliza a thread
+        if self.ativo():
+            self.fila.put(_FIM)
+            self.thread.join(timeout)
+
+
+def importar_planilha(arquivo_excel, destino):
+    # migração única: copia as linhas da aba 'Paradas' de uma planilha antiga para o destino
+    # (journal ou qualquer backend com anexar_varios)
+    if not os.path.exists(arquivo_excel):
+        return 0
+    from openpyxl import load_workbook
+    wb = load_workbook(arquivo_excel, read_only=True)
+    try:
+        if 'Paradas' not in wb.sheetnames:
+            return 0
+        registros = []
+        linhas = wb['Paradas'].iter_rows(min_row=2, max_col=8, values_only=True)
+        for numero_linha, row in enumerate(linhas, start=2):
+            registro = registro_de_linha_excel(row, numero_linha)
+            if registro:
+                registros.append(registro)
+        destino.anexar_varios(registros)
+        return len(registros)
+    finally:
+        wb.close()
+
+
+def importar_csv_legado(arquivo_csv, destino, tamanho_lote=5000):
+    # lê o csv em streaming e grava em lotes: a memória não cresce com o tamanho do arquivo.
+    # os ids são determinísticos, então reimportar o mesmo csv (ou uma versão com linhas a
+    # mais no fim) só grava o que ainda não está no destino. devolve (importadas, ignoradas, repetidas)
+    importadas = ignoradas = repetidas = 0
+    lote = []
+    with open(arquivo_csv, 'r', newline='', encoding='utf-8-sig') as f:
+        existentes = {registro.get('id') for registro in destino.iterar()} if destino.existe() else set()
+        for numero_linha, row in enumerate(csv.reader(f), start=1):
+            registro = registro_de_linha_csv(row, numero_linha)
+            if registro is None:
+                ignoradas += 1
+                continue
+            if registro['id'] in existentes:
+                repetidas += 1
+                continue
+            lote.append(registro)
+            if len(lote) >= tamanho_lote:
+                destino.anexar_varios(lote)
+                importadas += len(lote)
+                lote = []
+    if lote:
+        destino.anexar_varios(lote)
+        importadas += len(lote)
+    return importadas, ignoradas, repetidas
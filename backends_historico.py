@@ -0,0 +1,1077 @@
+import glob
+import gzip
+import json
+import os
+import re
+import socket
+import sqlite3
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from armazenamento import (
+    ARQUIVO_JOURNAL, ARQUIVO_EXCEL, ARQUIVO_ROLLUPS, ARQUIVO_INDICE, CAMPOS_HISTORICO, TURNOS, JournalHistorico,
+    RollupsHistorico, PlanilhaHistorico, PaginasJournal, TabelaHistorico, ler_planilha_paradas, importar_planilha,
+    trava_arquivo, gravar_json_atomico, turno_de
+)
+from indice_historico import IndiceHistorico, PaginasIndice, ler_registros
+
+ARQUIVO_SQLITE = 'paradas.db'
+PASTA_ESTACOES = 'estacoes'
+ARQUIVO_MANIFESTO = 'paradas_consolidado.json'
+ARQUIVO_TRAVA = 'paradas_consolidado.lock'
+PASTA_PARTICOES = 'particoes'
+ARQUIVO_PARTICOES = 'particoes.json'
+
+
+def _filtrar(registros, data_inicial=None, data_final=None, turno=None, processo=None, motivo=None,
+             funcionario=None):
+    for registro in registros:
+        data = registro.get('data') or ''
+        if data_inicial and data < data_inicial:
+            continue
+        if data_final and data > data_final:
+            continue
+        if turno and turno_de(registro.get('inicio')) != turno:
+            continue
+        if processo and registro.get('processo') != processo:
+            continue
+        if motivo and registro.get('motivo') != motivo:
+            continue
+        if funcionario and registro.get('funcionario') != funcionario:
+            continue
+        yield registro
+
+
+def _assinatura_arquivos(caminhos):
+    # (mtime, tamanho) de cada arquivo: um stat por arquivo, sem abrir nada
+    assinatura = []
+    for caminho in caminhos:
+        try:
+            st = os.stat(caminho)
+            assinatura.append((caminho, st.st_mtime_ns, st.st_size))
+        except OSError:
+            assinatura.append((caminho, None, None))
+    return tuple(assinatura)
+
+
+def _somar(registros):
+    # mesmo critério dos gráficos: ignora linhas sem processo, motivo ou duração
+    dados_processos = {}
+    dados_motivos = {}
+    total_tempo = 0
+    for registro in registros:
+        processo = registro.get('processo')
+        motivo = registro.get('motivo')
+        duracao = registro.get('duracao')
+        if processo and motivo and duracao:
+            total_tempo += duracao
+            dados_processos[processo] = dados_processos.get(processo, 0) + duracao
+            dados_motivos[motivo] = dados_motivos.get(motivo, 0) + duracao
+    return dados_processos, dados_motivos, total_tempo
+
+
+class BackendHistorico:
+    # interface comum dos armazenamentos do histórico de paradas
+    nome = ''
+
+    def existe(self):
+        raise NotImplementedError
+
+    def anexar_varios(self, registros):
+        raise NotImplementedError
+
+    def apos_gravar(self):
+        # executado na thread do gravador depois de cada lote gravado
+        pass
+
+    def iterar(self):
+        raise NotImplementedError
+
+    def consultar(self, **filtros):
+        return _filtrar(self.iterar(), **filtros)
+
+    def contem_ids(self, ids):
+        # quais destes ids já estão no histórico
+        ids = set(ids)
+        return {registro.get('id') for registro in self.iterar() if registro.get('id') in ids}
+
+    def paginas(self):
+        # objeto com total() e linha(indice) para a lista virtual, ou None sem histórico
+        raise NotImplementedError
+
+    def filtrar(self, **filtros):
+        # como paginas(), só com as linhas que atendem aos filtros de consultar()
+        if not self.existe():
+            return None
+        return TabelaHistorico.de_registros(self.consultar(**filtros))
+
+    def totais(self, **filtros):
+        # (totais por processo, totais por motivo, tempo total), ou None sem histórico
+        if not self.existe():
+            return None
+        return _somar(self.consultar(**filtros))
+
+    def contagem_motivos(self):
+        # {motivo: número de paradas} do histórico inteiro, para as sugestões do campo 'Outros'
+        contagem = {}
+        for registro in self.iterar():
+            motivo = registro.get('motivo')
+            if motivo:
+                contagem[motivo] = contagem.get(motivo, 0) + 1
+        return contagem
+
+    def modificado_em(self):
+        return None
+
+    def assinatura(self):
+        # muda sempre que o histórico muda; barata o bastante para ser conferida num timer da interface
+        return self.modificado_em()
+
+    def sincronizar(self):
+        # traz o que outros processos gravaram e as leituras ainda não enxergam; roda na thread
+        # de gravação (ou no paradas_cli), nunca na da interface. devolve True se trouxe algo
+        return False
+
+    def apagar(self):
+        raise NotImplementedError
+
+
+class BackendJournal(BackendHistorico):
+    nome = 'journal'
+
+    def __init__(self, diretorio):
+        self.journal = JournalHistorico(os.path.join(diretorio, ARQUIVO_JOURNAL))
+        self.rollups = RollupsHistorico(os.path.join(diretorio, ARQUIVO_ROLLUPS), self.journal)
+        self.indice = IndiceHistorico(os.path.join(diretorio, ARQUIVO_INDICE), self.journal)
+        self._paginas = PaginasJournal(self.journal)
+
+    def existe(self):
+        return self.journal.existe()
+
+    def anexar_varios(self, registros):
+        return self.journal.anexar_varios(registros)
+
+    def apos_gravar(self):
+        # os totais dos gráficos e o índice dos filtros só leem as linhas recém-anexadas
+        self.rollups.atualizar()
+        self.indice.atualizar()
+
+    def iterar(self):
+        return self.journal.iterar()
+
+    def _offsets_filtrados(self, filtros):
+        self.indice.atualizar()
+        return self.indice.offsets_de(self.indice.consultar(**filtros))
+
+    def consultar(self, **filtros):
+        if not any(filtros.values()):
+            return self.iterar()
+        # só as linhas encontradas no índice são lidas do journal
+        return ler_registros(self.journal, self._offsets_filtrados(filtros))
+
+    def contem_ids(self, ids):
+        # gravações sem confirmação são sempre as últimas do journal
+        return set(ids) & self.journal.ids_no_final()
+
+    def paginas(self):
+        return self._paginas if self.existe() else None
+
+    def filtrar(self, **filtros):
+        if not self.existe():
+            return None
+        return PaginasIndice(self.journal, self._offsets_filtrados(filtros))
+
+    def totais(self, **filtros):
+        if any(filtros.values()):
+            return super().totais(**filtros)  # os rollups só cobrem o histórico inteiro
+        if not self.existe():
+            return None
+        # totais mantidos incrementalmente; só relê o journal se estiverem defasados
+        self.rollups.atualizar()
+        return self.rollups.totais_processos(), self.rollups.totais_motivos(), self.rollups.total_tempo
+
+    def contagem_motivos(self):
+        if not self.existe():
+            return {}
+        self.rollups.atualizar()
+        return self.rollups.contagem_motivos()
+
+    def modificado_em(self):
+        return os.path.getmtime(self.journal.caminho) if self.existe() else None
+
+    def assinatura(self):
+        return _assinatura_arquivos((self.journal.caminho,))
+
+    def apagar(self):
+        self.journal.apagar()
+        self.rollups.apagar()
+        self.indice.apagar()
+
+
+class BackendPlanilha(BackendHistorico):
+    # modo antigo: a própria paradas.xlsx é o registro oficial
+    nome = 'xlsx'
+
+    def __init__(self, diretorio):
+        self.arquivo = os.path.join(diretorio, ARQUIVO_EXCEL)
+        self.planilha = PlanilhaHistorico(self.arquivo)
+
+    def _tabela(self):
+        # leitura read-only em colunas, em cache enquanto mtime e tamanho não mudarem
+        return ler_planilha_paradas(self.arquivo)
+
+    def existe(self):
+        return self._tabela() is not None
+
+    def anexar_varios(self, registros):
+        self.planilha.anexar_varios(registros)
+
+    def iterar(self):
+        tabela = self._tabela()
+        return tabela.iterar() if tabela is not None else iter(())
+
+    def consultar(self, **filtros):
+        tabela = self._tabela()
+        if tabela is None:
+            return iter(())
+        return tabela.iterar(tabela.posicoes(**filtros) if any(filtros.values()) else None)
+
+    def contem_ids(self, ids):
+        tabela = self._tabela()
+        return tabela.contem_ids(ids) if tabela is not None else set()
+
+    def paginas(self):
+        return self._tabela()
+
+    def modificado_em(self):
+        return os.path.getmtime(self.arquivo) if os.path.exists(self.arquivo) else None
+
+    def assinatura(self):
+        return _assinatura_arquivos((self.arquivo,))
+
+    def filtrar(self, **filtros):
+        tabela = self._tabela()
+        return tabela.filtrar(**filtros) if tabela is not None else None
+
+    def totais(self, **filtros):
+        tabela = self._tabela()
+        return tabela.totais(**filtros) if tabela is not None else None
+
+    def apagar(self):
+        if os.path.exists(self.arquivo):
+            os.remove(self.arquivo)
+
+
+class PaginasSQLite:
+    # páginas da lista virtual lidas do banco; o cache cai quando outra conexão grava
+    def __init__(self, backend, where='', parametros=(), tamanho_pagina=50, paginas_em_cache=20):
+        self.backend = backend
+        self.where = where
+        self.parametros = parametros
+        self.tamanho_pagina = tamanho_pagina
+        self.paginas_em_cache = paginas_em_cache
+        self._versao = None
+        self._total = 0
+        self._paginas = OrderedDict()
+
+    def total(self):
+        conexao = self.backend.conexao()
+        versao = conexao.execute('PRAGMA data_version').fetchone()[0]
+        if versao != self._versao:
+            self._versao = versao
+            self._total = conexao.execute(f'SELECT COUNT(*) FROM paradas {self.where}', self.parametros).fetchone()[0]
+            self._paginas.clear()
+        return self._total
+
+    def linha(self, indice):
+        numero = indice // self.tamanho_pagina
+        pagina = self._paginas.get(numero)
+        if pagina is None:
+            pagina = self.backend.conexao().execute(
+                'SELECT data, processo, funcionario, motivo, inicio, fim, duracao FROM paradas '
+                f'{self.where} ORDER BY seq LIMIT ? OFFSET ?',
+                self.parametros + (self.tamanho_pagina, numero * self.tamanho_pagina)
+            ).fetchall()
+            self._paginas[numero] = pagina
+            if len(self._paginas) > self.paginas_em_cache:
+                self._paginas.popitem(last=False)
+        else:
+            self._paginas.move_to_end(numero)
+        return pagina[indice - numero * self.tamanho_pagina]
+
+
+class BackendSQLite(BackendHistorico):
+    # banco SQLite em modo WAL: leituras da interface não bloqueiam a gravação do gravador
+    nome = 'sqlite'
+
+    ESQUEMA = (
+        'CREATE TABLE IF NOT EXISTS paradas ('
+        ' seq INTEGER PRIMARY KEY,'
+        ' id TEXT UNIQUE,'
+        ' data TEXT NOT NULL,'
+        ' processo TEXT NOT NULL,'
+        ' funcionario TEXT,'
+        ' motivo TEXT,'
+        ' inicio TEXT,'
+        ' fim TEXT,'
+        ' duracao REAL)',
+        'CREATE INDEX IF NOT EXISTS idx_paradas_data ON paradas (data, inicio)',
+        'CREATE INDEX IF NOT EXISTS idx_paradas_processo ON paradas (processo, data)',
+        'CREATE INDEX IF NOT EXISTS idx_paradas_motivo ON paradas (motivo, data)',
+        'CREATE INDEX IF NOT EXISTS idx_paradas_funcionario ON paradas (funcionario, data)',
+    )
+
+    def __init__(self, diretorio):
+        self.arquivo = os.path.join(diretorio, ARQUIVO_SQLITE)
+        # o sqlite3 exige uma conexão por thread (interface e gravador)
+        self._local = threading.local()
+        self._paginas = PaginasSQLite(self)
+
+    def conexao(self):
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.arquivo)
+            conexao.execute('PRAGMA journal_mode=WAL')
+            conexao.execute('PRAGMA synchronous=NORMAL')
+            with conexao:
+                for comando in self.ESQUEMA:
+                    conexao.execute(comando)
+            self._local.conexao = conexao
+        return conexao
+
+    def existe(self):
+        if not os.path.exists(self.arquivo):
+            return False
+        return self.conexao().execute('SELECT 1 FROM paradas LIMIT 1').fetchone() is not None
+
+    def anexar_varios(self, registros):
+        # um lote inteiro numa transação; ids repetidos (reimportação) são ignorados
+        with self.conexao() as conexao:
+            conexao.executemany(
+                'INSERT OR IGNORE INTO paradas (id, data, processo, funcionario, motivo, inicio, fim, duracao) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                ([registro.get(campo) for campo in CAMPOS_HISTORICO] for registro in registros)
+            )
+
+    def iterar(self):
+        return self._selecionar('', ())
+
+    def _selecionar(self, where, parametros):
+        cursor = self.conexao().execute(
+            f'SELECT {", ".join(CAMPOS_HISTORICO)} FROM paradas {where} ORDER BY seq', parametros
+        )
+        for row in cursor:
+            yield dict(zip(CAMPOS_HISTORICO, row))
+
+    def _where(self, data_inicial=None, data_final=None, turno=None, processo=None, motivo=None,
+               funcionario=None):
+        condicoes = []
+        parametros = []
+        for condicao, valor in (('data >= ?', data_inicial), ('data <= ?', data_final), ('processo = ?', processo),
+                                ('motivo = ?', motivo), ('funcionario = ?', funcionario)):
+            if valor:
+                condicoes.append(condicao)
+                parametros.append(valor)
+        for nome, de, ate in TURNOS:
+            if turno == nome:
+                # mesmo critério de turno_de(); o turno que atravessa a meia-noite vira um OR
+                if de < ate:
+                    condicoes.append('inicio >= ? AND inicio < ?')
+                else:
+                    condicoes.append("(inicio >= ? OR (inicio < ? AND inicio <> ''))")
+                parametros.extend((de, ate))
+        return ('WHERE ' + ' AND '.join(condicoes)) if condicoes else '', tuple(parametros)
+
+    def consultar(self, **filtros):
+        return self._selecionar(*self._where(**filtros))
+
+    def contem_ids(self, ids):
+        ids = list(ids)
+        if not ids or not os.path.exists(self.arquivo):
+            return set()
+        marcadores = ', '.join('?' * len(ids))
+        return {row[0] for row in self.conexao().execute(f'SELECT id FROM paradas WHERE id IN ({marcadores})', ids)}
+
+    def paginas(self):
+        return self._paginas if self.existe() else None
+
+    def filtrar(self, **filtros):
+        # a paginação usa o mesmo WHERE da consulta, apoiado nos índices do banco
+        return PaginasSQLite(self, *self._where(**filtros)) if self.existe() else None
+
+    def totais(self, **filtros):
+        if not self.existe():
+            return None
+        where, parametros = self._where(**filtros)
+        criterio = "processo <> '' AND motivo <> '' AND duracao > 0"
+        where = f'{where} AND {criterio}' if where else f'WHERE {criterio}'
+        conexao = self.conexao()
+        totais = []
+        for coluna in ('processo', 'motivo'):
+            # mantém a ordem de primeira ocorrência, como a varredura da planilha fazia
+            totais.append(dict(conexao.execute(
+                f'SELECT {coluna}, SUM(duracao) FROM paradas {where} GROUP BY {coluna} ORDER BY MIN(seq)', parametros
+            ).fetchall()))
+        total_tempo = conexao.execute(f'SELECT COALESCE(SUM(duracao), 0) FROM paradas {where}', parametros).fetchone()[0]
+        return totais[0], totais[1], total_tempo
+
+    def contagem_motivos(self):
+        if not self.existe():
+            return {}
+        return dict(self.conexao().execute(
+            "SELECT motivo, COUNT(*) FROM paradas WHERE motivo <> '' GROUP BY motivo").fetchall())
+
+    def modificado_em(self):
+        # com WAL as gravações recentes ficam no arquivo -wal até o checkpoint
+        tempos = [os.path.getmtime(c) for c in (self.arquivo, self.arquivo + '-wal') if os.path.exists(c)]
+        return max(tempos) if tempos else None
+
+    def apagar(self):
+        with self.conexao() as conexao:
+            conexao.execute('DELETE FROM paradas')
+
+
+def identificador_estacao(nome=None):
+    # id da estação usado no nome do shard; por padrão, o nome do computador
+    nome = (nome or socket.gethostname() or 'estacao').strip()
+    return re.sub(r'[^A-Za-z0-9_-]', '_', nome)
+
+
+def _ordem_cronologica(registro):
+    return (registro.get('data') or '', registro.get('inicio') or '')
+
+
+class BackendCompartilhado(BackendHistorico):
+    # vários terminais na mesma pasta de rede: cada estação só anexa ao seu próprio shard
+    # (estacoes/<estacao>.jsonl), então as gravações nunca disputam o mesmo arquivo.
+    # a visão consolidada e sem duplicatas é montada por quem conseguir a trava do
+    # consolidado, lendo de cada shard só o que passou do offset guardado no manifesto
+    nome = 'compartilhado'
+
+    def __init__(self, diretorio, estacao=None):
+        self.diretorio = diretorio
+        self.estacao = identificador_estacao(estacao)
+        self.pasta_estacoes = os.path.join(diretorio, PASTA_ESTACOES)
+        os.makedirs(self.pasta_estacoes, exist_ok=True)
+        self.shard = JournalHistorico(os.path.join(self.pasta_estacoes, f'{self.estacao}.jsonl'))
+        self.arquivo_manifesto = os.path.join(diretorio, ARQUIVO_MANIFESTO)
+        self.arquivo_trava = os.path.join(diretorio, ARQUIVO_TRAVA)
+        self._trava_local = threading.RLock()
+        self._geracao = None
+        self._ids = set()
+        self._ids_offset = 0
+        self._abrir_geracao(self._ler_manifesto()['geracao'])
+
+    # --- manifesto e geração do consolidado ---
+
+    def _ler_manifesto(self):
+        try:
+            with open(self.arquivo_manifesto, 'r', encoding='utf-8') as f:
+                manifesto = json.load(f)
+            manifesto['geracao'] = int(manifesto['geracao'])
+            manifesto.setdefault('shards', {})
+            return manifesto
+        except (FileNotFoundError, ValueError, KeyError, TypeError):
+            return {'geracao': 0, 'shards': {}, 'tamanho': 0}
+
+    def _caminho_consolidado(self, geracao):
+        return os.path.join(self.diretorio, f'paradas_consolidado.{geracao}.jsonl')
+
+    def _abrir_geracao(self, geracao):
+        # uma compactação completa grava uma geração nova; leitores trocam de arquivo
+        # em vez de ler offsets de um arquivo que mudou por baixo deles
+        if geracao == self._geracao:
+            return
+        if self._geracao is not None:
+            self.rollups.apagar()
+            self.indice.apagar()
+        self._geracao = geracao
+        self.consolidado = JournalHistorico(self._caminho_consolidado(geracao))
+        # totais e índice da visão consolidada são um cache local desta estação, um por geração
+        prefixo = os.path.join(self.pasta_estacoes, f'{self.estacao}.{geracao}.')
+        self.rollups = RollupsHistorico(prefixo + ARQUIVO_ROLLUPS, self.consolidado)
+        self.indice = IndiceHistorico(prefixo + ARQUIVO_INDICE, self.consolidado)
+        self._paginas = PaginasJournal(self.consolidado)
+        self._ids = set()
+        self._ids_offset = 0
+
+    def _shards(self):
+        return sorted(glob.glob(os.path.join(self.pasta_estacoes, '*.jsonl')))
+
+    # --- merge e compactação ---
+
+    def _pendente(self, manifesto):
+        # sem trava: algum shard cresceu, mudou ou apareceu desde o manifesto?
+        if manifesto.get('tamanho', 0) != JournalHistorico(self._caminho_consolidado(manifesto['geracao'])).tamanho():
+            return True
+        return any(manifesto['shards'].get(os.path.basename(caminho)) != JournalHistorico(caminho).tamanho()
+                   for caminho in self._shards())
+
+    def consolidar(self, esperar=False):
+        # incremental: anexa ao consolidado só os registros novos dos shards. leituras sem
+        # nada novo não pegam a trava nem regravam o manifesto na pasta de rede
+        if not esperar and not self._pendente(self._ler_manifesto()):
+            return True
+        with self._trava_local, trava_arquivo(self.arquivo_trava, esperar) as obtida:
+            if not obtida:
+                return False  # outra estação está consolidando; os dados entram na próxima vez
+            manifesto = self._ler_manifesto()
+            self._abrir_geracao(manifesto['geracao'])
+            if manifesto.get('tamanho', 0) != self.consolidado.tamanho():
+                return self._compactar_travado(manifesto)
+
+            for registro, fim in self.consolidado.iterar_com_offset(self._ids_offset):
+                self._ids.add(registro.get('id'))
+                self._ids_offset = fim
+
+            novos = []
+            offsets_anteriores = dict(manifesto['shards'])
+            for caminho in self._shards():
+                nome = os.path.basename(caminho)
+                shard = JournalHistorico(caminho)
+                offset = manifesto['shards'].get(nome, 0)
+                if offset > shard.tamanho():
+                    return self._compactar_travado(manifesto)  # shard foi truncado ou trocado
+                for registro, fim in shard.iterar_com_offset(offset):
+                    if registro.get('id') not in self._ids:
+                        self._ids.add(registro.get('id'))
+                        novos.append(registro)
+                    offset = fim
+                manifesto['shards'][nome] = offset
+
+            if not novos and manifesto['shards'] == offsets_anteriores:
+                return True
+            if novos:
+                novos.sort(key=_ordem_cronologica)
+                self._ids_offset = self.consolidado.anexar_varios(novos)
+            manifesto['tamanho'] = self.consolidado.tamanho()
+            gravar_json_atomico(self.arquivo_manifesto, manifesto, sincronizar=True)
+            return True
+
+    def compactar(self):
+        # reconstrói o consolidado inteiro, em ordem cronológica e sem duplicatas
+        with self._trava_local, trava_arquivo(self.arquivo_trava) as obtida:
+            return self._compactar_travado(self._ler_manifesto()) if obtida else False
+
+    def _compactar_travado(self, manifesto):
+        vistos = set()
+        registros = []
+        offsets = {}
+        for caminho in self._shards():
+            shard = JournalHistorico(caminho)
+            offset = 0
+            for registro, fim in shard.iterar_com_offset(0):
+                if registro.get('id') not in vistos:
+                    vistos.add(registro.get('id'))
+                    registros.append(registro)
+                offset = fim
+            offsets[os.path.basename(caminho)] = offset
+        registros.sort(key=_ordem_cronologica)
+
+        geracao_antiga = manifesto['geracao']
+        geracao = geracao_antiga + 1
+        novo = JournalHistorico(self._caminho_consolidado(geracao))
+        novo.apagar()
+        tamanho = novo.anexar_varios(registros) if registros else 0
+        gravar_json_atomico(self.arquivo_manifesto, {'geracao': geracao, 'shards': offsets, 'tamanho': tamanho},
+                            sincronizar=True)
+        self._abrir_geracao(geracao)
+        try:
+            os.remove(self._caminho_consolidado(geracao_antiga))
+        except OSError:
+            pass  # outro terminal ainda pode estar lendo a geração antiga
+        return True
+
+    def _visao(self):
+        # leitura só segue a geração do manifesto: quem junta os shards é o gravador, em
+        # apos_gravar e sincronizar. a trava é a mesma da consolidação, que troca o
+        # consolidado, os rollups e o índice e apaga a geração antiga
+        with self._trava_local:
+            self._abrir_geracao(self._ler_manifesto()['geracao'])
+
+    def sincronizar(self):
+        antes = (self._geracao, self.consolidado.tamanho())
+        try:
+            self.consolidar(esperar=False)
+        except OSError:
+            return False  # pasta de rede fora do ar: fica para a próxima
+        return (self._geracao, self.consolidado.tamanho()) != antes
+
+    # --- interface do backend ---
+
+    def existe(self):
+        # shards ainda não consolidados também contam: o histórico não está vazio
+        self._visao()
+        return self.consolidado.tamanho() > 0 or any(JournalHistorico(c).tamanho() for c in self._shards())
+
+    def anexar_varios(self, registros):
+        return self.shard.anexar_varios(registros)
+
+    def apos_gravar(self):
+        self.consolidar(esperar=False)
+        self.rollups.atualizar()
+        self.indice.atualizar()
+
+    def iterar(self):
+        self._visao()
+        return self.consolidado.iterar()
+
+    def _offsets_filtrados(self, filtros):
+        # o consolidado e os offsets do índice saem da mesma geração
+        with self._trava_local:
+            self._visao()
+            self.indice.atualizar()
+            return self.consolidado, self.indice.offsets_de(self.indice.consultar(**filtros))
+
+    def consultar(self, **filtros):
+        if not any(filtros.values()):
+            return self.iterar()
+        return ler_registros(*self._offsets_filtrados(filtros))
+
+    def contem_ids(self, ids):
+        # registros sem confirmação só podem estar no fim do shard desta estação
+        return set(ids) & self.shard.ids_no_final()
+
+    def paginas(self):
+        return self._paginas if self.existe() else None
+
+    def filtrar(self, **filtros):
+        if not self.existe():
+            return None
+        return PaginasIndice(*self._offsets_filtrados(filtros))
+
+    def totais(self, **filtros):
+        if any(filtros.values()):
+            return super().totais(**filtros)
+        if not self.existe():
+            return None
+        with self._trava_local:
+            self.rollups.atualizar()
+            return self.rollups.totais_processos(), self.rollups.totais_motivos(), self.rollups.total_tempo
+
+    def contagem_motivos(self):
+        if not self.existe():
+            return {}
+        with self._trava_local:
+            self.rollups.atualizar()
+            return self.rollups.contagem_motivos()
+
+    def modificado_em(self):
+        tempos = [os.path.getmtime(c) for c in self._shards()]
+        return max(tempos) if tempos else None
+
+    def assinatura(self):
+        # os shards das outras estações também contam: quando mudam, a interface pede ao
+        # gravador um sincronizar() antes de reler
+        return _assinatura_arquivos(self._shards())
+
+    def apagar(self):
+        with self._trava_local, trava_arquivo(self.arquivo_trava):
+            for caminho in self._shards():
+                os.remove(caminho)
+            self.consolidado.apagar()
+            if os.path.exists(self.arquivo_manifesto):
+                os.remove(self.arquivo_manifesto)
+            self.rollups.apagar()
+            self.indice.apagar()
+            self._geracao = None
+            self._abrir_geracao(0)
+
+
+def mes_do_registro(registro):
+    # partição (AAAA-MM) de um registro; sem data válida vai para o mês corrente
+    data = registro.get('data') or ''
+    return data[:7] if re.match(r'^\d{4}-\d{2}', data) else datetime.now().strftime('%Y-%m')
+
+
+def _mes_seguinte(mes):
+    ano, numero = int(mes[:4]), int(mes[5:7])
+    return f'{ano + numero // 12:04d}-{numero % 12 + 1:02d}'
+
+
+def _meses_antes(mes, quantidade):
+    ano, numero = int(mes[:4]), int(mes[5:7]) - 1 - quantidade
+    return f'{ano + numero // 12:04d}-{numero % 12 + 1:02d}'
+
+
+def _ler_arquivada(caminho):
+    # partição fechada: JSONL comprimido com gzip, lido em streaming
+    try:
+        with gzip.open(caminho, 'rb') as f:
+            for linha in f:
+                try:
+                    yield json.loads(linha)
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        return
+
+
+class ParticaoAberta:
+    # mês ainda recebendo paradas: journal com rollups e índice próprios
+    def __init__(self, pasta, mes):
+        base = os.path.join(pasta, f'paradas-{mes}')
+        self.mes = mes
+        self.journal = JournalHistorico(base + '.jsonl')
+        self.rollups = RollupsHistorico(base + '.rollups.json', self.journal)
+        self.indice = IndiceHistorico(base + '.indice.bin', self.journal)
+        self.paginas = PaginasJournal(self.journal)
+
+    def consultar(self, filtros):
+        if not any(filtros.values()):
+            return self.journal.iterar()
+        self.indice.atualizar()
+        return ler_registros(self.journal, self.indice.offsets_de(self.indice.consultar(**filtros)))
+
+    def filtrar(self, filtros):
+        if not any(filtros.values()):
+            return self.paginas
+        self.indice.atualizar()
+        return PaginasIndice(self.journal, self.indice.offsets_de(self.indice.consultar(**filtros)))
+
+    def apagar(self):
+        self.journal.apagar()
+        self.rollups.apagar()
+        self.indice.apagar()
+
+
+class PaginasArquivadas:
+    # linhas de uma partição fechada, descomprimidas só quando a lista chega nelas
+    def __init__(self, caminho, linhas, filtros):
+        self.caminho = caminho
+        self.linhas = linhas
+        self.filtros = filtros
+        self._linhas = None
+
+    def _carregar(self):
+        if self._linhas is None:
+            self._linhas = TabelaHistorico.de_registros(_ler_arquivada(self.caminho)).filtrar(**self.filtros)
+        return self._linhas
+
+    def total(self):
+        return self._carregar().total() if any(self.filtros.values()) else self.linhas
+
+    def linha(self, indice):
+        linhas = self._carregar()
+        return linhas.linha(indice) if indice < linhas.total() else None
+
+    def descarregar(self):
+        if not any(self.filtros.values()):
+            self._linhas = None
+
+
+class PaginasParticionadas:
+    # uma lista virtual só sobre as partições do período, em ordem cronológica;
+    # no máximo algumas partições fechadas ficam descomprimidas em memória
+    def __init__(self, fontes, arquivadas_em_memoria=2):
+        self.fontes = fontes
+        self.arquivadas_em_memoria = arquivadas_em_memoria
+        self._acumulado = None
+        self._carregadas = OrderedDict()
+
+    def total(self):
+        # as partições abertas crescem enquanto a lista está na tela
+        self._acumulado = []
+        soma = 0
+        for fonte in self.fontes:
+            soma += fonte.total()
+            self._acumulado.append(soma)
+        return soma
+
+    def linha(self, indice):
+        if self._acumulado is None:
+            self.total()
+        posicao = bisect_right(self._acumulado, indice)
+        if posicao >= len(self.fontes):
+            return None
+        fonte = self.fontes[posicao]
+        if isinstance(fonte, PaginasArquivadas):
+            self._carregadas[posicao] = fonte
+            self._carregadas.move_to_end(posicao)
+            while len(self._carregadas) > self.arquivadas_em_memoria:
+                self._carregadas.popitem(last=False)[1].descarregar()
+        return fonte.linha(indice - (self._acumulado[posicao - 1] if posicao else 0))
+
+
+class BackendMensal(BackendHistorico):
+    # uma partição por mês em particoes/: o mês corrente (e o anterior, durante a carência)
+    # é um journal aberto; os meses encerrados viram paradas-AAAA-MM.jsonl.gz, com contagem e
+    # totais guardados em particoes.json. consultas com período só abrem os meses que o cruzam
+    # e a retenção descarta os meses fechados mais antigos que o limite
+    nome = 'mensal'
+
+    def __init__(self, diretorio, carencia_dias=2, retencao_meses=0):
+        self.pasta = os.path.join(diretorio, PASTA_PARTICOES)
+        os.makedirs(self.pasta, exist_ok=True)
+        self.arquivo_manifesto = os.path.join(self.pasta, ARQUIVO_PARTICOES)
+        self.carencia_dias = carencia_dias
+        self.retencao_meses = retencao_meses
+        # a thread do gravador anexa e arquiva enquanto a interface lê
+        self._trava = threading.RLock()
+        self._abertas = {}
+        # journals de meses já comprimidos e .gz descartados pela retenção: só são apagados em
+        # liberar_fechadas(), depois que a interface trocou as páginas que ainda os leem
+        self._retiradas = {}
+        self._descartados = []
+
+    # --- partições ---
+
+    def _fechadas(self):
+        try:
+            with open(self.arquivo_manifesto, 'r', encoding='utf-8') as f:
+                return json.load(f)['fechadas']
+        except (FileNotFoundError, ValueError, KeyError, TypeError):
+            return {}
+
+    def _caminho_arquivada(self, mes):
+        return os.path.join(self.pasta, f'paradas-{mes}.jsonl.gz')
+
+    def _aberta(self, mes):
+        with self._trava:
+            particao = self._abertas.get(mes)
+            if particao is None:
+                particao = self._abertas[mes] = ParticaoAberta(self.pasta, mes)
+            return particao
+
+    def _meses_abertos(self):
+        meses = []
+        for caminho in glob.glob(os.path.join(self.pasta, 'paradas-*.jsonl')):
+            mes = os.path.basename(caminho)[len('paradas-'):-len('.jsonl')]
+            if re.match(r'^\d{4}-\d{2}$', mes) and mes not in self._retiradas:
+                meses.append(mes)
+        return meses
+
+    def _particoes(self, data_inicial=None, data_final=None):
+        # [(mês, totais da parte fechada ou None, partição aberta ou None)] que cruzam o período
+        with self._trava:
+            fechadas = self._fechadas()
+            abertos = set(self._meses_abertos())
+            particoes = []
+            for mes in sorted(set(fechadas) | abertos):
+                if data_inicial and mes < data_inicial[:7]:
+                    continue
+                if data_final and mes > data_final[:7]:
+                    continue
+                particoes.append((mes, fechadas.get(mes), self._aberta(mes) if mes in abertos else None))
+            return particoes
+
+    def arquivar(self, agora=None):
+        # fecha os meses que já passaram da carência e aplica a retenção; roda no gravador, na
+        # abertura e num timer da interface, ou pela CLI. devolve (meses fechados, meses descartados)
+        agora = agora or datetime.now()
+        mes_atual = agora.strftime('%Y-%m')
+        fechados = []
+        descartados = []
+        with self._trava:
+            for mes in sorted(self._meses_abertos()):
+                fim_do_mes = datetime.strptime(_mes_seguinte(mes) + '-01', '%Y-%m-%d')
+                if mes < mes_atual and agora >= fim_do_mes + timedelta(days=self.carencia_dias):
+                    self._fechar(mes)
+                    fechados.append(mes)
+            if self.retencao_meses:
+                limite = _meses_antes(mes_atual, self.retencao_meses)
+                fechadas = self._fechadas()
+                for mes in sorted(fechadas):
+                    if mes < limite:
+                        del fechadas[mes]
+                        descartados.append(mes)
+                if descartados:
+                    self._salvar_manifesto(fechadas)
+                    self._descartados += [self._caminho_arquivada(mes) for mes in descartados]
+        return fechados, descartados
+
+    def liberar_fechadas(self):
+        # apaga o que arquivar() tirou das consultas; chamado depois que as páginas abertas
+        # foram refeitas (ou logo em seguida, pela CLI)
+        with self._trava:
+            for particao in self._retiradas.values():
+                particao.apagar()
+            self._retiradas.clear()
+            for caminho in self._descartados:
+                try:
+                    os.remove(caminho)
+                except FileNotFoundError:
+                    pass
+            self._descartados = []
+
+    def _fechar(self, mes):
+        # o que já estava comprimido + o journal do mês vão para um .gz novo, em streaming; paradas
+        # que chegarem atrasadas depois disso reabrem um journal do mês, que é fechado de novo depois
+        particao = self._aberta(mes)
+        destino = self._caminho_arquivada(mes)
+        temporario = destino + '.tmp'
+        # sem duplicatas caso um fechamento anterior tenha sido interrompido antes de apagar o journal
+        ids = set()
+        linhas = 0
+
+        def copiar(f):
+            nonlocal linhas
+            for origem, so_novos in ((_ler_arquivada(destino), False), (particao.journal.iterar(), True)):
+                for registro in origem:
+                    if so_novos and registro.get('id') in ids:
+                        continue
+                    ids.add(registro.get('id'))
+                    linhas += 1
+                    f.write((json.dumps(registro, ensure_ascii=False) + '\n').encode('utf-8'))
+                    yield registro
+
+        with gzip.open(temporario, 'wb') as f:
+            processos, motivos, total_tempo = _somar(copiar(f))
+        fechadas = self._fechadas()
+        fechadas[mes] = {'linhas': linhas, 'processos': processos, 'motivos': motivos,
+                         'total_tempo': total_tempo}
+        os.replace(temporario, destino)
+        self._salvar_manifesto(fechadas)
+        # o journal sai das consultas agora, mas só é apagado em liberar_fechadas()
+        self._retiradas[mes] = self._abertas.pop(mes)
+
+    def _salvar_manifesto(self, fechadas):
+        gravar_json_atomico(self.arquivo_manifesto, {'fechadas': fechadas}, sincronizar=True)
+
+    # --- interface do backend ---
+
+    def existe(self):
+        return bool(self._fechadas()) or any(self._aberta(mes).journal.tamanho() for mes in self._meses_abertos())
+
+    def anexar_varios(self, registros):
+        por_mes = OrderedDict()
+        for registro in registros:
+            por_mes.setdefault(mes_do_registro(registro), []).append(registro)
+        with self._trava:
+            if any(mes in self._retiradas for mes in por_mes):
+                self.liberar_fechadas()  # parada atrasada de um mês recém-fechado: journal novo
+        for mes, lote in por_mes.items():
+            self._aberta(mes).journal.anexar_varios(lote)
+
+    def apos_gravar(self):
+        # o arquivamento não roda aqui: fechar um mês regrava o .gz inteiro
+        for mes in self._meses_abertos():
+            particao = self._aberta(mes)
+            particao.rollups.atualizar()
+            particao.indice.atualizar()
+
+    def iterar(self):
+        return self.consultar()
+
+    def consultar(self, **filtros):
+        for mes, fechada, aberta in self._particoes(filtros.get('data_inicial'), filtros.get('data_final')):
+            if fechada is not None:
+                yield from _filtrar(_ler_arquivada(self._caminho_arquivada(mes)), **filtros)
+            if aberta is not None:
+                yield from aberta.consultar(filtros)
+
+    def contem_ids(self, ids):
+        # registros sem confirmação são recentes: estão no fim de um journal aberto ou, se o
+        # mês foi fechado logo depois da gravação, na partição fechada mais recente
+        ids = set(ids)
+        encontrados = set()
+        for mes in self._meses_abertos():
+            encontrados |= ids & self._aberta(mes).journal.ids_no_final()
+        fechadas = self._fechadas()
+        if ids - encontrados and fechadas:
+            arquivados = _ler_arquivada(self._caminho_arquivada(max(fechadas)))
+            encontrados |= ids & {registro.get('id') for registro in arquivados}
+        return encontrados
+
+    def _fontes(self, filtros):
+        fontes = []
+        for mes, fechada, aberta in self._particoes(filtros.get('data_inicial'), filtros.get('data_final')):
+            if fechada is not None:
+                fontes.append(PaginasArquivadas(self._caminho_arquivada(mes), fechada['linhas'], filtros))
+            if aberta is not None:
+                fontes.append(aberta.filtrar(filtros))
+        return fontes
+
+    def paginas(self):
+        return PaginasParticionadas(self._fontes({})) if self.existe() else None
+
+    def filtrar(self, **filtros):
+        return PaginasParticionadas(self._fontes(filtros)) if self.existe() else None
+
+    def totais(self, **filtros):
+        if any(filtros.values()):
+            return super().totais(**filtros)  # só os meses do período são lidos
+        if not self.existe():
+            return None
+        # meses fechados já têm os totais no manifesto; os abertos, nos rollups
+        dados_processos = {}
+        dados_motivos = {}
+        total_tempo = 0.0
+        for _, fechada, aberta in self._particoes():
+            partes = []
+            if fechada is not None:
+                partes.append((fechada['processos'], fechada['motivos'], fechada['total_tempo']))
+            if aberta is not None:
+                aberta.rollups.atualizar()
+                partes.append((aberta.rollups.totais_processos(), aberta.rollups.totais_motivos(),
+                               aberta.rollups.total_tempo))
+            for processos, motivos, tempo in partes:
+                for chave, valor in processos.items():
+                    dados_processos[chave] = dados_processos.get(chave, 0) + valor
+                for chave, valor in motivos.items():
+                    dados_motivos[chave] = dados_motivos.get(chave, 0) + valor
+                total_tempo += tempo
+        return dados_processos, dados_motivos, total_tempo
+
+    def modificado_em(self):
+        caminhos = [self.arquivo_manifesto] + [self._aberta(mes).journal.caminho for mes in self._meses_abertos()]
+        tempos = [os.path.getmtime(c) for c in caminhos if os.path.exists(c)]
+        return max(tempos) if tempos else None
+
+    def assinatura(self):
+        return _assinatura_arquivos([self.arquivo_manifesto] + [self._aberta(mes).journal.caminho
+                                                                for mes in self._meses_abertos()])
+
+    def apagar(self):
+        with self._trava:
+            self.liberar_fechadas()
+            for mes in self._meses_abertos():
+                self._aberta(mes).apagar()
+            self._abertas.clear()
+            for mes in self._fechadas():
+                try:
+                    os.remove(self._caminho_arquivada(mes))
+                except FileNotFoundError:
+                    pass
+            if os.path.exists(self.arquivo_manifesto):
+                os.remove(self.arquivo_manifesto)
+
+
+BACKENDS = {
+    BackendJournal.nome: BackendJournal,
+    BackendSQLite.nome: BackendSQLite,
+    BackendPlanilha.nome: BackendPlanilha,
+    BackendCompartilhado.nome: BackendCompartilhado,
+    BackendMensal.nome: BackendMensal,
+}
+
+
+def criar_backend(nome, diretorio, estacao=None, carencia_dias=2, retencao_meses=0):
+    if nome == BackendCompartilhado.nome:
+        return BackendCompartilhado(diretorio, estacao)
+    if nome == BackendMensal.nome:
+        return BackendMensal(diretorio, carencia_dias, retencao_meses)
+    return BACKENDS.get(nome, BackendJournal)(diretorio)
+
+
+def importar_historico_existente(backend, diretorio):
+    # primeira execução de um backend vazio: traz o journal (se houver) ou a planilha antiga
+    if backend.nome == BackendPlanilha.nome or backend.existe():
+        return 0
+    journal = JournalHistorico(os.path.join(diretorio, ARQUIVO_JOURNAL))
+    if backend.nome != BackendJournal.nome and journal.existe():
+        registros = list(journal.iterar())
+        backend.anexar_varios(registros)
+        backend.apos_gravar()
+        return len(registros)
+    total = importar_planilha(os.path.join(diretorio, ARQUIVO_EXCEL), backend)
+    backend.apos_gravar()
+    return total
+
+
+def migrar_planilha_para_sqlite(arquivo_excel, diretorio):
+    # migração única de uma paradas.xlsx existente para o banco SQLite do diretório
+    backend = BackendSQLite(diretorio)
+    return importar_planilha(arquivo_excel, backend)
+
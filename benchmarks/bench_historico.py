@@ -0,0 +1,336 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from itertools import islice
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import analise  # noqa: E402
+import graficos  # noqa: E402
+from armazenamento import TURNOS, GravadorEmSegundoPlano, ParadasAtivasWAL  # noqa: E402
+from backends_historico import BACKENDS, criar_backend  # noqa: E402
+from gerador_dados import gerar_registros, gerar_paradas_ativas  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows: só o pico do tracemalloc é informado
+    resource = None
+
+# mede como o histórico escala com o número de paradas, sem abrir a interface:
+#   anexar             -> salvar_parada_historico (gravador + rollups/índice), latência por parada
+#   carregar_historico -> atualizar_historico (backend novo, total e primeira/última página)
+#   filtrar            -> atualizar_historico com filtros de processo e turno
+#   agregar            -> totais dos gráficos (rollups no journal, GROUP BY no SQLite)
+#   indicadores        -> carregar_colunas + calcular_indicadores da aba de indicadores
+#   disponibilidade    -> calcular_disponibilidade (união das paradas por processo e turno)
+#   preparar_graficos  -> gerar_graficos_historicos (totais + chaves) e um gráfico renderizado
+#   carregar_ativas    -> carregar_paradas_ativas (snapshot + replay do log)
+# cada caso (backend x tamanho) roda num processo novo, para o pico de memória ser só dele.
+#   python benchmarks/bench_historico.py --tamanhos 1000 10000 --saida resultado.json
+#   python benchmarks/bench_historico.py --comparar resultado.json --tolerancia 0.25
+
+TAMANHOS_PADRAO = (1000, 10000, 100000, 1000000)
+BACKENDS_PADRAO = ('journal', 'sqlite')
+# a planilha relê o arquivo inteiro a cada consulta: acima disto o caso é pulado
+LIMITE_XLSX = 10000
+ATIVAS_PADRAO = (10, 100, 1000)
+TAMANHO_LOTE = 5000
+ANEXOS_MEDIDOS = 200
+# cada anexo na planilha regrava o arquivo inteiro
+ANEXOS_MEDIDOS_XLSX = 10
+LARGURA_GRAFICO = 800
+
+
+def _resumo(tempos):
+    ordenados = sorted(tempos)
+    return {
+        'mediana_s': statistics.median(ordenados),
+        'p95_s': ordenados[min(len(ordenados) - 1, int(len(ordenados) * 0.95))],
+        'minimo_s': ordenados[0],
+        'maximo_s': ordenados[-1],
+        'amostras': len(ordenados)
+    }
+
+
+class Medidor:
+    # cronometra as fases de um caso; com tracemalloc, guarda também o pico de cada fase
+    def __init__(self, memoria=False):
+        self.memoria = memoria
+        self.fases = {}
+
+    def medir(self, nome, funcao, repeticoes=1):
+        tempos = []
+        pico = 0
+        for _ in range(repeticoes):
+            if self.memoria:
+                tracemalloc.start()
+            inicio = time.perf_counter()
+            resultado = funcao()
+            tempos.append(time.perf_counter() - inicio)
+            if self.memoria:
+                pico = max(pico, tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+        self.fases[nome] = _resumo(tempos)
+        if self.memoria:
+            self.fases[nome]['pico_tracemalloc_mb'] = pico / 2 ** 20
+        return resultado
+
+    def registrar(self, nome, tempos, **extras):
+        self.fases[nome] = dict(_resumo(tempos), **extras)
+
+
+def _pico_rss_mb():
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    return pico / 2 ** 20 if sys.platform == 'darwin' else pico / 2 ** 10
+
+
+def _popular(backend, tamanho):
+    # carga inicial em lotes, como a importação da CLI
+    registros = gerar_registros(tamanho)
+    while True:
+        lote = list(islice(registros, TAMANHO_LOTE))
+        if not lote:
+            break
+        backend.anexar_varios(lote)
+    backend.apos_gravar()
+
+
+def _medir_anexos(backend, quantidade):
+    # caminho do salvar_parada_historico: enfileira no gravador e espera a confirmação,
+    # que só chega depois da escrita e do gancho (rollups/índice)
+    gravador = GravadorEmSegundoPlano(intervalo=0)
+    gravador.registrar_gancho(backend, backend.apos_gravar)
+    gravador.iniciar()
+    tempos = []
+    try:
+        for registro in gerar_registros(quantidade, semente=7, inicio=datetime(2031, 1, 1)):
+            inicio = time.perf_counter()
+            gravador.anexar(backend, registro, lambda erro: None)
+            _, erro = gravador.confirmacoes.get(timeout=60)
+            tempos.append(time.perf_counter() - inicio)
+            if erro is not None:
+                raise erro
+    finally:
+        gravador.encerrar(timeout=60)
+    return tempos
+
+
+def _carregar_historico(nome, diretorio):
+    # backend novo a cada repetição: inclui ler rollups e índice do disco
+    backend = criar_backend(nome, diretorio, 'bench')
+    paginas = backend.paginas()
+    total = paginas.total()
+    for indice in list(range(min(total, 50))) + list(range(max(total - 50, 0), total)):
+        paginas.linha(indice)
+    return total
+
+
+def _filtrar(nome, diretorio):
+    backend = criar_backend(nome, diretorio, 'bench')
+    paginas = backend.filtrar(processo='Raku-Raku', turno='1º turno')
+    total = paginas.total()
+    for indice in range(min(total, 50)):
+        paginas.linha(indice)
+    return total
+
+
+def _preparar_graficos(backend):
+    dados_processos, dados_motivos, total_tempo = backend.totais()
+    return [graficos.chave_grafico(dados, titulo, total_tempo, LARGURA_GRAFICO, '#2b2b2b')
+            for dados, titulo in ((dados_processos, "Tempo de Parada por Processo"),
+                                  (dados_motivos, "Tempo de Parada por Motivo"))]
+
+
+def _renderizar_grafico(backend):
+    _, dados_motivos, total_tempo = backend.totais()
+    return graficos.renderizar_barras_porcentagem(dados_motivos, "Tempo de Parada por Motivo", total_tempo,
+                                                  LARGURA_GRAFICO, '#2b2b2b')
+
+
+def _indicadores(backend):
+    colunas = analise.carregar_colunas(backend.iterar())
+    return analise.calcular_indicadores(colunas, 'processo'), analise.calcular_indicadores(colunas, 'motivo')
+
+
+def _disponibilidade(backend):
+    colunas = analise.carregar_colunas(backend.iterar())
+    return analise.calcular_disponibilidade(colunas, {nome: 480 for nome, _, _ in TURNOS})
+
+
+def caso_historico(nome, tamanho, repeticoes, memoria):
+    medidor = Medidor(memoria)
+    with tempfile.TemporaryDirectory(prefix='bench_paradas_') as diretorio:
+        backend = criar_backend(nome, diretorio, 'bench')
+        medidor.medir('popular', lambda: _popular(backend, tamanho))
+        anexos = ANEXOS_MEDIDOS_XLSX if nome == 'xlsx' else ANEXOS_MEDIDOS
+        medidor.registrar('anexar', _medir_anexos(backend, anexos))
+        medidor.medir('carregar_historico', lambda: _carregar_historico(nome, diretorio), repeticoes)
+        medidor.medir('filtrar', lambda: _filtrar(nome, diretorio), repeticoes)
+        medidor.medir('agregar', lambda: criar_backend(nome, diretorio, 'bench').totais(), repeticoes)
+        medidor.medir('indicadores', lambda: _indicadores(backend), repeticoes)
+        medidor.medir('disponibilidade', lambda: _disponibilidade(backend), repeticoes)
+        medidor.medir('preparar_graficos', lambda: _preparar_graficos(backend), repeticoes)
+        medidor.medir('renderizar_grafico', lambda: _renderizar_grafico(backend), repeticoes)
+    return medidor.fases
+
+
+def caso_ativas(quantidade, repeticoes, memoria):
+    # metade das paradas segue ativa e a outra metade foi finalizada sem confirmação do
+    # histórico: o pior caso do replay, com o log inteiro ainda por compactar
+    medidor = Medidor(memoria)
+    with tempfile.TemporaryDirectory(prefix='bench_ativas_') as diretorio:
+        wal = ParadasAtivasWAL(os.path.join(diretorio, 'paradas_ativas.json'),
+                               os.path.join(diretorio, 'paradas_ativas.wal'),
+                               limite_compactacao=quantidade * 2)
+        wal.carregar()
+        tempos = []
+        for i, parada in enumerate(gerar_paradas_ativas(quantidade)):
+            inicio = time.perf_counter()
+            wal.iniciar(parada)
+            tempos.append(time.perf_counter() - inicio)
+            if i % 2:
+                wal.finalizar(parada['id'], {'id': parada['id'], 'processo': parada['processo']})
+        medidor.registrar('iniciar_parada', tempos)
+        medidor.medir('carregar_ativas', lambda: ParadasAtivasWAL(wal.arquivo_snapshot, wal.arquivo_log).carregar(),
+                      repeticoes)
+        medidor.medir('compactar_ativas', wal.compactar)
+        medidor.medir('carregar_ativas_compactadas',
+                      lambda: ParadasAtivasWAL(wal.arquivo_snapshot, wal.arquivo_log).carregar(), repeticoes)
+    return medidor.fases
+
+
+def _executar_caso(tipo, nome, tamanho, repeticoes, memoria):
+    comando = [sys.executable, os.path.abspath(__file__), '--caso', tipo, nome, str(tamanho),
+               '--repeticoes', str(repeticoes)]
+    if memoria:
+        comando.append('--tracemalloc')
+    saida = subprocess.run(comando, cwd=RAIZ, capture_output=True, text=True)
+    if saida.returncode != 0:
+        return {'erro': (saida.stderr.strip().splitlines() or ['falhou'])[-1]}
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+
+def _versao():
+    try:
+        saida = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True,
+                               text=True, check=True)
+        return saida.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def executar(tamanhos, backends, ativas, repeticoes, memoria, progresso=None):
+    casos = [('historico', nome, tamanho) for nome in backends for tamanho in tamanhos
+             if not (nome == 'xlsx' and tamanho > LIMITE_XLSX)]
+    casos += [('ativas', 'wal', quantidade) for quantidade in ativas]
+    resultados = []
+    for tipo, nome, tamanho in casos:
+        if progresso:
+            progresso(f"{nome} {tamanho}...")
+        resultado = _executar_caso(tipo, nome, tamanho, repeticoes, memoria)
+        resultados.append(dict(resultado, backend=nome, linhas=tamanho))
+    return {
+        'versao': _versao(),
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'repeticoes': repeticoes,
+        'resultados': resultados
+    }
+
+
+def comparar(atual, base, tolerancia):
+    # regressão: mediana de uma fase mais lenta que a da base além da tolerância
+    anteriores = {(r['backend'], r['linhas']): r for r in base['resultados']}
+    regressoes = []
+    for resultado in atual['resultados']:
+        anterior = anteriores.get((resultado['backend'], resultado['linhas']))
+        if anterior is None or 'erro' in resultado or 'erro' in anterior:
+            continue
+        for fase, dados in resultado['fases'].items():
+            referencia = anterior['fases'].get(fase)
+            if referencia and referencia['mediana_s'] > 0:
+                razao = dados['mediana_s'] / referencia['mediana_s']
+                if razao > 1 + tolerancia:
+                    regressoes.append((resultado['backend'], resultado['linhas'], fase, razao))
+    return regressoes
+
+
+def imprimir(resultado):
+    print(f"versão {resultado['versao'] or '?'} • Python {resultado['python']} • {resultado['plataforma']}")
+    for caso in resultado['resultados']:
+        titulo = f"{caso['backend']} {caso['linhas']:,}".replace(',', '.')
+        if 'erro' in caso:
+            print(f"\n{titulo}: erro: {caso['erro']}")
+            continue
+        pico = caso.get('pico_rss_mb')
+        print(f"\n{titulo}" + (f" (pico de memória {pico:.1f} MB)" if pico is not None else ''))
+        for fase, dados in caso['fases'].items():
+            linha = (f"  {fase:<28} mediana {dados['mediana_s'] * 1000:10.2f} ms"
+                     f"   p95 {dados['p95_s'] * 1000:10.2f} ms")
+            if 'pico_tracemalloc_mb' in dados:
+                linha += f"   pico {dados['pico_tracemalloc_mb']:8.1f} MB"
+            print(linha)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Escala do histórico de paradas com dados sintéticos")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=TAMANHOS_PADRAO)
+    parser.add_argument('--backends', nargs='+', choices=sorted(BACKENDS), default=BACKENDS_PADRAO)
+    parser.add_argument('--ativas', type=int, nargs='*', default=ATIVAS_PADRAO,
+                        help="quantidades de paradas ativas no log")
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--tracemalloc', action='store_true',
+                        help="pico de memória por fase (deixa as medições mais lentas)")
+    parser.add_argument('--json', action='store_true', help="imprime o resultado em JSON")
+    parser.add_argument('--saida', help="grava o resultado em JSON neste arquivo")
+    parser.add_argument('--comparar', help="resultado anterior (JSON) para detectar regressões")
+    parser.add_argument('--tolerancia', type=float, default=0.25,
+                        help="aumento relativo da mediana aceito na comparação")
+    parser.add_argument('--caso', nargs=3, metavar=('TIPO', 'BACKEND', 'TAMANHO'), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.caso:
+        # execução interna de um caso, no processo filho
+        tipo, nome, tamanho = args.caso
+        if tipo == 'ativas':
+            fases = caso_ativas(int(tamanho), args.repeticoes, args.tracemalloc)
+        else:
+            fases = caso_historico(nome, int(tamanho), args.repeticoes, args.tracemalloc)
+        print(json.dumps({'fases': fases, 'pico_rss_mb': _pico_rss_mb()}))
+        return 0
+
+    progresso = None if args.json else (lambda texto: print(texto, file=sys.stderr))
+    resultado = executar(args.tamanhos, args.backends, args.ativas, args.repeticoes, args.tracemalloc, progresso)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+    if args.json:
+        print(json.dumps(resultado, indent=2, ensure_ascii=False))
+    else:
+        imprimir(resultado)
+
+    falhou = any('erro' in caso for caso in resultado['resultados'])
+    if args.comparar:
+        with open(args.comparar, 'r', encoding='utf-8') as f:
+            regressoes = comparar(resultado, json.load(f), args.tolerancia)
+        for nome, linhas, fase, razao in regressoes:
+            print(f"regressão: {nome} {linhas} {fase} {razao:.2f}x mais lento", file=sys.stderr)
+        falhou = falhou or bool(regressoes)
+    return 1 if falhou else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# mede o custo de importar o sistemaP.py e de abrir a janela até a tela de login.
+# cada medição roda num processo novo (import a frio) com HOME e diretório temporários,
+# para não tocar na configuração nem no histórico de verdade.
+#   python benchmarks/bench_inicializacao.py --repeticoes 5 --limite-import 0.5
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULOS_PESADOS = ('numpy', 'matplotlib', 'openpyxl')
+
+CODIGO_IMPORT = """
+import json, sys, time
+inicio = time.perf_counter()
+import sistemaP
+tempo = time.perf_counter() - inicio
+print(json.dumps({'tempo': tempo, 'carregados': [m for m in %r if m in sys.modules]}))
+""" % (MODULOS_PESADOS,)
+
+CODIGO_JANELA = """
+import json, sys, time
+inicio = time.perf_counter()
+import sistemaP
+try:
+    app = sistemaP.AplicativoMobile()
+except Exception as e:  # sem display (servidor/CI): só o import é medido
+    print(json.dumps({'erro': str(e)}))
+    sys.exit(0)
+app.update()
+tempo = time.perf_counter() - inicio
+app.ao_fechar()
+print(json.dumps({'tempo': tempo, 'carregados': [m for m in %r if m in sys.modules]}))
+""" % (MODULOS_PESADOS,)
+
+
+def medir(codigo):
+    with tempfile.TemporaryDirectory() as pasta:
+        ambiente = dict(os.environ, HOME=pasta, USERPROFILE=pasta, PYTHONPATH=RAIZ,
+                        PYTHONDONTWRITEBYTECODE='1')
+        saida = subprocess.run([sys.executable, '-c', codigo], cwd=pasta, env=ambiente,
+                               capture_output=True, text=True, check=True)
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+
+def executar(repeticoes):
+    resultado = {}
+    for nome, codigo in (('import', CODIGO_IMPORT), ('tela_login', CODIGO_JANELA)):
+        medicoes = [medir(codigo) for _ in range(repeticoes)]
+        if any('erro' in m for m in medicoes):
+            resultado[nome] = {'erro': medicoes[0].get('erro')}
+            continue
+        tempos = [m['tempo'] for m in medicoes]
+        resultado[nome] = {
+            'mediana_s': statistics.median(tempos),
+            'minimo_s': min(tempos),
+            'maximo_s': max(tempos),
+            'modulos_pesados': medicoes[-1]['carregados'],
+        }
+    return resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tempo de import e de abertura do sistemaP")
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--limite-import', type=float, help="falha se a mediana do import passar disto (s)")
+    parser.add_argument('--json', action='store_true', help="imprime o resultado em JSON")
+    args = parser.parse_args(argv)
+
+    resultado = executar(args.repeticoes)
+    if args.json:
+        print(json.dumps(resultado, indent=2))
+    else:
+        for nome, dados in resultado.items():
+            if 'erro' in dados:
+                print(f"{nome:<12} não medido: {dados['erro']}")
+            else:
+                pesados = ', '.join(dados['modulos_pesados']) or 'nenhum'
+                print(f"{nome:<12} mediana {dados['mediana_s'] * 1000:7.1f} ms "
+                      f"(mín {dados['minimo_s'] * 1000:.1f}, máx {dados['maximo_s'] * 1000:.1f}) "
+                      f"módulos pesados: {pesados}")
+
+    # regressões: o import não pode voltar a puxar numpy/matplotlib/openpyxl nem passar do limite
+    falhou = bool(resultado['import']['modulos_pesados'])
+    if args.limite_import is not None and resultado['import']['mediana_s'] > args.limite_import:
+        falhou = True
+    return 1 if falhou else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
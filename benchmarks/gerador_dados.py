@@ -0,0 +1,93 @@
+import random
+from datetime import datetime, timedelta
+from catalogo import PROCESSOS, MOTIVOS_POR_PROCESSO
+
+# histórico sintético de paradas com os processos e motivos reais da linha.
+# mesma semente, mesmos registros: as medições de versões diferentes usam os mesmos dados.
+#   from gerador_dados import gerar_registros  (com a raiz do projeto no sys.path)
+#   registros = list(gerar_registros(10000))
+
+# a pintura (Raku-Raku) e o descarregamento com robôs param mais que o resto da linha
+PESOS_PROCESSOS = {'Carregamento': 2, 'Raku-Raku': 4, 'Inspeção': 1, 'Descarregamento': 3}
+FUNCIONARIOS_POR_TURNO = 6
+PARADAS_POR_DIA = 80
+TEXTOS_OUTROS = [
+    'Falta de energia', 'Queda de rede', 'Reunião de segurança', 'Limpeza da linha',
+    'Troca de ferramenta', 'Aguardando manutenção', 'Setup', 'Treinamento'
+]
+
+
+def _id(rng):
+    return '%032x' % rng.getrandbits(128)
+
+
+def _duracao(rng, motivo):
+    # a maioria das paradas é curta e algumas poucas se arrastam: distribuição log-normal
+    # (mediana ~5 min), com pausas de intervalo em torno de 15 min
+    if motivo == 'Tempo de Pausa intervalos':
+        return round(rng.uniform(10, 20), 4)
+    return round(min(rng.lognormvariate(1.6, 0.9), 480.0), 4)
+
+
+def _motivo(rng, processo, pesos_motivos):
+    motivo = rng.choices(MOTIVOS_POR_PROCESSO[processo], pesos_motivos[processo])[0]
+    if motivo == 'Outros':
+        # no aplicativo o texto digitado no campo 'Outros' vira o motivo
+        return rng.choice(TEXTOS_OUTROS)
+    return motivo
+
+
+def gerar_registros(quantidade, semente=42, inicio=datetime(2024, 1, 1), paradas_por_dia=PARADAS_POR_DIA):
+    # registros no formato do journal, em ordem cronológica; é um gerador, então 1M de
+    # linhas não precisam caber na memória de uma vez
+    rng = random.Random(semente)
+    processos = list(PROCESSOS)
+    pesos_processos = [PESOS_PROCESSOS.get(processo, 1) for processo in processos]
+    # poucos motivos concentram a maior parte das paradas (Pareto): peso 1/posição no catálogo
+    pesos_motivos = {
+        processo: [1 / (posicao + 1) for posicao in range(len(motivos))]
+        for processo, motivos in MOTIVOS_POR_PROCESSO.items()
+    }
+    funcionarios = [f'Operador {numero:02d}' for numero in range(1, FUNCIONARIOS_POR_TURNO * 3 + 1)]
+
+    gerados = 0
+    dia = inicio
+    while gerados < quantidade:
+        paradas_do_dia = min(quantidade - gerados, max(1, int(rng.gauss(paradas_por_dia, paradas_por_dia / 5))))
+        for segundo in sorted(rng.randrange(86400) for _ in range(paradas_do_dia)):
+            comeco = dia + timedelta(seconds=segundo)
+            processo = rng.choices(processos, pesos_processos)[0]
+            motivo = _motivo(rng, processo, pesos_motivos)
+            duracao = _duracao(rng, motivo)
+            fim = comeco + timedelta(minutes=duracao)
+            # cada turno tem a sua equipe de operadores
+            turno = 0 if 6 <= comeco.hour < 14 else 1 if 14 <= comeco.hour < 22 else 2
+            yield {
+                'id': _id(rng),
+                'data': comeco.strftime('%Y-%m-%d'),
+                'processo': processo,
+                'funcionario': funcionarios[turno * FUNCIONARIOS_POR_TURNO + rng.randrange(FUNCIONARIOS_POR_TURNO)],
+                'motivo': motivo,
+                'inicio': comeco.strftime('%H:%M:%S'),
+                'fim': fim.strftime('%H:%M:%S'),
+                'duracao': duracao
+            }
+        gerados += paradas_do_dia
+        dia += timedelta(days=1)
+
+
+def gerar_paradas_ativas(quantidade, semente=42, agora=None):
+    # paradas em andamento no formato serializado do ParadasAtivasWAL (início em texto)
+    rng = random.Random(semente)
+    agora = agora or datetime.now()
+    for registro in gerar_registros(quantidade, semente=rng.randrange(2 ** 32)):
+        comeco = agora - timedelta(minutes=rng.uniform(0, 120))
+        yield {
+            'id': registro['id'],
+            'funcionario': registro['funcionario'],
+            'processo': registro['processo'],
+            'motivo': registro['motivo'],
+            'inicio': comeco.strftime('%Y-%m-%d %H:%M:%S'),
+            'fim': None,
+            'duracao': None
+        }
@@ -0,0 +1,50 @@
+import importlib
+import threading
+
+# módulos pesados que a tela de login não usa; aquecidos em segundo plano depois do login
+MODULOS_PESADOS = (
+    'numpy',
+    'openpyxl',
+    'matplotlib.figure',
+    'matplotlib.backends.backend_agg',
+    'analise',
+    'graficos',
+    'relatorio_excel',
+)
+
+
+class ModuloTardio:
+    # representa um módulo que só é importado no primeiro acesso a um atributo
+    def __init__(self, nome):
+        self._nome = nome
+        self._modulo = None
+
+    def _carregar(self):
+        if self._modulo is None:
+            # o import do Python já é protegido por trava: carregar junto com o aquecimento é seguro
+            self._modulo = importlib.import_module(self._nome)
+        return self._modulo
+
+    def carregado(self):
+        return self._modulo is not None
+
+    def __getattr__(self, atributo):
+        return getattr(self._carregar(), atributo)
+
+
+def modulo_tardio(nome):
+    return ModuloTardio(nome)
+
+
+def aquecer_modulos(nomes=MODULOS_PESADOS):
+    # importa os módulos numa thread daemon, para a primeira abertura do histórico não esperar
+    def tarefa():
+        for nome in nomes:
+            try:
+                importlib.import_module(nome)
+            except ImportError:
+                continue  # o erro aparece de novo, e na tela certa, quando o módulo for usado
+
+    thread = threading.Thread(target=tarefa, name='aquecimento-modulos', daemon=True)
+    thread.start()
+    return thread
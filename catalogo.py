@@ -0,0 +1,28 @@
+# processos da linha e motivos de parada de cada um; sem dependência do Tk,
+# para ser usado também pela CLI e pelos benchmarks
+PROCESSOS = ['Carregamento', 'Raku-Raku', 'Inspeção', 'Descarregamento']
+
+MOTIVOS_POR_PROCESSO = {
+    'Raku-Raku': [
+        'Falta de bandeja', 'Ligar Cabine', 'Acumulo de bandeja', 'Sincronismos',
+        'Alimentação', 'Engate', 'Falta de Dispositivos', 'Troca de Cor',
+        'Falha de Pistola Automática', 'Atraso Aspiração', 'Ar-condicionado Cabine',
+        'Troca de Pintor', 'Falha de Pistola Manual', 'Outros'
+    ],
+    'Carregamento': [
+        'Tempo de Pausa intervalos', 'Falta de peça', 'Temperatura Estufa',
+        'Mal Funcionamento Ebara', 'Falta de Espaço', 'Outros'
+    ],
+    'Inspeção': [
+        'Falta de tinta', 'Lixo na Peça', 'Falta de Colaborador',
+        'Fosfato na peça', 'Falha no Equipamento', 'Outros'
+    ],
+    'Descarregamento': [
+        'HG/ELO Empenado para Robô', 'Queda de HG na Célula do Robô',
+        'Sensor Robô Motoman', 'Sensor Robô Fanuc', 'Trans. Fora de Tempo para Robô',
+        'Power Free Parou', 'Falta de Sincronismo', 'Falha no Pega do Robô',
+        'Falha no Pega Robô Motoman', 'Acumulo de Bandeja no Robô',
+        'Trans. LSA Parou', 'Falha de Pistão/LS Power Free',
+        'Chassi Descendo Moldado', 'Outros'
+    ]
+}
@@ -0,0 +1,229 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from heapq import merge
+from armazenamento import ARQUIVO_EXCEL, ARQUIVO_JOURNAL, gravar_json_atomico, registro_de_linha_excel
+from backends_historico import BackendJournal
+
+# junta as paradas.xlsx de todos os terminais da planta (cada um no seu config['diretorio'])
+# num histórico único. cada planilha é lida num processo separado e só é relida se mudou
+# desde a última execução; as lidas antes ficam como partes em <saida>/estacoes/.
+# a saída é uma pasta de histórico 'journal' comum, que abre no aplicativo e no paradas_cli:
+#   python paradas_cli.py consolidar-planta //servidor/producao --xlsx planta.xlsx
+#   python paradas_cli.py --diretorio //servidor/producao/consolidado_planta resumo --indicadores
+
+PASTA_SAIDA = 'consolidado_planta'
+PASTA_PARTES = 'estacoes'
+ARQUIVO_ESTADO = 'consolidacao.json'
+ARQUIVO_RESUMO = 'resumo_planta.json'
+
+
+def descobrir_planilhas(raiz, ignorar=()):
+    # {estação: caminho} de cada paradas.xlsx abaixo da raiz; a estação é a pasta relativa
+    ignorar = {os.path.abspath(pasta) for pasta in ignorar}
+    encontradas = {}
+    for pasta, subpastas, arquivos in os.walk(raiz):
+        subpastas[:] = sorted(s for s in subpastas
+                              if not s.startswith('.') and os.path.abspath(os.path.join(pasta, s)) not in ignorar)
+        for arquivo in arquivos:
+            if arquivo.lower() == ARQUIVO_EXCEL:
+                relativa = os.path.relpath(pasta, raiz)
+                estacao = os.path.basename(os.path.abspath(raiz)) if relativa == '.' else relativa.replace(os.sep, '/')
+                encontradas[estacao] = os.path.join(pasta, arquivo)
+    return encontradas
+
+
+def _ordem_cronologica(registro):
+    return (registro.get('data') or '', registro.get('inicio') or '')
+
+
+def _parcial_vazio():
+    return {'paradas': 0, 'ignoradas': 0, 'tempo_total': 0.0, 'processos': {}, 'motivos': {}, 'dias': {},
+            'primeira_data': None, 'ultima_data': None}
+
+
+def _acumular(totais, chave, duracao):
+    item = totais.get(chave)
+    if item is None:
+        item = totais[chave] = [0, 0.0]
+    item[0] += 1
+    item[1] += duracao
+
+
+def _acumular_registro(parcial, registro):
+    parcial['paradas'] += 1
+    data = registro['data']
+    if data:
+        if parcial['primeira_data'] is None or data < parcial['primeira_data']:
+            parcial['primeira_data'] = data
+        if parcial['ultima_data'] is None or data > parcial['ultima_data']:
+            parcial['ultima_data'] = data
+    # mesmo critério dos gráficos: ignora linhas sem processo, motivo ou duração
+    duracao = registro['duracao']
+    if registro['processo'] and registro['motivo'] and duracao:
+        parcial['tempo_total'] += duracao
+        _acumular(parcial['processos'], registro['processo'], duracao)
+        _acumular(parcial['motivos'], registro['motivo'], duracao)
+        _acumular(parcial['dias'], data, duracao)
+
+
+def somar_parciais(parciais):
+    soma = _parcial_vazio()
+    for parcial in parciais:
+        soma['paradas'] += parcial['paradas']
+        soma['ignoradas'] += parcial['ignoradas']
+        soma['tempo_total'] += parcial['tempo_total']
+        for campo in ('processos', 'motivos', 'dias'):
+            destino = soma[campo]
+            for chave, (contagem, tempo) in parcial[campo].items():
+                item = destino.setdefault(chave, [0, 0.0])
+                item[0] += contagem
+                item[1] += tempo
+        datas = [d for d in (soma['primeira_data'], parcial['primeira_data']) if d]
+        soma['primeira_data'] = min(datas) if datas else None
+        datas = [d for d in (soma['ultima_data'], parcial['ultima_data']) if d]
+        soma['ultima_data'] = max(datas) if datas else None
+    return soma
+
+
+def ler_estacao(caminho, estacao, destino):
+    # roda num processo do pool: lê a planilha em modo read-only, grava a parte da estação
+    # em ordem cronológica e devolve só os totais parciais
+    from openpyxl import load_workbook
+    parcial = _parcial_vazio()
+    registros = []
+    wb = load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        if 'Paradas' in wb.sheetnames:
+            linhas = wb['Paradas'].iter_rows(min_row=2, max_col=8, values_only=True)
+            for numero_linha, row in enumerate(linhas, start=2):
+                registro = registro_de_linha_excel(row, numero_linha)
+                if registro is None:
+                    if row and any(valor is not None for valor in row) and row[0] != 'TOTAL':
+                        parcial['ignoradas'] += 1
+                    continue
+                registro['estacao'] = estacao
+                _acumular_registro(parcial, registro)
+                registros.append(registro)
+    finally:
+        wb.close()
+    registros.sort(key=_ordem_cronologica)
+    temporario = destino + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        for registro in registros:
+            f.write(json.dumps(registro, ensure_ascii=False) + '\n')
+    os.replace(temporario, destino)
+    return parcial
+
+
+def _linhas_da_parte(caminho):
+    # (chave cronológica, linha) sem reescrever o JSON: a linha vai para o consolidado como está
+    with open(caminho, 'r', encoding='utf-8') as f:
+        for linha in f:
+            if linha.strip():
+                yield _ordem_cronologica(json.loads(linha)), linha
+
+
+def _ler_estado(caminho):
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            estado = json.load(f)
+        estado.setdefault('estacoes', {})
+        return estado
+    except (FileNotFoundError, ValueError):
+        return {'estacoes': {}}
+
+
+def consolidar_planta(raiz, saida=None, trabalhadores=None, forcar=False):
+    # devolve o resumo gravado em resumo_planta.json, com 'lidas', 'reaproveitadas' e 'erros'
+    saida = saida or os.path.join(raiz, PASTA_SAIDA)
+    pasta_partes = os.path.join(saida, PASTA_PARTES)
+    os.makedirs(pasta_partes, exist_ok=True)
+    arquivo_estado = os.path.join(saida, ARQUIVO_ESTADO)
+    estado = _ler_estado(arquivo_estado)
+    anteriores = estado['estacoes']
+
+    planilhas = descobrir_planilhas(raiz, ignorar=(saida,))
+    estacoes = {}
+    pendentes = {}
+    for estacao, caminho in planilhas.items():
+        try:
+            st = os.stat(caminho)
+        except OSError:
+            continue
+        parte = os.path.join(pasta_partes, hashlib.sha1(estacao.encode('utf-8')).hexdigest()[:16] + '.jsonl')
+        entrada = {'caminho': caminho, 'mtime_ns': st.st_mtime_ns, 'tamanho': st.st_size, 'parte': os.path.basename(parte)}
+        anterior = anteriores.get(estacao)
+        if (not forcar and anterior and os.path.exists(parte)
+                and (anterior['mtime_ns'], anterior['tamanho']) == (entrada['mtime_ns'], entrada['tamanho'])):
+            estacoes[estacao] = anterior
+        else:
+            pendentes[estacao] = (entrada, parte)
+
+    erros = {}
+    if pendentes:
+        # openpyxl é CPU puro: um processo por núcleo, cada um com uma planilha por vez
+        with ProcessPoolExecutor(max_workers=min(trabalhadores or os.cpu_count() or 1, len(pendentes))) as pool:
+            futuros = {pool.submit(ler_estacao, entrada['caminho'], estacao, parte): (estacao, entrada)
+                       for estacao, (entrada, parte) in pendentes.items()}
+            for futuro in as_completed(futuros):
+                estacao, entrada = futuros[futuro]
+                try:
+                    entrada['parcial'] = futuro.result()
+                    estacoes[estacao] = entrada
+                except Exception as e:
+                    # planilha aberta ou corrompida: fica a leitura anterior, se houver
+                    erros[estacao] = str(e)
+                    anterior = anteriores.get(estacao)
+                    if anterior and os.path.exists(os.path.join(pasta_partes, anterior['parte'])):
+                        estacoes[estacao] = anterior
+
+    # terminais que saíram da árvore saem também do consolidado
+    for estacao, anterior in anteriores.items():
+        if estacao not in estacoes:
+            try:
+                os.remove(os.path.join(pasta_partes, anterior['parte']))
+            except OSError:
+                pass
+
+    journal = os.path.join(saida, ARQUIVO_JOURNAL)
+    mudou = forcar or set(estacoes) != set(anteriores) or any(
+        estacoes[e] is not anteriores.get(e) for e in estacoes)
+    if mudou or not os.path.exists(journal):
+        # as partes já estão em ordem cronológica: o merge só intercala, em streaming
+        fontes = [_linhas_da_parte(os.path.join(pasta_partes, estacoes[e]['parte'])) for e in sorted(estacoes)]
+        temporario = journal + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            for _, linha in merge(*fontes, key=lambda item: item[0]):
+                f.write(linha)
+        os.replace(temporario, journal)
+        # rollups e índice apontam offsets do journal antigo: são refeitos do zero
+        backend = BackendJournal(saida)
+        backend.rollups.apagar()
+        backend.indice.apagar()
+        backend.apos_gravar()
+
+    planta = somar_parciais(estacoes[e]['parcial'] for e in sorted(estacoes))
+    resumo = {
+        'gerado_em': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'raiz': os.path.abspath(raiz),
+        'planta': planta,
+        'estacoes': {
+            estacao: {
+                'arquivo': estacoes[estacao]['caminho'],
+                'paradas': estacoes[estacao]['parcial']['paradas'],
+                'tempo_total': estacoes[estacao]['parcial']['tempo_total'],
+                'primeira_data': estacoes[estacao]['parcial']['primeira_data'],
+                'ultima_data': estacoes[estacao]['parcial']['ultima_data']
+            }
+            for estacao in sorted(estacoes)
+        },
+        'lidas': sorted(e for e in pendentes if e in estacoes and e not in erros),
+        'reaproveitadas': sorted(e for e in estacoes if e not in pendentes),
+        'erros': erros
+    }
+    gravar_json_atomico(os.path.join(saida, ARQUIVO_RESUMO), resumo)
+    gravar_json_atomico(arquivo_estado, {'estacoes': estacoes})
+    return resumo
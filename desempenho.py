@@ -0,0 +1,176 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from logging.handlers import RotatingFileHandler
+
+# tempos das operações de disco e de desenho, para saber onde a interface demora:
+#   @cronometrado('atualizar_historico')      em funções e métodos
+#   with medir('abrir_planilha'): ...        em trechos de código
+# cada operação guarda as últimas medições (p50/p95 na tela de configurações); as que passam
+# do limite vão para um log rotativo no diretório de dados, com o perfil do cProfile se ativado
+
+ARQUIVO_OPERACOES_LENTAS = 'operacoes_lentas.log'
+DIRETORIO_PERFIS = 'perfis'
+# limite superior (ms) de cada faixa do histograma; a última faixa é "acima de 5 s"
+FAIXAS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+TAMANHO_LOG = 512 * 1024
+COPIAS_LOG = 3
+
+
+def _percentil(ordenadas, p):
+    if not ordenadas:
+        return None
+    return ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * p / 100))]
+
+
+class HistogramaLatencia:
+    # janela móvel com as últimas medições de uma operação
+    def __init__(self, janela=500):
+        self.amostras = deque(maxlen=janela)
+        self.total = 0
+
+    def registrar(self, segundos):
+        self.amostras.append(segundos)
+        self.total += 1
+
+    def percentil(self, p):
+        return _percentil(sorted(self.amostras), p)
+
+    def faixas(self):
+        contagem = [0] * (len(FAIXAS_MS) + 1)
+        for segundos in self.amostras:
+            ms = segundos * 1000
+            i = 0
+            while i < len(FAIXAS_MS) and ms > FAIXAS_MS[i]:
+                i += 1
+            contagem[i] += 1
+        return contagem
+
+
+class Instrumentacao:
+    # usada ao mesmo tempo pela interface, pelo gravador e pelo renderizador de gráficos
+    def __init__(self, janela=500):
+        self.janela = janela
+        self.limite_lento = 0.25
+        self.perfilar = False
+        self.diretorio = None
+        self._trava = threading.Lock()
+        self._histogramas = {}
+        self._local = threading.local()
+        self._log = logging.getLogger('paradas.desempenho')
+        self._log.setLevel(logging.INFO)
+        self._log.propagate = False
+        # sem diretório configurado (paradas_cli, benchmarks) as operações lentas não vão para o stderr
+        self._log.addHandler(logging.NullHandler())
+        self._arquivo_log = None
+
+    def configurar(self, diretorio, limite_lento_ms=250, perfilar=False):
+        # chamado na abertura e sempre que o diretório de dados muda
+        self.limite_lento = limite_lento_ms / 1000
+        self.perfilar = perfilar
+        if diretorio == self.diretorio:
+            return
+        if self._arquivo_log is not None:
+            self._log.removeHandler(self._arquivo_log)
+            self._arquivo_log.close()
+            self._arquivo_log = None
+        self.diretorio = diretorio
+        try:
+            self._arquivo_log = RotatingFileHandler(os.path.join(diretorio, ARQUIVO_OPERACOES_LENTAS),
+                                                    maxBytes=TAMANHO_LOG, backupCount=COPIAS_LOG,
+                                                    encoding='utf-8', delay=True)
+        except OSError:
+            return  # sem log em disco; os histogramas continuam na memória
+        self._arquivo_log.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        self._log.addHandler(self._arquivo_log)
+
+    def registrar(self, nome, segundos, perfil=None):
+        with self._trava:
+            histograma = self._histogramas.get(nome)
+            if histograma is None:
+                histograma = self._histogramas[nome] = HistogramaLatencia(self.janela)
+            histograma.registrar(segundos)
+        if segundos >= self.limite_lento:
+            self._operacao_lenta(nome, segundos, perfil)
+
+    def _operacao_lenta(self, nome, segundos, perfil):
+        mensagem = f"{nome} {segundos * 1000:.0f} ms [{threading.current_thread().name}]"
+        if perfil is not None and self.diretorio:
+            try:
+                pasta = os.path.join(self.diretorio, DIRETORIO_PERFIS)
+                os.makedirs(pasta, exist_ok=True)
+                arquivo = os.path.join(pasta, f"{datetime.now():%Y%m%d-%H%M%S-%f}-{nome}.prof")
+                perfil.dump_stats(arquivo)
+                mensagem += f" perfil: {arquivo}"
+            except OSError:
+                pass
+        try:
+            self._log.warning(mensagem)
+        except Exception:
+            pass  # o log nunca pode derrubar a operação medida
+
+    def _iniciar_perfil(self):
+        # só a operação mais externa de cada thread é perfilada; o cProfile também não
+        # aceita dois perfis ativos ao mesmo tempo em algumas versões do Python
+        if not self.perfilar or getattr(self._local, 'perfilando', False):
+            return None
+        import cProfile
+        perfil = cProfile.Profile()
+        try:
+            perfil.enable()
+        except ValueError:
+            return None
+        self._local.perfilando = True
+        return perfil
+
+    @contextmanager
+    def medir(self, nome):
+        perfil = self._iniciar_perfil()
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            segundos = time.perf_counter() - inicio
+            if perfil is not None:
+                perfil.disable()
+                self._local.perfilando = False
+            self.registrar(nome, segundos, perfil)
+
+    def cronometrado(self, nome=None):
+        def decorador(funcao):
+            rotulo = nome or funcao.__name__
+
+            @wraps(funcao)
+            def medida(*args, **kwargs):
+                with self.medir(rotulo):
+                    return funcao(*args, **kwargs)
+            return medida
+        return decorador
+
+    def resumo(self):
+        # [(operação, medições desde a abertura, p50 s, p95 s, máximo s)] da janela atual
+        with self._trava:
+            histogramas = {nome: (h.total, list(h.amostras)) for nome, h in self._histogramas.items()}
+        linhas = []
+        for nome in sorted(histogramas):
+            total, amostras = histogramas[nome]
+            ordenadas = sorted(amostras)
+            linhas.append((nome, total, _percentil(ordenadas, 50), _percentil(ordenadas, 95), ordenadas[-1]))
+        return linhas
+
+    def faixas(self, nome):
+        with self._trava:
+            histograma = self._histogramas.get(nome)
+            return histograma.faixas() if histograma is not None else [0] * (len(FAIXAS_MS) + 1)
+
+
+# instância única do processo: os módulos de armazenamento e de gráficos medem sem
+# precisar receber o objeto da interface
+monitor = Instrumentacao()
+medir = monitor.medir
+cronometrado = monitor.cronometrado
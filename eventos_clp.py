@@ -0,0 +1,257 @@
+import argparse
+import asyncio
+import json
+import queue
+import random
+import sys
+import threading
+import uuid
+from datetime import datetime
+from armazenamento import parada_serializada, registro_de_parada
+from catalogo import MOTIVOS_POR_PROCESSO
+
+# entrada automática de paradas: os equipamentos da linha (ou um gateway do CLP) abrem uma
+# conexão TCP local e mandam uma linha JSON por sinal:
+#   {"tipo": "inicio", "processo": "Raku-Raku", "motivo": "Falta de bandeja"}
+#   {"tipo": "fim", "processo": "Raku-Raku", "motivo": "Falta de bandeja", "instante": "2024-05-02T10:15:03"}
+# "instante" é opcional (padrão: hora do recebimento) e "equipamento" vira o funcionário da parada.
+# para testar sem CLP:
+#   python eventos_clp.py simular --eventos-por-minuto 3000 --segundos 60
+
+HOST = '127.0.0.1'
+PORTA_PADRAO = 5020
+FUNCIONARIO_CLP = 'CLP'
+TIPOS = ('inicio', 'fim')
+
+
+class DebounceSinais:
+    # sinal que oscila não vira parada: a troca de estado de um (processo, motivo) só é
+    # confirmada se o sinal ficar estável pela janela. a parada guarda o instante da
+    # primeira borda, então o debounce não altera a duração
+    def __init__(self, janela):
+        self.janela = janela
+        self.ativos = set()
+        self.pendentes = {}
+
+    def sinal(self, tipo, chave, instante, agora, equipamento=None):
+        ativo = chave in self.ativos
+        if (tipo == 'inicio') == ativo:
+            # voltou ao estado confirmado antes do fim da janela: a troca pendente era oscilação
+            self.pendentes.pop(chave, None)
+        elif chave not in self.pendentes:
+            self.pendentes[chave] = (tipo, instante, agora + self.janela, equipamento)
+
+    def vencidos(self, agora):
+        # trocas que ficaram estáveis pela janela inteira, na ordem em que começaram
+        confirmadas = []
+        for chave, (tipo, instante, prazo, equipamento) in list(self.pendentes.items()):
+            if prazo <= agora:
+                del self.pendentes[chave]
+                if tipo == 'inicio':
+                    self.ativos.add(chave)
+                else:
+                    self.ativos.discard(chave)
+                confirmadas.append((tipo, chave, instante, equipamento))
+        return confirmadas
+
+
+class ServicoEventosCLP:
+    # servidor asyncio numa thread própria. os sinais confirmados são gravados em lote no log
+    # das paradas ativas (um fsync por lote) ainda nesta thread; a interface só recebe os lotes
+    # prontos pela fila e aplica na memória e no histórico, via processar_lotes() num after()
+    def __init__(self, registro_ativas, porta=PORTA_PADRAO, host=HOST, janela_debounce=2.0, intervalo_lote=0.2):
+        self.registro_ativas = registro_ativas
+        self.porta = porta
+        self.host = host
+        self.intervalo_lote = intervalo_lote
+        self.debounce = DebounceSinais(janela_debounce)
+        self.lotes = queue.Queue()
+        self.recebidos = 0
+        self.rejeitados = 0
+        self._paradas = {}
+        self._thread = None
+        self._loop = None
+        self._parar = None
+        self._pronto = threading.Event()
+        self._erro = None
+
+    def restaurar(self, paradas):
+        # paradas do CLP que estavam ativas quando o aplicativo fechou continuam esperando o fim
+        for parada in paradas:
+            chave = (parada['processo'], parada['motivo'])
+            self._paradas[chave] = dict(parada)
+            self.debounce.ativos.add(chave)
+
+    def iniciar(self):
+        # não espera a porta abrir: quem chama é a thread da interface. uma porta ocupada
+        # chega como lote com 'erro_porta' pela mesma fila dos sinais
+        self._thread = threading.Thread(target=asyncio.run, args=(self._principal(),), name='eventos-clp', daemon=True)
+        self._thread.start()
+
+    def aguardar_porta(self, timeout=None):
+        # True quando o servidor já está ouvindo (self.porta passa a ser a porta real, mesmo com porta=0)
+        return self._pronto.wait(timeout) and self._erro is None
+
+    def encerrar(self, timeout=5):
+        if self._thread is None or not self._pronto.wait(timeout):
+            return
+        if self._erro is None and self._thread.is_alive():
+            self._loop.call_soon_threadsafe(self._parar.set)
+            self._thread.join(timeout)
+
+    async def _principal(self):
+        self._loop = asyncio.get_running_loop()
+        self._parar = asyncio.Event()
+        try:
+            servidor = await asyncio.start_server(self._conexao, self.host, self.porta)
+        except OSError as e:
+            self._erro = e
+            self.lotes.put({'inicios': [], 'fins': [], 'erro_porta': e})
+            self._pronto.set()
+            return
+        self.porta = servidor.sockets[0].getsockname()[1]
+        self._pronto.set()
+        agrupar = asyncio.create_task(self._agrupar())
+        async with servidor:
+            await self._parar.wait()
+        agrupar.cancel()
+
+    async def _conexao(self, leitor, escritor):
+        try:
+            async for linha in leitor:
+                self.receber(linha)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            escritor.close()
+
+    def receber(self, linha, agora=None):
+        # valida e passa pelo debounce; sinal malformado é só contado
+        try:
+            evento = json.loads(linha)
+            tipo = evento['tipo']
+            chave = (str(evento['processo']), str(evento['motivo']))
+            instante = datetime.fromisoformat(evento['instante']) if evento.get('instante') else datetime.now()
+            if instante.tzinfo is not None:
+                instante = instante.astimezone().replace(tzinfo=None)  # horário local, como as paradas do botão
+            if tipo not in TIPOS or not all(chave):
+                raise ValueError(tipo)
+        except (ValueError, KeyError, TypeError):
+            self.rejeitados += 1
+            return
+        self.recebidos += 1
+        self.debounce.sinal(tipo, chave, instante, self._agora() if agora is None else agora, evento.get('equipamento'))
+
+    def _agora(self):
+        return self._loop.time() if self._loop is not None else 0.0
+
+    async def _agrupar(self):
+        while True:
+            await asyncio.sleep(self.intervalo_lote)
+            confirmadas = self.debounce.vencidos(self._agora())
+            if confirmadas:
+                # fsync fora do loop de eventos: as conexões continuam sendo lidas enquanto grava
+                try:
+                    lote = await self._loop.run_in_executor(None, self._gravar, confirmadas)
+                except OSError as e:
+                    lote = {'inicios': [], 'fins': [], 'erro': e}
+                if lote['inicios'] or lote['fins'] or 'erro' in lote:
+                    self.lotes.put(lote)
+
+    def _gravar(self, confirmadas):
+        # roda no executor, um lote por vez: só esta função mexe em self._paradas depois de iniciar
+        inicios = []
+        fins = {}
+        for tipo, chave, instante, equipamento in confirmadas:
+            if tipo == 'inicio':
+                parada = {
+                    'id': uuid.uuid4().hex,
+                    'funcionario': equipamento or FUNCIONARIO_CLP,
+                    'processo': chave[0],
+                    'motivo': chave[1],
+                    'inicio': instante,
+                    'fim': None,
+                    'duracao': None,
+                    'origem': 'clp'
+                }
+                self._paradas[chave] = parada
+                inicios.append(parada)
+            else:
+                parada = self._paradas.pop(chave, None)
+                if parada is None:
+                    continue
+                parada['fim'] = max(instante, parada['inicio'])
+                parada['duracao'] = (parada['fim'] - parada['inicio']).total_seconds() / 60
+                fins[parada['id']] = parada
+        self.registro_ativas.iniciar_varios([parada_serializada(parada) for parada in inicios])
+        finalizadas = self.registro_ativas.finalizar_varios(
+            [(id_parada, registro_de_parada(parada)) for id_parada, parada in fins.items()])
+        return {
+            'inicios': [dict(parada) for parada in inicios],
+            'fins': [(id_parada, fins[id_parada]['fim'], fins[id_parada]['duracao']) for id_parada in finalizadas]
+        }
+
+    def processar_lotes(self, aplicar):
+        # deve ser chamado na thread da interface (via after)
+        while True:
+            try:
+                lote = self.lotes.get_nowait()
+            except queue.Empty:
+                return
+            aplicar(lote)
+
+
+async def simular(host=HOST, porta=PORTA_PADRAO, eventos_por_minuto=3000, segundos=60, oscilacao=0.2, semente=None):
+    # equipamento de mentira: liga e desliga paradas do catálogo no ritmo pedido e, numa
+    # fração dos sinais, manda a oscilação (troca e volta logo em seguida) que o debounce deve descartar
+    rng = random.Random(semente)
+    chaves = [(processo, motivo) for processo, motivos in MOTIVOS_POR_PROCESSO.items() for motivo in motivos]
+    ativas = set()
+    _, escritor = await asyncio.open_connection(host, porta)
+    intervalo = 60 / eventos_por_minuto
+    enviados = 0
+    fim = asyncio.get_running_loop().time() + segundos
+
+    def enviar(tipo, chave):
+        linha = {'tipo': tipo, 'processo': chave[0], 'motivo': chave[1], 'instante': datetime.now().isoformat(),
+                 'equipamento': f'Simulador {chave[0]}'}
+        escritor.write((json.dumps(linha, ensure_ascii=False) + '\n').encode('utf-8'))
+
+    try:
+        while asyncio.get_running_loop().time() < fim:
+            chave = rng.choice(chaves)
+            tipo = 'fim' if chave in ativas else 'inicio'
+            ativas.symmetric_difference_update({chave})
+            enviar(tipo, chave)
+            enviados += 1
+            if rng.random() < oscilacao:
+                enviar('inicio' if tipo == 'fim' else 'fim', chave)
+                enviar(tipo, chave)
+                enviados += 2
+            await escritor.drain()
+            await asyncio.sleep(intervalo)
+    finally:
+        escritor.close()
+        await escritor.wait_closed()
+    return enviados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sinais de parada vindos dos equipamentos da linha")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    simulador = comandos.add_parser('simular', help="envia sinais de teste para o aplicativo aberto")
+    simulador.add_argument('--porta', type=int, default=PORTA_PADRAO)
+    simulador.add_argument('--eventos-por-minuto', type=int, default=3000)
+    simulador.add_argument('--segundos', type=float, default=60)
+    simulador.add_argument('--oscilacao', type=float, default=0.2, help="fração dos sinais com oscilação")
+    simulador.add_argument('--semente', type=int)
+    args = parser.parse_args(argv)
+
+    enviados = asyncio.run(simular(HOST, args.porta, args.eventos_por_minuto, args.segundos, args.oscilacao,
+                                   args.semente))
+    print(f"{enviados} sinais enviados")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+import hashlib
+import io
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from matplotlib import colormaps
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from desempenho import medir
+
+
+def chave_grafico(dados, titulo, total_tempo, largura_px, cor_fundo):
+    # hash dos dados agregados: mesma chave, mesma imagem
+    conteudo = json.dumps([titulo, list(dados.items()), round(total_tempo, 6), largura_px, cor_fundo],
+                          ensure_ascii=False, default=str)
+    return hashlib.sha1(conteudo.encode('utf-8')).hexdigest()
+
+
+def renderizar_barras_porcentagem(dados, titulo, total_tempo, largura_px, cor_fundo):
+    # API orientada a objetos + Agg: nada passa pelo pyplot, então nenhuma figura fica registrada
+    dpi = 100
+    largura = largura_px / dpi
+    fig = Figure(figsize=(largura, largura * 0.75), dpi=dpi, facecolor=cor_fundo)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+
+    labels = list(dados.keys())
+    tempos = list(dados.values())
+    porcentagens = [(t / total_tempo) * 100 if total_tempo > 0 else 0 for t in tempos]
+
+    num_labels = len(labels)
+    cores = colormaps['viridis'](np.linspace(0, 1, num_labels)) # Usar o mapa de cores 'viridis'
+
+    x = range(num_labels)
+    bars = ax.bar(x, tempos, color=cores, align='center') # Aplicar as cores
+
+    ax.set_ylabel("Tempo Total (minutos)", fontsize=12)
+    ax.set_xlabel("Processo/Motivo", fontsize=12)
+    ax.set_title(titulo, fontsize=14)
+
+    ax.set_xticks(x)
+    ax.set_xticklabels(labels, rotation=45, ha='right', fontsize=10)
+
+    ax.tick_params(axis='y', labelsize=10)
+    ax.grid(axis='y', linestyle='--')
+
+    for bar, porcentagem in zip(bars, porcentagens):
+        height = bar.get_height()
+        ax.text(bar.get_x() + bar.get_width()/2, height + 0.5, f'{porcentagem:.1f}%', ha='center', va='bottom', fontsize=9)
+
+    fig.tight_layout(pad=1.5, w_pad=2.0, h_pad=2.0)
+
+    saida = io.BytesIO()
+    fig.savefig(saida, format='png', facecolor=cor_fundo)
+    return saida.getvalue()
+
+
+class RenderizadorGraficos:
+    # renderiza os gráficos numa thread própria e guarda os PNGs pela chave dos dados
+    def __init__(self, max_cache=16):
+        self.max_cache = max_cache
+        self._cache = OrderedDict()
+        self._trava = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='graficos')
+
+    def obter(self, chave):
+        with self._trava:
+            png = self._cache.get(chave)
+            if png is not None:
+                self._cache.move_to_end(chave)
+            return png
+
+    def _guardar(self, chave, png):
+        with self._trava:
+            self._cache[chave] = png
+            while len(self._cache) > self.max_cache:
+                self._cache.popitem(last=False)
+
+    def renderizar(self, chave, dados, titulo, total_tempo, largura_px, cor_fundo):
+        # devolve um Future com o PNG da imagem
+        def tarefa():
+            png = self.obter(chave)
+            if png is None:
+                with medir('renderizar_grafico'):
+                    png = renderizar_barras_porcentagem(dados, titulo, total_tempo, largura_px, cor_fundo)
+                self._guardar(chave, png)
+            return png
+        return self._executor.submit(tarefa)
+
+    def encerrar(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
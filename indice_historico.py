@@ -0,0 +1,296 @@
+import json
+import os
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from heapq import merge
+from armazenamento import linha_excel, turno_de
+
+# campos com lista de posições no índice; 'turno' é derivado do horário de início
+CAMPOS_INDICE = ('data', 'turno', 'processo', 'motivo', 'funcionario')
+SUFIXO_DELTA = '.delta'
+# o .delta é incorporado à gravação completa quando passa desta fração do tamanho dos offsets
+FRACAO_DELTA = 0.5
+DELTA_MINIMO = 256 * 1024
+
+
+def _valor_indexado(registro, campo):
+    if campo == 'turno':
+        return turno_de(registro.get('inicio'))
+    valor = registro.get(campo)
+    return '' if valor is None else str(valor)
+
+
+def _contem(posicoes, posicao):
+    i = bisect_left(posicoes, posicao)
+    return i < len(posicoes) and posicoes[i] == posicao
+
+
+def _gravar_segmento(f, cabecalho, offsets, listas):
+    cabecalho = dict(cabecalho, linhas=len(offsets), listas={
+        campo: [[valor, len(posicoes)] for valor, posicoes in listas[campo].items()] for campo in CAMPOS_INDICE
+    })
+    f.write(json.dumps(cabecalho, ensure_ascii=False).encode('utf-8') + b'\n')
+    offsets.tofile(f)
+    for campo in CAMPOS_INDICE:
+        for posicoes in listas[campo].values():
+            posicoes.tofile(f)
+
+
+def _ler_segmento(dados, posicao):
+    # (cabeçalho, offsets, listas, posição do fim do segmento); ValueError se estiver incompleto
+    fim_cabecalho = dados.index(b'\n', posicao) + 1
+    cabecalho = json.loads(dados[posicao:fim_cabecalho])
+    posicao = fim_cabecalho
+
+    def ler(quantidade):
+        nonlocal posicao
+        valores = array('q')
+        tamanho = quantidade * valores.itemsize
+        if posicao + tamanho > len(dados):
+            raise ValueError('segmento truncado')
+        valores.frombytes(dados[posicao:posicao + tamanho])
+        posicao += tamanho
+        return valores
+
+    offsets = ler(cabecalho['linhas'])
+    listas = {
+        campo: {valor: ler(quantidade) for valor, quantidade in cabecalho['listas'][campo]}
+        for campo in CAMPOS_INDICE
+    }
+    return cabecalho, offsets, listas, posicao
+
+
+class IndiceHistorico:
+    # índice persistido do journal: o offset de início de cada linha e, para cada data,
+    # turno, processo, motivo e funcionário, a lista crescente das posições que o contêm.
+    # uma consulta cruza só essas listas e lê do journal apenas as linhas encontradas
+    def __init__(self, caminho, journal):
+        self.caminho = caminho
+        self.journal = journal
+        # atualizado tanto pela thread de gravação quanto pela interface
+        self._trava = threading.RLock()
+        self._zerar()
+        self.carregar()
+
+    def _zerar(self):
+        self.indexado = 0
+        self.identidade = None
+        self.offsets = array('q')
+        self.listas = {campo: {} for campo in CAMPOS_INDICE}
+        self._datas = None
+        self._tamanho_delta = 0
+
+    def carregar(self):
+        # formato: uma linha JSON de cabeçalho seguida dos arrays em binário, na ordem do cabeçalho.
+        # as linhas indexadas depois da última gravação completa ficam em segmentos anexados ao
+        # arquivo .delta, no mesmo formato, cada um com o 'indexado' de onde partiu
+        try:
+            with open(self.caminho, 'rb') as f:
+                dados = f.read()
+        except FileNotFoundError:
+            self._zerar()
+            return
+        try:
+            cabecalho, offsets, listas, fim = _ler_segmento(dados, 0)
+            if fim != len(dados):
+                raise ValueError('índice truncado')
+            self.indexado = int(cabecalho['indexado'])
+            self.identidade = cabecalho.get('identidade')
+            self.offsets = offsets
+            self.listas = listas
+            self._datas = None
+        except (KeyError, TypeError, ValueError):
+            self._zerar()
+            return
+        self._carregar_delta()
+
+    def _carregar_delta(self):
+        caminho = self.caminho + SUFIXO_DELTA
+        try:
+            with open(caminho, 'rb') as f:
+                dados = f.read()
+        except FileNotFoundError:
+            return
+        posicao = 0
+        while posicao < len(dados):
+            try:
+                cabecalho, offsets, listas, fim = _ler_segmento(dados, posicao)
+                if int(cabecalho['desde']) != self.indexado:
+                    raise ValueError('segmento de outra versão do índice')
+            except (KeyError, TypeError, ValueError):
+                break
+            base = len(self.offsets)
+            self.offsets.extend(offsets)
+            for campo in CAMPOS_INDICE:
+                for valor, posicoes in listas[campo].items():
+                    destino = self.listas[campo].get(valor)
+                    if destino is None:
+                        destino = self.listas[campo][valor] = array('q')
+                    destino.extend(p + base for p in posicoes)
+            self.indexado = int(cabecalho['indexado'])
+            self.identidade = cabecalho.get('identidade')
+            posicao = fim
+        self._datas = None
+        if posicao < len(dados):
+            # gravação interrompida: o resto é descartado e reindexado do journal
+            with open(caminho, 'r+b') as f:
+                f.truncate(posicao)
+        self._tamanho_delta = posicao
+
+    def salvar(self):
+        # gravação completa; os segmentos do .delta passam a fazer parte dela
+        temporario = self.caminho + '.tmp'
+        with open(temporario, 'wb') as f:
+            _gravar_segmento(f, {'indexado': self.indexado, 'identidade': self.identidade}, self.offsets, self.listas)
+        os.replace(temporario, self.caminho)
+        if os.path.exists(self.caminho + SUFIXO_DELTA):
+            os.remove(self.caminho + SUFIXO_DELTA)
+        self._tamanho_delta = 0
+
+    def _salvar_novas(self, desde, primeira, novas):
+        # cada lote grava só as suas posições; a gravação completa fica para quando o .delta
+        # passar de uma fração do índice, o que mantém o custo por linha constante
+        if desde == 0 or not os.path.exists(self.caminho):
+            self.salvar()
+            return
+        with open(self.caminho + SUFIXO_DELTA, 'ab') as f:
+            cabecalho = {'desde': desde, 'indexado': self.indexado, 'identidade': self.identidade}
+            _gravar_segmento(f, cabecalho, self.offsets[primeira:],
+                             {campo: {valor: array('q', (p - primeira for p in posicoes))
+                                      for valor, posicoes in novas[campo].items()}
+                              for campo in CAMPOS_INDICE})
+            self._tamanho_delta = f.tell()
+        if self._tamanho_delta > max(DELTA_MINIMO, len(self.offsets) * 8 * FRACAO_DELTA):
+            self.salvar()
+
+    def atualizar(self):
+        # indexa só as linhas anexadas depois do último offset; se o journal encolheu ou foi
+        # substituído por outro arquivo, o índice está obsoleto e é refeito do zero
+        with self._trava:
+            tamanho = self.journal.tamanho()
+            if self.indexado > tamanho or (self.indexado
+                                           and self.journal.identidade(self.indexado) != self.identidade):
+                self._zerar()
+            if self.indexado == tamanho:
+                return
+            desde = self.indexado
+            primeira = len(self.offsets)
+            novas = {campo: {} for campo in CAMPOS_INDICE}
+            try:
+                with open(self.journal.caminho, 'rb') as f:
+                    f.seek(self.indexado)
+                    inicio = self.indexado
+                    for linha in f:
+                        if not linha.endswith(b'\n'):
+                            break  # linha incompleta: gravação ainda em andamento
+                        try:
+                            registro = json.loads(linha)
+                        except ValueError:
+                            registro = None  # linha corrompida fica fora do índice
+                        if registro is not None:
+                            posicao = len(self.offsets)
+                            self.offsets.append(inicio)
+                            for campo in CAMPOS_INDICE:
+                                valor = _valor_indexado(registro, campo)
+                                posicoes = self.listas[campo].get(valor)
+                                if posicoes is None:
+                                    posicoes = self.listas[campo][valor] = array('q')
+                                    if campo == 'data':
+                                        self._datas = None
+                                posicoes.append(posicao)
+                                novas[campo].setdefault(valor, []).append(posicao)
+                        inicio += len(linha)
+                    self.indexado = inicio
+            except FileNotFoundError:
+                self._zerar()
+                desde = 0
+            if self.indexado != desde:
+                self.identidade = self.journal.identidade(self.indexado)
+                self._salvar_novas(desde, primeira, novas)
+
+    def _datas_ordenadas(self):
+        if self._datas is None:
+            self._datas = sorted(self.listas['data'])
+        return self._datas
+
+    def consultar(self, data_inicial=None, data_final=None, turno=None, processo=None, motivo=None,
+                  funcionario=None):
+        # posições (crescentes) das linhas que atendem a todos os filtros
+        with self._trava:
+            listas = []
+            if data_inicial or data_final:
+                datas = self._datas_ordenadas()
+                i = bisect_left(datas, data_inicial) if data_inicial else 0
+                j = bisect_right(datas, data_final) if data_final else len(datas)
+                faixa = [self.listas['data'][data] for data in datas[i:j]]
+                listas.append(faixa[0] if len(faixa) == 1 else array('q', merge(*faixa)))
+            for campo, valor in (('turno', turno), ('processo', processo), ('motivo', motivo),
+                                 ('funcionario', funcionario)):
+                if valor:
+                    listas.append(self.listas[campo].get(valor, array('q')))
+            if not listas:
+                return array('q', range(len(self.offsets)))
+            # percorre a lista mais curta e procura cada posição nas demais por busca binária
+            listas.sort(key=len)
+            menor, demais = listas[0], listas[1:]
+            return array('q', (p for p in menor if all(_contem(outra, p) for outra in demais)))
+
+    def offsets_de(self, posicoes):
+        with self._trava:
+            return array('q', (self.offsets[p] for p in posicoes))
+
+    def apagar(self):
+        with self._trava:
+            self._zerar()
+            for caminho in (self.caminho, self.caminho + SUFIXO_DELTA):
+                if os.path.exists(caminho):
+                    os.remove(caminho)
+
+
+def _ler_linhas(journal, offsets):
+    # lê do journal só as linhas dos offsets informados; None para linha ilegível
+    try:
+        with open(journal.caminho, 'rb') as f:
+            for offset in offsets:
+                f.seek(offset)
+                try:
+                    yield json.loads(f.readline())
+                except ValueError:
+                    yield None
+    except FileNotFoundError:
+        return
+
+
+def ler_registros(journal, offsets):
+    return (registro for registro in _ler_linhas(journal, offsets) if registro is not None)
+
+
+class PaginasIndice:
+    # mesma interface de PaginasJournal sobre o resultado de uma consulta ao índice
+    def __init__(self, journal, offsets, tamanho_pagina=50, paginas_em_cache=20):
+        self.journal = journal
+        self.offsets = offsets
+        self.tamanho_pagina = tamanho_pagina
+        self.paginas_em_cache = paginas_em_cache
+        self._paginas = OrderedDict()
+
+    def total(self):
+        return len(self.offsets)
+
+    def linha(self, indice):
+        numero = indice // self.tamanho_pagina
+        pagina = self._paginas.get(numero)
+        if pagina is None:
+            primeiro = numero * self.tamanho_pagina
+            trecho = self.offsets[primeiro:primeiro + self.tamanho_pagina]
+            pagina = [linha_excel(registro) if registro is not None else None
+                      for registro in _ler_linhas(self.journal, trecho)]
+            self._paginas[numero] = pagina
+            if len(self._paginas) > self.paginas_em_cache:
+                self._paginas.popitem(last=False)
+        else:
+            self._paginas.move_to_end(numero)
+        posicao = indice - numero * self.tamanho_pagina
+        return pagina[posicao] if posicao < len(pagina) else None  # journal apagado no meio da leitura
@@ -0,0 +1,278 @@
+import argparse
+import csv
+import json
+import os
+import sys
+from datetime import datetime
+from armazenamento import (
+    ARQUIVO_CONFIG, DIRETORIO_PADRAO, CAMPOS_HISTORICO, TURNOS, importar_csv_legado, importar_planilha
+)
+from backends_historico import BACKENDS, criar_backend
+from consolidacao_planta import PASTA_SAIDA, consolidar_planta
+from relatorio_excel import exportar_relatorio_excel
+from sugestoes_motivos import (
+    SEMELHANCA_AGRUPAMENTO, agrupar_motivos, gravar_canonicos, ler_canonicos, reescrever_motivos
+)
+from analise import (
+    carregar_colunas, calcular_indicadores, formatar_indicadores, calcular_disponibilidade, formatar_disponibilidade
+)
+
+# uso sem interface gráfica (tarefas noturnas em servidor):
+#   python paradas_cli.py importar-csv paradas.csv
+#   python paradas_cli.py importar-xlsx paradas.xlsx --armazenamento sqlite
+#   python paradas_cli.py exportar --de 2024-01-01 --ate 2024-01-31 --formato csv --saida janeiro.csv
+#   python paradas_cli.py resumo --de 2024-01-01 --indicadores
+#   python paradas_cli.py --armazenamento mensal arquivar
+#   python paradas_cli.py consolidar-planta //servidor/producao --xlsx planta.xlsx
+#   python paradas_cli.py normalizar-motivos --aplicar
+
+
+def carregar_config():
+    # mesmo config_app.json da interface, sem depender do Tk
+    try:
+        with open(ARQUIVO_CONFIG, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def diretorio_dados(args, config=None):
+    config = carregar_config() if config is None else config
+    return args.diretorio or config.get('diretorio') or DIRETORIO_PADRAO
+
+
+def abrir_backend(args):
+    config = carregar_config()
+    diretorio = diretorio_dados(args, config)
+    armazenamento = args.armazenamento or config.get('armazenamento') or 'journal'
+    estacao = args.estacao or config.get('estacao')
+    os.makedirs(diretorio, exist_ok=True)
+    backend = criar_backend(armazenamento, diretorio, estacao, config.get('carencia_particao_dias', 2),
+                            config.get('retencao_meses', 0))
+    backend.sincronizar()  # no modo 'compartilhado', junta os shards das estações antes de ler
+    return backend
+
+
+def _data(texto):
+    try:
+        return datetime.strptime(texto, '%Y-%m-%d').strftime('%Y-%m-%d')
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"data inválida: {texto!r} (use AAAA-MM-DD)")
+
+
+def _filtros(args):
+    return {
+        'data_inicial': args.de,
+        'data_final': args.ate,
+        'turno': args.turno,
+        'processo': args.processo,
+        'motivo': args.motivo,
+        'funcionario': args.funcionario
+    }
+
+
+def comando_importar_csv(args):
+    backend = abrir_backend(args)
+    try:
+        importadas, ignoradas, repetidas = importar_csv_legado(args.arquivo, backend, args.lote)
+    except OSError as e:
+        print(f"erro: não foi possível ler {args.arquivo}: {e.strerror or e}", file=sys.stderr)
+        return 2
+    backend.apos_gravar()
+    print(f"{importadas} paradas importadas, {repetidas} já estavam no histórico, {ignoradas} linhas ignoradas")
+    return 0
+
+
+def comando_importar_xlsx(args):
+    backend = abrir_backend(args)
+    if not os.path.exists(args.arquivo):
+        print(f"erro: {args.arquivo} não existe", file=sys.stderr)
+        return 2
+    importadas = importar_planilha(args.arquivo, backend)
+    backend.apos_gravar()
+    print(f"{importadas} paradas importadas")
+    return 0
+
+
+def comando_exportar(args):
+    backend = abrir_backend(args)
+    filtros = _filtros(args)
+    if args.formato == 'xlsx':
+        if args.saida == '-':
+            print("erro: exportação xlsx precisa de --saida", file=sys.stderr)
+            return 2
+        total = exportar_relatorio_excel(backend, args.saida, **filtros)
+        print(f"{total} paradas exportadas para {args.saida}", file=sys.stderr)
+        return 0
+
+    saida = sys.stdout if args.saida == '-' else open(args.saida, 'w', newline='', encoding='utf-8')
+    total = 0
+    try:
+        if args.formato == 'csv':
+            escritor = csv.writer(saida)
+            escritor.writerow(CAMPOS_HISTORICO)
+            for registro in backend.consultar(**filtros):
+                escritor.writerow([registro.get(campo) for campo in CAMPOS_HISTORICO])
+                total += 1
+        else:
+            for registro in backend.consultar(**filtros):
+                saida.write(json.dumps({campo: registro.get(campo) for campo in CAMPOS_HISTORICO},
+                                       ensure_ascii=False) + '\n')
+                total += 1
+    finally:
+        if saida is not sys.stdout:
+            saida.close()
+    print(f"{total} paradas exportadas", file=sys.stderr)
+    return 0
+
+
+def comando_arquivar(args):
+    backend = abrir_backend(args)
+    if not hasattr(backend, 'arquivar'):
+        print(f"erro: o armazenamento '{backend.nome}' não tem partições", file=sys.stderr)
+        return 2
+    fechados, descartados = backend.arquivar()
+    backend.liberar_fechadas()
+    print(f"{len(fechados)} meses comprimidos ({', '.join(fechados) or '-'}), "
+          f"{len(descartados)} descartados pela retenção ({', '.join(descartados) or '-'})")
+    return 0
+
+
+def comando_consolidar_planta(args):
+    resumo = consolidar_planta(args.raiz, args.saida, args.trabalhadores, args.forcar)
+    planta = resumo['planta']
+    print(f"{len(resumo['estacoes'])} estações: {len(resumo['lidas'])} lidas, "
+          f"{len(resumo['reaproveitadas'])} sem alteração desde a última execução")
+    for estacao, erro in sorted(resumo['erros'].items()):
+        print(f"erro: {estacao}: {erro}", file=sys.stderr)
+    print(f"{planta['paradas']} paradas ({planta['primeira_data'] or '-'} a {planta['ultima_data'] or '-'}), "
+          f"{planta['tempo_total']:.1f} min, {planta['ignoradas']} linhas ignoradas")
+    if args.xlsx:
+        saida = args.saida or os.path.join(args.raiz, PASTA_SAIDA)
+        exportar_relatorio_excel(criar_backend('journal', saida), args.xlsx)
+        print(f"relatório da planta em {args.xlsx}")
+    return 1 if resumo['erros'] else 0
+
+
+def comando_normalizar_motivos(args):
+    backend = abrir_backend(args)
+    if args.aplicar and backend.nome == 'compartilhado':
+        # cada estação anexa ao seu shard sem trava: apagar e regravar tudo perderia a estação
+        # de origem das paradas e disputaria com as gravações dos outros terminais
+        print("erro: --aplicar não reescreve o armazenamento 'compartilhado'", file=sys.stderr)
+        return 2
+    contagens = backend.contagem_motivos()
+    mapa = agrupar_motivos(contagens, args.semelhanca)
+    for variante, canonico in sorted(mapa.items(), key=lambda item: (item[1], item[0])):
+        print(f"{variante!r} -> {canonico!r} ({contagens[variante]})")
+    print(f"{len(mapa)} grafias agrupadas, {sum(contagens[v] for v in mapa)} paradas")
+    if args.aplicar and mapa:
+        # o mapa gravado vale também para as paradas novas digitadas na interface
+        diretorio = diretorio_dados(args)
+        canonicos = ler_canonicos(diretorio)
+        canonicos = {variante: mapa.get(canonico, canonico) for variante, canonico in canonicos.items()}
+        canonicos.update(mapa)
+        gravar_canonicos(diretorio, canonicos)
+        print(f"{reescrever_motivos(backend, diretorio, mapa)} paradas reescritas")
+    return 0
+
+
+def _imprimir_totais(titulo, dados, total_tempo):
+    print(titulo)
+    print('-' * len(titulo))
+    for nome, tempo in sorted(dados.items(), key=lambda item: -item[1]):
+        porcentagem = tempo / total_tempo * 100 if total_tempo > 0 else 0
+        print(f"{nome:<40} {tempo:>12.1f} min {porcentagem:>6.1f}%")
+    print()
+
+
+def comando_resumo(args):
+    backend = abrir_backend(args)
+    filtros = _filtros(args)
+    totais = backend.totais(**filtros)
+    if not totais:
+        print("Sem histórico.")
+        return 1
+    dados_processos, dados_motivos, total_tempo = totais
+    _imprimir_totais("Tempo por processo", dados_processos, total_tempo)
+    _imprimir_totais("Tempo por motivo", dados_motivos, total_tempo)
+    print(f"Tempo total: {total_tempo:.1f} min")
+    if args.indicadores:
+        # só as colunas numéricas ficam em memória, não os registros
+        colunas = carregar_colunas(backend.consultar(**filtros))
+        config = carregar_config()
+        planejado = config.get('tempo_planejado_turno_min') or {nome: 480 for nome, _, _ in TURNOS}
+        disponibilidade = calcular_disponibilidade(colunas, planejado, config.get('dias_producao', range(7)),
+                                                   filtros.get('data_inicial'), filtros.get('data_final'))
+        print()
+        print(formatar_disponibilidade(disponibilidade, "Disponibilidade"))
+        print()
+        print(formatar_indicadores(calcular_indicadores(colunas, 'processo'), "Indicadores por processo"))
+        print()
+        print(formatar_indicadores(calcular_indicadores(colunas, 'motivo'), "Indicadores por motivo"))
+    return 0
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(prog='paradas_cli', description="Histórico de paradas sem interface gráfica")
+    parser.add_argument('--diretorio', help="pasta do histórico (padrão: a do config_app.json)")
+    parser.add_argument('--armazenamento', choices=sorted(BACKENDS), help="backend (padrão: o do config_app.json)")
+    parser.add_argument('--estacao', help="nome da estação no modo 'compartilhado'")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    importar_csv = comandos.add_parser('importar-csv', help="importa o paradas.csv da ferramenta antiga")
+    importar_csv.add_argument('arquivo')
+    importar_csv.add_argument('--lote', type=int, default=5000, help="registros gravados por vez")
+    importar_csv.set_defaults(funcao=comando_importar_csv)
+
+    importar_xlsx = comandos.add_parser('importar-xlsx', help="importa uma paradas.xlsx")
+    importar_xlsx.add_argument('arquivo')
+    importar_xlsx.set_defaults(funcao=comando_importar_xlsx)
+
+    arquivar = comandos.add_parser('arquivar', help="comprime os meses encerrados e aplica a retenção (modo 'mensal')")
+    arquivar.set_defaults(funcao=comando_arquivar)
+
+    planta = comandos.add_parser('consolidar-planta', help="junta as paradas.xlsx de todos os terminais de uma pasta")
+    planta.add_argument('raiz', help="pasta com os diretórios dos terminais")
+    planta.add_argument('--saida', help=f"pasta do histórico consolidado (padrão: <raiz>/{PASTA_SAIDA})")
+    planta.add_argument('--trabalhadores', type=int, help="processos de leitura (padrão: um por núcleo)")
+    planta.add_argument('--forcar', action='store_true', help="relê todas as planilhas, mesmo as sem alteração")
+    planta.add_argument('--xlsx', help="grava também um relatório Excel da planta neste arquivo")
+    planta.set_defaults(funcao=comando_consolidar_planta)
+
+    normalizar = comandos.add_parser('normalizar-motivos', help="agrupa as grafias do mesmo motivo digitado em 'Outros'")
+    normalizar.add_argument('--semelhanca', type=float, default=SEMELHANCA_AGRUPAMENTO,
+                            help="semelhança mínima entre duas grafias (0 a 1)")
+    normalizar.add_argument('--aplicar', action='store_true', help="grava o mapa e reescreve o histórico")
+    normalizar.set_defaults(funcao=comando_normalizar_motivos)
+
+    for nome, funcao, ajuda in (('exportar', comando_exportar, "exporta um período"),
+                                ('resumo', comando_resumo, "totais por processo e motivo")):
+        sub = comandos.add_parser(nome, help=ajuda)
+        sub.add_argument('--de', type=_data, help="data inicial (AAAA-MM-DD)")
+        sub.add_argument('--ate', type=_data, help="data final (AAAA-MM-DD)")
+        sub.add_argument('--turno', choices=[nome for nome, _, _ in TURNOS])
+        sub.add_argument('--processo')
+        sub.add_argument('--motivo')
+        sub.add_argument('--funcionario')
+        sub.set_defaults(funcao=funcao)
+        if nome == 'exportar':
+            sub.add_argument('--formato', choices=('csv', 'jsonl', 'xlsx'), default='csv')
+            sub.add_argument('--saida', default='-', help="arquivo de saída ('-' = saída padrão)")
+        else:
+            sub.add_argument('--indicadores', action='store_true', help="inclui disponibilidade, MTTR, MTBF, percentis e Pareto")
+    return parser
+
+
+def main(argv=None):
+    args = criar_parser().parse_args(argv)
+    try:
+        return args.funcao(args)
+    except BrokenPipeError:
+        # saída encerrada antes do fim (ex.: `| head`)
+        sys.stderr.close()
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
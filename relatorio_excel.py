@@ -0,0 +1,150 @@
+import os
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.chart import BarChart, Reference
+from openpyxl.chart.label import DataLabelList
+from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
+from armazenamento import CABECALHO_EXCEL, LARGURAS_EXCEL, linha_excel
+
+CABECALHO_RESUMO = ['Paradas', 'Tempo (min)', '% do tempo']
+
+
+class _Estilos:
+    # estilos criados uma única vez e compartilhados por todas as células do relatório
+    def __init__(self):
+        self.fonte_negrito = Font(bold=True)
+        self.fonte_titulo = Font(bold=True, size=14)
+        self.centro = Alignment(horizontal='center')
+        self.borda = Border(bottom=Side(style='thin'))
+        self.fundo = PatternFill(start_color="DDDDDD", end_color="DDDDDD", fill_type="solid")
+
+
+def _celula(ws, valor, font=None, alignment=None, number_format=None, border=None, fill=None):
+    celula = WriteOnlyCell(ws, value=valor)
+    if font is not None:
+        celula.font = font
+    if alignment is not None:
+        celula.alignment = alignment
+    if number_format is not None:
+        celula.number_format = number_format
+    if border is not None:
+        celula.border = border
+    if fill is not None:
+        celula.fill = fill
+    return celula
+
+
+def _cabecalho(ws, titulos, estilos):
+    ws.append([
+        _celula(ws, titulo, font=estilos.fonte_negrito, alignment=estilos.centro, border=estilos.borda,
+                fill=estilos.fundo)
+        for titulo in titulos
+    ])
+
+
+def _acumular(totais, chave, duracao):
+    item = totais.get(chave)
+    if item is None:
+        item = totais[chave] = [0, 0.0]
+    item[0] += 1
+    item[1] += duracao
+
+
+def _escrever_dados(ws, registros, estilos):
+    # uma linha por parada, escrita direto no disco; só os totais ficam em memória
+    for coluna, largura in LARGURAS_EXCEL.items():
+        ws.column_dimensions[coluna].width = largura
+    _cabecalho(ws, CABECALHO_EXCEL, estilos)
+
+    processos = {}
+    motivos = {}
+    total_tempo = 0.0
+    linhas = 0
+    for registro in registros:
+        data, processo, funcionario, motivo, inicio, fim, duracao = linha_excel(registro)
+        # só a duração leva estilo: cada célula formatada custa um objeto a mais por linha
+        ws.append([data, processo, funcionario, motivo, inicio, fim,
+                   _celula(ws, duracao, number_format='0.00')])
+        linhas += 1
+        # mesmo critério dos gráficos: ignora linhas sem processo, motivo ou duração
+        if processo and motivo and duracao:
+            total_tempo += duracao
+            _acumular(processos, processo, duracao)
+            _acumular(motivos, motivo, duracao)
+    return linhas, processos, motivos, total_tempo
+
+
+def _escrever_tabela(ws, titulo, totais, total_tempo, linha_inicial, estilos):
+    # devolve a linha do cabeçalho e a da última categoria, para as referências do gráfico
+    _cabecalho(ws, [titulo] + CABECALHO_RESUMO, estilos)
+    ordenados = sorted(totais.items(), key=lambda item: -item[1][1])
+    for nome, (contagem, tempo) in ordenados:
+        ws.append([
+            nome,
+            contagem,
+            _celula(ws, tempo, number_format='0.00'),
+            _celula(ws, tempo / total_tempo if total_tempo > 0 else 0, number_format='0.0%')
+        ])
+    ws.append([])
+    return linha_inicial, linha_inicial + len(ordenados)
+
+
+def _grafico_barras(ws, titulo, linha_cabecalho, linha_final):
+    # gráfico nativo do Excel: as barras leem a coluna de tempo da própria aba de resumo
+    grafico = BarChart()
+    grafico.type = 'col'
+    grafico.title = titulo
+    grafico.y_axis.title = 'Tempo Total (minutos)'
+    grafico.legend = None
+    grafico.height = 9
+    grafico.width = 18
+    dados = Reference(ws, min_col=3, min_row=linha_cabecalho, max_row=linha_final)
+    categorias = Reference(ws, min_col=1, min_row=linha_cabecalho + 1, max_row=linha_final)
+    grafico.add_data(dados, titles_from_data=True)
+    grafico.set_categories(categorias)
+    grafico.dataLabels = DataLabelList()
+    grafico.dataLabels.showVal = True
+    return grafico
+
+
+def exportar_relatorio_excel(origem, destino, **filtros):
+    # relatório em modo write_only: as linhas vão para o disco à medida que são lidas do
+    # backend, então a memória não cresce com o número de paradas. filtros seguem o consultar()
+    estilos = _Estilos()
+    wb = Workbook(write_only=True)
+    # a aba de resumo vem primeiro, mas só é preenchida depois de percorrer os dados
+    ws_resumo = wb.create_sheet('Resumo')
+    ws_dados = wb.create_sheet('Paradas')
+
+    linhas, processos, motivos, total_tempo = _escrever_dados(ws_dados, origem.consultar(**filtros), estilos)
+
+    ws_resumo.column_dimensions['A'].width = 35
+    for coluna in ('B', 'C', 'D'):
+        ws_resumo.column_dimensions[coluna].width = 14
+    ws_resumo.append([_celula(ws_resumo, 'Relatório de Paradas', font=estilos.fonte_titulo)])
+    periodo = f"{filtros.get('data_inicial') or 'início'} a {filtros.get('data_final') or 'hoje'}"
+    ws_resumo.append(['Período', periodo])
+    ws_resumo.append(['Paradas', linhas])
+    ws_resumo.append(['Tempo total (min)', _celula(ws_resumo, total_tempo, number_format='0.00')])
+    ws_resumo.append([])
+
+    # 5 linhas de cabeçalho acima; as tabelas começam na linha 6
+    linha = 6
+    tabelas = []
+    for titulo, totais in (('Processo', processos), ('Motivo', motivos)):
+        cabecalho, final = _escrever_tabela(ws_resumo, titulo, totais, total_tempo, linha, estilos)
+        tabelas.append((titulo, cabecalho, final))
+        linha = final + 2
+
+    ancora = 6
+    for titulo, cabecalho, final in tabelas:
+        if final > cabecalho:
+            grafico = _grafico_barras(ws_resumo, f"Tempo por {titulo.lower()}", cabecalho, final)
+            ws_resumo.add_chart(grafico, f'F{ancora}')
+            ancora += 20
+
+    # grava num arquivo temporário e troca de uma vez, para não deixar uma planilha pela metade
+    temporario = destino + '.tmp'
+    wb.save(temporario)
+    os.replace(temporario, destino)
+    return linhas
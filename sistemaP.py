@@ -1,54 +1,145 @@
 import customtkinter as ctk
+import tkinter as tk
 from tkinter import messagebox, filedialog
 from datetime import datetime
-from openpyxl import Workbook, load_workbook
-from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
-from openpyxl.utils import get_column_letter
-from openpyxl.chart import BarChart, Reference
-from openpyxl.chart.label import DataLabelList
-import matplotlib
-import numpy as np
 import os
 import json
 import threading
 import time
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from contextlib import contextmanager
+import base64
+import uuid
+from armazenamento import (
+    ARQUIVO_CONFIG, DIRETORIO_PADRAO, ARQUIVO_EXCEL, TURNOS, GravadorEmSegundoPlano, ParadasAtivasWAL,
+    parada_serializada, registro_de_parada
+)
+from backends_historico import criar_backend, importar_historico_existente
+from carregamento_tardio import modulo_tardio, aquecer_modulos
+from catalogo import PROCESSOS, MOTIVOS_POR_PROCESSO
+from desempenho import ARQUIVO_OPERACOES_LENTAS, FAIXAS_MS, monitor, cronometrado
+from eventos_clp import PORTA_PADRAO, ServicoEventosCLP
+from sugestoes_motivos import MOTIVOS_CATALOGO, IndiceMotivos, ler_canonicos
+
+# numpy, matplotlib e openpyxl só são importados quando o histórico ou a exportação são usados
+analise = modulo_tardio('analise')
+graficos = modulo_tardio('graficos')
+relatorio_excel = modulo_tardio('relatorio_excel')
 
-ARQUIVO_CONFIG = 'config_app.json'
-DIRETORIO_PADRAO = os.path.expanduser('~/Documents/ControleParadas')
 ARQUIVO_TEMP = os.path.join(DIRETORIO_PADRAO, 'paradas_ativas.json')
-PROCESSOS = ['Carregamento', 'Raku-Raku', 'Inspeção', 'Descarregamento']
-
-MOTIVOS_POR_PROCESSO = {
-    'Raku-Raku': [
-        'Falta de bandeja', 'Ligar Cabine', 'Acumulo de bandeja', 'Sincronismos',
-        'Alimentação', 'Engate', 'Falta de Dispositivos', 'Troca de Cor',
-        'Falha de Pistola Automática', 'Atraso Aspiração', 'Ar-condicionado Cabine',
-        'Troca de Pintor', 'Falha de Pistola Manual', 'Outros'
-    ],
-    'Carregamento': [
-        'Tempo de Pausa intervalos', 'Falta de peça', 'Temperatura Estufa',
-        'Mal Funcionamento Ebara', 'Falta de Espaço', 'Outros'
-    ],
-    'Inspeção': [
-        'Falta de tinta', 'Lixo na Peça', 'Falta de Colaborador',
-        'Fosfato na peça', 'Falha no Equipamento', 'Outros'
-    ],
-    'Descarregamento': [
-        'HG/ELO Empenado para Robô', 'Queda de HG na Célula do Robô',
-        'Sensor Robô Motoman', 'Sensor Robô Fanuc', 'Trans. Fora de Tempo para Robô',
-        'Power Free Parou', 'Falta de Sincronismo', 'Falha no Pega do Robô',
-        'Falha no Pega Robô Motoman', 'Acumulo de Bandeja no Robô',
-        'Trans. LSA Parou', 'Falha de Pistão/LS Power Free',
-        'Chassi Descendo Moldado', 'Outros'
-    ]
-}
+ARQUIVO_WAL_ATIVAS = os.path.join(DIRETORIO_PADRAO, 'paradas_ativas.wal')
 
 ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("dark-blue")
 
+class ListaVirtual(ctk.CTkFrame):
+    # lista rolável que só cria widgets para as linhas visíveis: ao rolar, o mesmo
+    # conjunto fixo de linhas é reaproveitado e os dados são pedidos à fonte sob demanda
+    def __init__(self, master, formatar, estilo_linha, estilo_texto, altura_linha=110, max_linhas=15, **kwargs):
+        super().__init__(master, **kwargs)
+        self.fonte = None
+        self.formatar = formatar
+        self.estilo_linha = estilo_linha
+        self.estilo_texto = estilo_texto
+        self.altura_linha = altura_linha
+        self.max_linhas = max_linhas
+        self.mensagem_vazia = ''
+        self.primeira = 0
+        self.visiveis = 1
+        self.total_desenhado = 0
+        self.pool = []
+
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(0, weight=1)
+        self.area = ctk.CTkFrame(self, fg_color='transparent')
+        self.area.grid(row=0, column=0, sticky='nsew')
+        self.barra = ctk.CTkScrollbar(self, orientation='vertical', command=self.rolar)
+        self.barra.grid(row=0, column=1, sticky='ns')
+        self.label_mensagem = ctk.CTkLabel(self.area, text='', **estilo_texto)
+
+        self.area.bind('<Configure>', self._ao_redimensionar)
+        self._ligar_roda_mouse(self.area)
+
+    def _ligar_roda_mouse(self, widget):
+        widget.bind('<MouseWheel>', self._roda_mouse)
+        widget.bind('<Button-4>', self._roda_mouse)
+        widget.bind('<Button-5>', self._roda_mouse)
+
+    def _roda_mouse(self, event):
+        if getattr(event, 'num', None) == 4:
+            passo = -1
+        elif getattr(event, 'num', None) == 5:
+            passo = 1
+        else:
+            passo = -1 if event.delta > 0 else 1
+        self.rolar('scroll', passo, 'units')
+
+    def _ao_redimensionar(self, event):
+        visiveis = max(1, min(self.max_linhas, event.height // self.altura_linha + 1))
+        if visiveis != self.visiveis or not self.pool:
+            self.visiveis = visiveis
+            self.desenhar()
+
+    def _linha_do_pool(self, indice):
+        while len(self.pool) <= indice:
+            frame = ctk.CTkFrame(self.area, height=self.altura_linha - 8, **self.estilo_linha)
+            frame.pack_propagate(False)
+            label = ctk.CTkLabel(frame, text='', anchor='w', justify='left', padx=20, **self.estilo_texto)
+            label.pack(side='left', fill='both', expand=True, pady=4)
+            self._ligar_roda_mouse(frame)
+            self._ligar_roda_mouse(label)
+            self.pool.append((frame, label))
+        return self.pool[indice]
+
+    def definir_fonte(self, fonte, mensagem_vazia='', manter_posicao=False):
+        # manter_posicao: a mesma lista só ganhou linhas no fim; quem estava vendo o fim
+        # continua acompanhando as novas, quem tinha rolado para cima fica onde estava
+        no_fim = self.primeira + self.visiveis >= self.total_desenhado
+        self.fonte = fonte
+        self.mensagem_vazia = mensagem_vazia
+        if not manter_posicao:
+            self.primeira = 0
+        elif no_fim:
+            self.primeira = self._total()  # desenhar() limita a total - visiveis
+        self.desenhar()
+
+    def rolar(self, *args):
+        if args[0] == 'moveto':
+            self.primeira = int(float(args[1]) * self._total())
+        elif args[0] == 'scroll':
+            passo = int(args[1]) * (self.visiveis if args[2] == 'pages' else 1)
+            self.primeira += passo
+        self.desenhar()
+
+    def _total(self):
+        return self.fonte.total() if self.fonte is not None else 0
+
+    def desenhar(self):
+        total = self._total()
+        self.total_desenhado = total
+        self.primeira = max(0, min(self.primeira, total - self.visiveis))
+
+        if total == 0:
+            for frame, _ in self.pool:
+                frame.pack_forget()
+            self.label_mensagem.configure(text=self.mensagem_vazia)
+            self.label_mensagem.pack(pady=20)
+            self.barra.set(0, 1)
+            return
+        self.label_mensagem.pack_forget()
+
+        # as linhas escondidas ficam sempre no fim do pool, então a ordem do pack se mantém
+        for posicao in range(max(self.visiveis, len(self.pool))):
+            indice = self.primeira + posicao
+            if posicao < self.visiveis and indice < total:
+                frame, label = self._linha_do_pool(posicao)
+                label.configure(text=self.formatar(self.fonte.linha(indice)))
+                if not frame.winfo_manager():
+                    frame.pack(fill='x', pady=4)
+            elif posicao < len(self.pool):
+                self.pool[posicao][0].pack_forget()
+
+        self.barra.set(self.primeira / total, min(1.0, (self.primeira + self.visiveis) / total))
+
+
 class AplicativoMobile(ctk.CTk):
     def __init__(self):
         super().__init__()
@@ -65,40 +156,70 @@ class AplicativoMobile(ctk.CTk):
         self.processo_selecionado = ""
         self.paradas_em_andamento = []
         self.config = self.carregar_config()
+        self.registro_ativas = ParadasAtivasWAL(ARQUIVO_TEMP, ARQUIVO_WAL_ATIVAS)
         self.carregar_paradas_ativas()
-        self.thread_salvamento_ativa = False # Flag para controlar a thread de salvamento
+
+        # toda gravação em disco passa pela thread do gravador; a interface só enfileira
+        self.gravador = GravadorEmSegundoPlano(intervalo=self.config.get('intervalo_gravacao', 0.5))
+        self.gravador.iniciar()
+        # a exportação da planilha tem a sua própria thread, para não atrasar as gravações
+        self.exportador = GravadorEmSegundoPlano(intervalo=0)
+        self.exportador.iniciar()
+        self.thread_salvamento_ativa = True # Flag para controlar a thread de salvamento
+        self.id_verificacao_gravacoes = self.after(100, self.verificar_gravacoes)
+        self.servico_clp = None
+        # gráficos são desenhados fora da thread da interface e guardados pela chave dos dados;
+        # o renderizador (e o matplotlib) só é criado na primeira vez que um gráfico é pedido
+        self._renderizador = None
 
         self.verificar_diretorio()
+        self.configurar_instrumentacao()
+        self.preparar_historico()
+        self.reenviar_paradas_pendentes()
+        if self.config.get('clp_ativo'):
+            self.iniciar_servico_clp()
         self.criar_estilos()
+        # telas construídas uma única vez e alternadas com tkraise; ao voltar a uma tela
+        # só é atualizado o que depende de dados
+        self.telas = {}
+        self.tela_atual = None
+        self.id_cronometro = None
+        self.id_acompanhamento = None
+        self.id_exportacao = None
+        self.agendar_exportacao_excel()
+        self.id_arquivamento = None
+        self.agendar_arquivamento()
+        self._assinatura_historico = None
+        self._indicadores_defasados = True
+        self.area_telas = ctk.CTkFrame(self, fg_color='transparent')
+        self.area_telas.pack(expand=True, fill='both')
+        self.area_telas.grid_columnconfigure(0, weight=1)
+        self.area_telas.grid_rowconfigure(0, weight=1)
         self.criar_tela_login()
         self.protocol("WM_DELETE_WINDOW", self.ao_fechar)
 
-    @contextmanager
-    def abrir_planilha(self, arquivo):
-        wb = None
-        try:
-            if os.path.exists(arquivo):
-                wb = load_workbook(arquivo)
-            else:
-                wb = Workbook()
-                wb.remove(wb.active)
-            yield wb
-        except Exception as e:
-            raise RuntimeError(f"Erro ao acessar planilha: {str(e)}")
-        finally:
-            if wb:
-                try:
-                    wb.save(arquivo)
-                    wb.close()
-                except:
-                    pass
-
     def carregar_config(self):
         # garante que a configuração sempre contenha as chaves esperadas
         defaults = {
             'diretorio': DIRETORIO_PADRAO,
             'remember_me': False,
-            'last_user': ''
+            'last_user': '',
+            'armazenamento': 'journal',  # 'journal' (append-only), 'sqlite', 'compartilhado', 'mensal' ou 'xlsx' (modo antigo)
+            'estacao': '',  # nome do terminal no modo 'compartilhado'; vazio usa o nome do computador
+            'carencia_particao_dias': 2,  # modo 'mensal': dias após o fim do mês até comprimir a partição
+            'retencao_meses': 0,  # modo 'mensal': meses fechados mantidos (0 = todos)
+            'intervalo_arquivamento_min': 60,  # modo 'mensal': de quanto em quanto tempo fecha meses e aplica a retenção (além da abertura)
+            'intervalo_exportacao_excel_min': 60,  # atualiza a paradas.xlsx em segundo plano se o histórico mudou (0 = só pelo 📤 ou pelo paradas_cli exportar)
+            'intervalo_gravacao': 0.5,  # segundos acumulando gravações antes de ir ao disco
+            'aquecer_modulos': True,  # importa numpy/matplotlib/openpyxl em segundo plano após o login
+            'limite_operacao_lenta_ms': 250,  # acima disto a operação vai para operacoes_lentas.log
+            'perfil_cprofile': False,  # grava um perfil .prof de cada operação lenta (em perfis/)
+            'clp_ativo': False,  # recebe sinais de início/fim de parada dos equipamentos (eventos_clp.py)
+            'clp_porta': PORTA_PADRAO,
+            'clp_debounce': 2.0,  # segundos que um sinal precisa ficar estável para valer
+            'intervalo_acompanhamento_historico': 2.0,  # segundos entre conferências do histórico aberto (0 = desliga)
+            'tempo_planejado_turno_min': {nome: 480 for nome, _, _ in TURNOS},  # produção planejada por turno e dia
+            'dias_producao': [0, 1, 2, 3, 4, 5, 6]  # dias da semana com produção (0 = segunda)
         }
         try:
             with open(ARQUIVO_CONFIG, 'r') as f:
@@ -115,29 +236,192 @@ class AplicativoMobile(ctk.CTk):
             json.dump(self.config, f)
 
     def carregar_paradas_ativas(self):
+        # snapshot + replay do log de eventos: nada do que foi registrado antes de uma queda se perde
         try:
-            with open(ARQUIVO_TEMP, 'r') as f:
-                self.paradas_em_andamento = json.load(f)
-                for parada in self.paradas_em_andamento:
-                    parada['inicio'] = datetime.strptime(parada['inicio'], '%Y-%m-%d %H:%M:%S')
-        except (FileNotFoundError, json.JSONDecodeError):
-            pass
-
-    def salvar_paradas_ativas(self):
-        temp = []
-        for parada in self.paradas_em_andamento:
-            temp_parada = parada.copy()
-            temp_parada['inicio'] = temp_parada['inicio'].strftime('%Y-%m-%d %H:%M:%S')
-            temp.append(temp_parada)
-        with open(ARQUIVO_TEMP, 'w') as f:
-            json.dump(temp, f)
+            ativas, self.finalizadas_pendentes = self.registro_ativas.carregar()
+        except OSError:
+            ativas, self.finalizadas_pendentes = [], []
+        for parada in ativas:
+            parada['inicio'] = datetime.strptime(parada['inicio'], '%Y-%m-%d %H:%M:%S')
+        self.paradas_em_andamento = ativas
+
+    def reenviar_paradas_pendentes(self):
+        # paradas finalizadas cujo registro no histórico não foi confirmado antes de fechar/cair
+        pendentes = self.finalizadas_pendentes
+        self.finalizadas_pendentes = []
+        if not pendentes:
+            return
+        try:
+            presentes = self.backend.contem_ids(registro['id'] for registro in pendentes)
+        except Exception:
+            presentes = set()
+        for registro in pendentes:
+            if registro['id'] in presentes:
+                self.registro_ativas.confirmar(registro['id'])
+            else:
+                self.gravador.anexar(self.backend, registro, self._confirmacao_historico(registro['id']))
+        self.salvar_paradas_ativas(forcar=True)
+
+    def parada_serializada(self, parada):
+        return parada_serializada(parada)
+
+    @cronometrado()
+    def salvar_paradas_ativas(self, forcar=False):
+        # cada início/fim já foi para o log com fsync; aqui o log só é compactado no snapshot,
+        # no gravador e depois das paradas que já estavam na fila
+        if forcar or self.registro_ativas.precisa_compactar():
+            compactar = cronometrado('compactar_paradas_ativas')(self.registro_ativas.compactar)
+            self.gravador.executar(compactar, self._paradas_ativas_gravadas)
+
+    def _paradas_ativas_gravadas(self, erro):
+        if erro is not None:
+            messagebox.showerror("Erro", f"Erro ao salvar paradas ativas: {erro}")
+
+    def verificar_gravacoes(self):
+        # entrega na thread da interface as confirmações das gravações concluídas
+        # e os lotes de paradas vindos do CLP
+        self.gravador.processar_confirmacoes()
+        self.exportador.processar_confirmacoes()
+        if self.servico_clp is not None:
+            self.servico_clp.processar_lotes(self.aplicar_eventos_clp)
+        if self.thread_salvamento_ativa:
+            self.id_verificacao_gravacoes = self.after(100, self.verificar_gravacoes)
+
+    def iniciar_servico_clp(self):
+        # o serviço grava os lotes no log das ativas na própria thread; aqui só chegam prontos
+        servico = ServicoEventosCLP(self.registro_ativas, porta=self.config.get('clp_porta', PORTA_PADRAO),
+                                    janela_debounce=self.config.get('clp_debounce', 2.0))
+        servico.restaurar(p for p in self.paradas_em_andamento if p.get('origem') == 'clp')
+        servico.iniciar()  # a porta abre na thread do serviço; falha chega em aplicar_eventos_clp
+        self.servico_clp = servico
+
+    def aplicar_eventos_clp(self, lote):
+        if 'erro_porta' in lote:
+            messagebox.showerror("Erro", f"Não foi possível receber sinais do CLP: {lote['erro_porta']}")
+            self.servico_clp = None
+            return
+        if 'erro' in lote:
+            messagebox.showerror("Erro", f"Erro ao registrar paradas do CLP: {lote['erro']}")
+            return
+        self.paradas_em_andamento.extend(lote['inicios'])
+        finalizadas = {id_parada: (fim, duracao) for id_parada, fim, duracao in lote['fins']}
+        for parada in [p for p in self.paradas_em_andamento if p['id'] in finalizadas]:
+            parada['fim'], parada['duracao'] = finalizadas[parada['id']]
+            self._parada_finalizada(parada)
+        # a tela só é redesenhada uma vez por lote, e só se estiver à vista
+        if self.tela_atual == 'ativas':
+            self._atualizar_tela_ativas(self.telas['ativas'])
+        self.atualizar_status_bar()
 
     def verificar_diretorio(self):
         os.makedirs(self.config['diretorio'], exist_ok=True)
 
+    def configurar_instrumentacao(self):
+        # tempos das operações lentas e perfis do cProfile ficam junto dos dados
+        monitor.configurar(self.config['diretorio'], self.config.get('limite_operacao_lenta_ms', 250),
+                           self.config.get('perfil_cprofile', False))
+
     def caminho_arquivo(self, nome_arquivo):
         return os.path.join(self.config['diretorio'], nome_arquivo)
 
+    def exporta_planilha(self):
+        # no modo 'xlsx' a própria planilha é o histórico; nos demais ela é só uma exportação
+        return self.backend.nome != 'xlsx'
+
+    def preparar_historico(self):
+        # journal, SQLite, shards por estação ou planilha, conforme config['armazenamento'];
+        # um backend vazio importa uma única vez o histórico que já existir no diretório
+        self.backend = criar_backend(self.config.get('armazenamento'), self.config['diretorio'],
+                                     self.config.get('estacao'), self.config.get('carencia_particao_dias', 2),
+                                     self.config.get('retencao_meses', 0))
+        self.gravador.registrar_gancho(self.backend, self.backend.apos_gravar)
+        self.indice_motivos = None  # refeito do novo histórico na próxima tela com 'Outros'
+        try:
+            importar_historico_existente(self.backend, self.config['diretorio'])
+        except Exception as e:
+            messagebox.showerror("Erro", f"Erro ao importar histórico existente: {e}")
+        self.gravador.executar(self.backend.sincronizar)
+        self.arquivar_historico()
+
+    def arquivar_historico(self):
+        # modo 'mensal': fecha meses e aplica a retenção no gravador, fora dos lotes de paradas.
+        # os journals fechados só são apagados depois que a tela trocou as páginas que os liam
+        backend = self.backend
+        if not hasattr(backend, 'arquivar'):
+            return
+        resultado = {}
+
+        def arquivar():
+            resultado['fechados'], resultado['descartados'] = backend.arquivar()
+
+        def ao_concluir(erro):
+            if erro is not None:
+                messagebox.showerror("Erro", f"Erro ao arquivar partições do histórico: {erro}")
+                return
+            if not (resultado['fechados'] or resultado['descartados']):
+                return
+            if backend is self.backend and self.tela_atual == 'historico':
+                self._recarregar_historico()
+            self.gravador.executar(backend.liberar_fechadas)
+
+        self.gravador.executar(arquivar, ao_concluir)
+
+    def agendar_arquivamento(self):
+        intervalo = self.config.get('intervalo_arquivamento_min', 60)
+        if intervalo:
+            self.id_arquivamento = self.after(int(intervalo * 60000), self.arquivar_periodicamente)
+
+    def arquivar_periodicamente(self):
+        self.id_arquivamento = None
+        self.arquivar_historico()
+        self.agendar_arquivamento()
+
+    def exportar_historico_excel(self, avisar=True, so_se_desatualizada=False):
+        # a planilha é refeita no exportador, uma thread só dela: com um histórico grande a
+        # exportação leva segundos e não pode segurar as gravações nem a compactação das ativas
+        backend = self.backend
+        destino = self.caminho_arquivo(ARQUIVO_EXCEL)
+
+        def exportar():
+            # lê o histórico como estava quando o gravador esvaziou a fila (cada backend só
+            # entrega linhas completas, e o SQLite lê tudo numa transação só)
+            if not so_se_desatualizada or self.exportacao_desatualizada():
+                relatorio_excel.exportar_relatorio_excel(backend, destino)
+
+        def ao_concluir(erro):
+            if erro is not None:
+                messagebox.showerror("Erro", f"Erro ao exportar planilha: {erro}")
+            elif avisar:
+                messagebox.showinfo("Sucesso", f"Histórico exportado para {ARQUIVO_EXCEL}")
+
+        def apos_gravacoes_pendentes(erro):
+            self.exportador.executar(exportar, ao_concluir)
+
+        # espera só as paradas que já estavam na fila do gravador chegarem ao disco
+        self.gravador.executar(lambda: None, apos_gravacoes_pendentes)
+
+    def agendar_exportacao_excel(self):
+        # a planilha completa é refeita no exportador de tempos em tempos, nunca ao fechar:
+        # com um histórico grande a exportação levaria a janela junto
+        intervalo = self.config.get('intervalo_exportacao_excel_min', 60)
+        if intervalo:
+            self.id_exportacao = self.after(int(intervalo * 60000), self.exportar_periodicamente)
+
+    def exportar_periodicamente(self):
+        self.id_exportacao = None
+        if self.exporta_planilha():
+            self.exportar_historico_excel(avisar=False, so_se_desatualizada=True)
+        self.agendar_exportacao_excel()
+
+    def exportacao_desatualizada(self):
+        arquivo_excel = self.caminho_arquivo(ARQUIVO_EXCEL)
+        modificado_em = self.backend.modificado_em()
+        if modificado_em is None:
+            return False
+        if not os.path.exists(arquivo_excel):
+            return True
+        return modificado_em > os.path.getmtime(arquivo_excel)
+
     def selecionar_diretorio(self):
         novo_dir = filedialog.askdirectory(
             initialdir=self.config['diretorio'],
@@ -147,6 +431,8 @@ class AplicativoMobile(ctk.CTk):
             self.config['diretorio'] = novo_dir
             self.salvar_config()
             self.verificar_diretorio()
+            self.configurar_instrumentacao()
+            self.preparar_historico()
             messagebox.showinfo("Sucesso", f"Diretório alterado para:\n{novo_dir}")
 
     def criar_estilos(self):
@@ -164,38 +450,54 @@ class AplicativoMobile(ctk.CTk):
         self.cor_borda_card = "#555555" # Cor da borda dos cards (mais clara que o fundo)
         self.cor_borda_parada_ativa = "#666666" # Cor da borda para paradas ativas (mais clara)
 
-    def limpar_tela(self):
-        for widget in self.winfo_children():
-            widget.destroy()
+    def mostrar_tela(self, nome, construir, atualizar=None, com_status_bar=True):
+        # constrói a tela na primeira visita; nas seguintes só atualiza os dados e a traz para a frente
+        tela = self.telas.get(nome)
+        if tela is None:
+            tela = ctk.CTkFrame(self.area_telas, fg_color='transparent')
+            tela.grid(row=0, column=0, sticky='nsew')
+            construir(tela)
+            self.telas[nome] = tela
+        if com_status_bar:
+            self.criar_status_bar()
+            self.atualizar_status_bar()
+        elif hasattr(self, 'status_bar'):
+            self.status_bar.pack_forget()
+        tela.tkraise()
+        self.tela_atual = nome
+        if atualizar is not None:
+            atualizar(tela)
+        return tela
 
     def criar_tela_login(self):
-        self.limpar_tela()
+        self.mostrar_tela('login', self._construir_tela_login, com_status_bar=False)
 
-        ctk.CTkLabel(self, text="Controle de Paradas", font=self.font_titulo, text_color="#d3d3d3").pack(pady=20)
+    def _construir_tela_login(self, tela):
+        ctk.CTkLabel(tela, text="Controle de Paradas", font=self.font_titulo, text_color="#d3d3d3").pack(pady=20)
 
-        ctk.CTkLabel(self, text="Operador:", font=self.font_texto, text_color="#d3d3d3").pack(pady=10)
+        ctk.CTkLabel(tela, text="Operador:", font=self.font_texto, text_color="#d3d3d3").pack(pady=10)
 
-        self.entry_nome_operador = ctk.CTkEntry(self, placeholder_text='Digite seu usuário:')
+        self.entry_nome_operador = ctk.CTkEntry(tela, placeholder_text='Digite seu usuário:')
         self.entry_nome_operador.pack(pady=10, ipady=8, padx=20, fill='x')
         self.entry_nome_operador.focus()
 
-        ctk.CTkLabel(self, text='Senha', font=self.font_texto, text_color="#d3d3d3").pack(pady=10)
+        ctk.CTkLabel(tela, text='Senha', font=self.font_texto, text_color="#d3d3d3").pack(pady=10)
 
-        self.entry_senha_funcionario = ctk.CTkEntry(self, placeholder_text='Digite sua senha:', show="*")
+        self.entry_senha_funcionario = ctk.CTkEntry(tela, placeholder_text='Digite sua senha:', show="*")
         self.entry_senha_funcionario.pack(pady=10, ipady=8, padx=20, fill='x')
 
         # checkbox para mostrar/ocultar senha
         self.show_password_var = ctk.BooleanVar(value=False)
-        chk_show = ctk.CTkCheckBox(self, text='Mostrar senha', variable=self.show_password_var, command=self._toggle_password_visibility)
+        chk_show = ctk.CTkCheckBox(tela, text='Mostrar senha', variable=self.show_password_var, command=self._toggle_password_visibility)
         chk_show.pack(pady=5)
 
         # lembrar senha / usuário
         self.remember_var = ctk.BooleanVar(value=self.config.get('remember_me', False))
-        checkbox = ctk.CTkCheckBox(self, text='Lembrar usuário', variable=self.remember_var)
+        checkbox = ctk.CTkCheckBox(tela, text='Lembrar usuário', variable=self.remember_var)
         checkbox.pack(padx=10, pady=10)
 
-        ctk.CTkButton(self, text="Entrar", command=self.verificar_nome, height=50, font=self.font_botao).pack(pady=20, padx=20, fill='x')
-        self.label_resultado_login = ctk.CTkLabel(self, text='')
+        ctk.CTkButton(tela, text="Entrar", command=self.verificar_nome, height=50, font=self.font_botao).pack(pady=20, padx=20, fill='x')
+        self.label_resultado_login = ctk.CTkLabel(tela, text='')
         self.label_resultado_login.pack(pady=5)
 
         # preencher campos se havia usuário lembrado
@@ -223,15 +525,18 @@ class AplicativoMobile(ctk.CTk):
                 self.config['remember_me'] = False
                 self.config['last_user'] = ''
             self.salvar_config()
+            if self.config.get('aquecer_modulos'):
+                aquecer_modulos()
             self.after(1500, self.criar_tela_processos) # Redireciona após um breve delay
         else:
             self.label_resultado_login.configure(text="Nome ou senha incorretos!", text_color="red")
 
     def criar_tela_processos(self):
-        self.limpar_tela()
+        self.mostrar_tela('processos', self._construir_tela_processos)
 
+    def _construir_tela_processos(self, tela):
         # container rolável para processar muitos botões se necessário
-        container = ctk.CTkFrame(self)
+        container = ctk.CTkFrame(tela)
         container.pack(expand=True, fill='both', padx=15, pady=15)
         canvas = ctk.CTkCanvas(container, highlightthickness=0)
         scrollbar = ctk.CTkScrollbar(container, orientation='vertical', command=canvas.yview)
@@ -250,10 +555,7 @@ class AplicativoMobile(ctk.CTk):
             btn.grid(row=i//2, column=i%2, padx=5, pady=5, sticky='nsew')
             btn.configure(width=150, height=50)
 
-        self.criar_status_bar()
-        self.atualizar_status_bar()
-
-        rodape = ctk.CTkFrame(self, fg_color=self.cor_card)
+        rodape = ctk.CTkFrame(tela, fg_color=self.cor_card)
         rodape.pack(fill='x', padx=15, pady=15) # Aumentei padx e pady
         rodape.columnconfigure(0, weight=1)
         rodape.columnconfigure(1, weight=1)
@@ -270,14 +572,16 @@ class AplicativoMobile(ctk.CTk):
         self.criar_tela_motivos()
 
     def criar_tela_motivos(self):
-        self.limpar_tela()
+        # uma tela por processo, criada na primeira vez que o processo é escolhido
+        self.mostrar_tela(f'motivos:{self.processo_selecionado}', self._construir_tela_motivos, self._atualizar_tela_motivos)
 
-        cabecalho = ctk.CTkFrame(self, fg_color=self.cor_card)
+    def _construir_tela_motivos(self, tela):
+        cabecalho = ctk.CTkFrame(tela, fg_color=self.cor_card)
         cabecalho.pack(fill='x', padx=10, pady=10)
         ctk.CTkButton(cabecalho, text="← Voltar", font=self.font_botao, text_color=self.cor_botao_texto, fg_color=self.cor_principal, hover_color="#2980b9", command=self.criar_tela_processos).pack(side='left', padx=5) # Adicionei padx
         ctk.CTkLabel(cabecalho, text=self.processo_selecionado, font=self.font_texto, text_color=self.cor_texto_principal).pack(side='left', padx=10)
 
-        container = ctk.CTkFrame(self)
+        container = ctk.CTkFrame(tela)
         container.pack(expand=True, fill='both', padx=15, pady=15) # Aumentei padx e pady
         container.columnconfigure(0, weight=1)
 
@@ -287,11 +591,77 @@ class AplicativoMobile(ctk.CTk):
             btn = ctk.CTkButton(container, text=motivo, font=self.font_texto, text_color=self.cor_motivo_texto, fg_color=self.cor_motivo_botao, hover_color="#cccccc", border_width=1, border_color=self.cor_borda_card, command=lambda m=motivo: self.registrar_parada(m))
             btn.pack(fill='x', pady=3, padx=5) # Adicionei padx e um pequeno pady
 
+        tela.entry_outros = None
         if 'Outros' in motivos:
-            self.entry_outros = ctk.CTkEntry(container, font=self.font_texto)
-            self.entry_outros.pack(fill='x', pady=5, padx=5)
-            self.entry_outros.insert(0, "Descreva o motivo...")
-            self.entry_outros.bind("<FocusIn>", lambda e: self.entry_outros.delete(0, 'end'))
+            entry_outros = ctk.CTkEntry(container, font=self.font_texto)
+            entry_outros.pack(fill='x', pady=5, padx=5)
+            entry_outros.bind("<FocusIn>", lambda e: entry_outros.delete(0, 'end'))
+            tela.entry_outros = entry_outros
+            # motivos já digitados antes, do mais usado para o menos; os botões são sempre os mesmos
+            tela.frame_sugestoes = ctk.CTkFrame(container, fg_color='transparent')
+            tela.frame_sugestoes.pack(fill='x', padx=5)
+            tela.botoes_sugestao = []
+            for _ in range(5):
+                botao = ctk.CTkButton(tela.frame_sugestoes, text='', font=self.font_texto, text_color=self.cor_motivo_texto, fg_color=self.cor_motivo_botao, hover_color="#cccccc", anchor='w')
+                botao.configure(command=lambda b=botao: self._usar_sugestao(tela, b.cget('text')))
+                tela.botoes_sugestao.append(botao)
+            entry_outros.bind("<KeyRelease>", lambda e: self._mostrar_sugestoes(tela))
+
+    def _indice(self):
+        # enquanto o índice é montado no gravador, vale só o mapa de canônicos (um JSON pequeno)
+        if self.indice_motivos is None:
+            self.indice_motivos = IndiceMotivos(canonicos=ler_canonicos(self.config['diretorio']))
+            self._montar_indice_motivos()
+        return self.indice_motivos
+
+    def _montar_indice_motivos(self):
+        # contar os motivos pode ler o histórico inteiro (e descomprimir os meses arquivados):
+        # roda na thread de gravação e o índice pronto volta pela confirmação, na thread da interface
+        backend = self.backend
+        diretorio = self.config['diretorio']
+        provisorio = self.indice_motivos
+        montado = {}
+
+        def montar():
+            contagens = {motivo: n for motivo, n in backend.contagem_motivos().items()
+                         if motivo not in MOTIVOS_CATALOGO}
+            montado['indice'] = IndiceMotivos(contagens, ler_canonicos(diretorio))
+
+        def ao_concluir(erro):
+            if erro is not None or self.backend is not backend or self.indice_motivos is not provisorio:
+                return  # histórico trocado no meio da montagem: a próxima tela com 'Outros' refaz
+            indice = montado['indice']
+            # paradas registradas durante a montagem ainda não estavam no histórico
+            for texto, quantidade in zip(provisorio.textos, provisorio.frequencias):
+                indice.registrar(texto, quantidade)
+            self.indice_motivos = indice
+            tela = self.telas.get(self.tela_atual)
+            if getattr(tela, 'entry_outros', None) is not None:
+                self._mostrar_sugestoes(tela)
+
+        self.gravador.executar(montar, ao_concluir)
+
+    def _mostrar_sugestoes(self, tela):
+        texto = tela.entry_outros.get()
+        sugestoes = self._indice().sugerir(texto) if texto != "Descreva o motivo..." else []
+        for botao in tela.botoes_sugestao:
+            botao.pack_forget()
+        for botao, sugestao in zip(tela.botoes_sugestao, sugestoes):
+            botao.configure(text=sugestao)
+            botao.pack(fill='x', pady=2)
+
+    def _usar_sugestao(self, tela, texto):
+        tela.entry_outros.delete(0, 'end')
+        tela.entry_outros.insert(0, texto)
+        self._mostrar_sugestoes(tela)
+
+    def _atualizar_tela_motivos(self, tela):
+        # a tela é reaproveitada: o campo 'Outros' volta ao texto de instrução
+        self.entry_outros = tela.entry_outros
+        if tela.entry_outros is not None:
+            tela.entry_outros.delete(0, 'end')
+            tela.entry_outros.insert(0, "Descreva o motivo...")
+            self._mostrar_sugestoes(tela)
 
     def registrar_parada(self, motivo):
         if motivo == 'Outros':
@@ -299,8 +669,13 @@ class AplicativoMobile(ctk.CTk):
             if not motivo or motivo == "Descreva o motivo...":
                 messagebox.showwarning("Atenção", "Descreva o motivo da parada!")
                 return
+            # a mesma grafia para o mesmo motivo, e já sugerida na próxima vez que for digitado
+            indice = self._indice()
+            motivo = indice.canonico(motivo)
+            indice.registrar(motivo)
 
         nova_parada = {
+            'id': uuid.uuid4().hex,
             'funcionario': self.nome_funcionario.get(),
             'processo': self.processo_selecionado,
             'motivo': motivo,
@@ -309,136 +684,216 @@ class AplicativoMobile(ctk.CTk):
             'duracao': None
         }
 
+        try:
+            # uma linha com fsync no log; custo constante, independente de quantas estão ativas
+            self.registro_ativas.iniciar(self.parada_serializada(nova_parada))
+        except OSError as e:
+            messagebox.showerror("Erro", f"Erro ao registrar parada: {e}")
+            return
+
         self.paradas_em_andamento.append(nova_parada)
         self.criar_status_bar()
         self.atualizar_status_bar()
         self.mostrar_paradas_ativas()
 
     def mostrar_paradas_ativas(self):
-        self.limpar_tela()
-        self.criar_status_bar()
-        self.atualizar_status_bar()
+        self.mostrar_tela('ativas', self._construir_tela_ativas, self._atualizar_tela_ativas)
 
-        cabecalho = ctk.CTkFrame(self, fg_color=self.cor_card)
+    def _construir_tela_ativas(self, tela):
+        cabecalho = ctk.CTkFrame(tela, fg_color=self.cor_card)
         cabecalho.pack(fill='x', padx=10, pady=10)
         ctk.CTkButton(cabecalho, text="← Voltar", font=self.font_botao, text_color=self.cor_botao_texto, fg_color=self.cor_principal, hover_color="#2980b9", command=self.criar_tela_processos).pack(side='left', padx=5) # Adicionei padx
         ctk.CTkLabel(cabecalho, text="Paradas Ativas", font=self.font_texto, text_color=self.cor_texto_principal).pack(side='left', padx=10)
 
-        if not self.paradas_em_andamento:
-            ctk.CTkLabel(self, text="Nenhuma parada ativa.", font=self.font_texto, text_color=self.cor_texto_principal).pack(pady=20)
-            return
+        tela.label_vazia = ctk.CTkLabel(tela, text="Nenhuma parada ativa.", font=self.font_texto, text_color=self.cor_texto_principal)
 
-        container_paradas = ctk.CTkFrame(self)
-        container_paradas.pack(expand=True, fill='both')
-        container_paradas.columnconfigure(0, weight=1)
-        container_paradas.rowconfigure(0, weight=1)
+        tela.container_paradas = ctk.CTkFrame(tela)
+        tela.container_paradas.columnconfigure(0, weight=1)
+        tela.container_paradas.rowconfigure(0, weight=1)
 
-        canvas = ctk.CTkCanvas(container_paradas, highlightthickness=0)
-        barra_rolagem = ctk.CTkScrollbar(container_paradas, orientation="vertical", command=canvas.yview)
-        frame_rolavel = ctk.CTkFrame(canvas)
+        canvas = ctk.CTkCanvas(tela.container_paradas, highlightthickness=0)
+        barra_rolagem = ctk.CTkScrollbar(tela.container_paradas, orientation="vertical", command=canvas.yview)
+        tela.frame_rolavel = ctk.CTkFrame(canvas)
 
-        frame_rolavel.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
-        canvas.create_window((0, 0), window=frame_rolavel, anchor="nw")
+        tela.frame_rolavel.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
+        canvas.create_window((0, 0), window=tela.frame_rolavel, anchor="nw")
         canvas.configure(yscrollcommand=barra_rolagem.set)
 
         canvas.pack(side="left", fill="both", expand=True)
         barra_rolagem.pack(side="right", fill="y")
 
-        for parada in self.paradas_em_andamento:
-            frame_parada = ctk.CTkFrame(frame_rolavel, fg_color=self.cor_parada_ativa, border_color=self.cor_borda_parada_ativa, border_width=1)
-            frame_parada.pack(fill='x', pady=5, padx=5)
-            frame_parada.columnconfigure(0, weight=1)
-            frame_parada.columnconfigure(1, weight=0)
-
-            inicio_formatado = parada['inicio'].strftime('%H:%M:%S')
-            label_info = ctk.CTkLabel(frame_parada, text=f"{parada['processo']} - {parada['motivo']}\nInício: {inicio_formatado}", font=self.font_texto, text_color=self.cor_texto_principal, anchor='w')
-            label_info.grid(row=0, column=0, padx=10, pady=5, sticky='ew')
+        # id da parada -> (frame da linha, label do tempo decorrido, início)
+        tela.linhas = {}
 
-            btn_finalizar = ctk.CTkButton(frame_parada, text="Finalizar", font=self.font_botao, text_color=self.cor_botao_texto, fg_color='DarkGreen', hover_color="#2e8b57", command=lambda p=parada: self.finalizar_parada(p))
-            btn_finalizar.grid(row=0, column=1, padx=10, pady=5, sticky='e')
+    def _atualizar_tela_ativas(self, tela):
+        # só cria as linhas das paradas novas e destrói as das que foram finalizadas
+        ids = {parada['id'] for parada in self.paradas_em_andamento}
+        for id_parada in [id_parada for id_parada in tela.linhas if id_parada not in ids]:
+            tela.linhas.pop(id_parada)[0].destroy()
+        for parada in self.paradas_em_andamento:
+            if parada['id'] not in tela.linhas:
+                tela.linhas[parada['id']] = self._criar_linha_parada_ativa(tela.frame_rolavel, parada)
+        self.atualizar_cronometros()
 
+        if not self.paradas_em_andamento:
+            tela.container_paradas.pack_forget()
+            tela.label_vazia.pack(pady=20)
+        else:
+            tela.label_vazia.pack_forget()
+            if not tela.container_paradas.winfo_manager():
+                tela.container_paradas.pack(expand=True, fill='both')
+
+    def _criar_linha_parada_ativa(self, master, parada):
+        frame_parada = ctk.CTkFrame(master, fg_color=self.cor_parada_ativa, border_color=self.cor_borda_parada_ativa, border_width=1)
+        frame_parada.pack(fill='x', pady=5, padx=5)
+        frame_parada.columnconfigure(0, weight=1)
+        frame_parada.columnconfigure(1, weight=0)
+
+        inicio_formatado = parada['inicio'].strftime('%H:%M:%S')
+        label_info = ctk.CTkLabel(frame_parada, text=f"{parada['processo']} - {parada['motivo']}\nInício: {inicio_formatado}", font=self.font_texto, text_color=self.cor_texto_principal, anchor='w')
+        label_info.grid(row=0, column=0, padx=10, pady=(5, 0), sticky='ew')
+        label_tempo = ctk.CTkLabel(frame_parada, text="", font=self.font_botao, text_color=self.cor_texto_principal, anchor='w')
+        label_tempo.grid(row=1, column=0, padx=10, pady=(0, 5), sticky='ew')
+
+        btn_finalizar = ctk.CTkButton(frame_parada, text="Finalizar", font=self.font_botao, text_color=self.cor_botao_texto, fg_color='DarkGreen', hover_color="#2e8b57", command=lambda p=parada: self.finalizar_parada(p))
+        btn_finalizar.grid(row=0, column=1, rowspan=2, padx=10, pady=5, sticky='e')
+        return frame_parada, label_tempo, parada['inicio']
+
+    def atualizar_cronometros(self):
+        # um único timer para todas as paradas: a cada segundo só troca o texto dos labels
+        # de tempo decorrido; para sozinho quando a tela sai da frente ou não há paradas
+        if self.id_cronometro is not None:
+            self.after_cancel(self.id_cronometro)
+            self.id_cronometro = None
+        tela = self.telas.get('ativas')
+        if tela is None or self.tela_atual != 'ativas' or not tela.linhas:
+            return
+        agora = datetime.now()
+        for _, label_tempo, inicio in tela.linhas.values():
+            segundos = max(0, int((agora - inicio).total_seconds()))
+            horas, resto = divmod(segundos, 3600)
+            label_tempo.configure(text=f"⏱ {horas:02d}:{resto // 60:02d}:{resto % 60:02d}")
+        # agenda para a próxima virada de segundo, para os contadores andarem juntos
+        self.id_cronometro = self.after(1000 - agora.microsecond // 1000, self.atualizar_cronometros)
+
+    @cronometrado()
     def finalizar_parada(self, parada):
         fim = datetime.now()
         duracao = (fim - parada['inicio']).total_seconds() / 60
         parada['fim'] = fim
         parada['duracao'] = duracao
 
-        self.salvar_parada_historico(parada)
-        self.paradas_em_andamento.remove(parada)
-        self.salvar_paradas_ativas()
+        try:
+            # o fim fica no log até o histórico confirmar a gravação
+            if parada.get('origem') == 'clp':
+                # o fim do CLP pode já estar no log, a caminho da interface: aí o lote dele finaliza
+                if not self.registro_ativas.finalizar_varios([(parada['id'], registro_de_parada(parada))]):
+                    return
+            else:
+                self.registro_ativas.finalizar(parada['id'], registro_de_parada(parada))
+        except OSError as e:
+            messagebox.showerror("Erro", f"Erro ao finalizar parada: {e}")
+            return
+
+        self._parada_finalizada(parada)
         self.mostrar_paradas_ativas()
         # atualiza barra de status após finalizar
         self.atualizar_status_bar()
 
+    def _parada_finalizada(self, parada):
+        # mesmo caminho para o botão "Finalizar" e para o fim vindo do CLP
+        self.salvar_parada_historico(parada)
+        self.paradas_em_andamento.remove(parada)
+        self.salvar_paradas_ativas()
+
+    @cronometrado()
     def salvar_parada_historico(self, parada):
-        arquivo_excel = self.caminho_arquivo('paradas.xlsx')
-        try:
-            with self.abrir_planilha(arquivo_excel) as wb:
-                if 'Paradas' not in wb.sheetnames:
-                    ws = wb.create_sheet('Paradas')
-                    ws.append(['Data', 'Processo', 'Funcionário', 'Motivo', 'Início', 'Fim', 'Duração (min)'])
-                    ws.column_dimensions['A'].width = 15
-                    ws.column_dimensions['B'].width = 15
-                    ws.column_dimensions['C'].width = 20
-                    ws.column_dimensions['D'].width = 30
-                    ws.column_dimensions['E'].width = 15
-                    ws.column_dimensions['F'].width = 15
-                    ws.column_dimensions['G'].width = 15
-                    cabecalho = ws['A1:G1']
-                    for cell in cabecalho[0]:
-                        cell.font = Font(bold=True)
-                        cell.alignment = Alignment(horizontal='center')
-                        cell.border = Border(bottom=Side(style='thin'))
-                        cell.fill = PatternFill(start_color="DDDDDD", end_color="DDDDDD", fill_type="solid")
-                else:
-                    ws = wb['Paradas']
-
-                ws.append([
-                    parada['inicio'].strftime('%Y-%m-%d'),
-                    parada['processo'],
-                    parada['funcionario'],
-                    parada['motivo'],
-                    parada['inicio'].strftime('%H:%M:%S'),
-                    parada['fim'].strftime('%H:%M:%S'),
-                    parada['duracao']
-                ])
-
-                ultima_linha = ws.max_row
-                intervalo_tempo = ws[f'E{ultima_linha}:F{ultima_linha}']
-                for cell in intervalo_tempo[0]:
-                    cell.alignment = Alignment(horizontal='center')
-
-                duracao_cell = ws[f'G{ultima_linha}']
-                duracao_cell.number_format = '0.00'
-                duracao_cell.alignment = Alignment(horizontal='right')
+        # só enfileira: o gravador junta as paradas do intervalo numa escrita única
+        self.gravador.anexar(self.backend, registro_de_parada(parada), self._confirmacao_historico(parada['id']))
 
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao salvar histórico: {e}")
+    def _confirmacao_historico(self, id_parada):
+        def ao_concluir(erro):
+            if erro is not None:
+                messagebox.showerror("Erro", f"Erro ao salvar histórico: {erro}")
+            else:
+                self.registro_ativas.confirmar(id_parada)
+        return ao_concluir
 
     def mostrar_historico(self):
-        self.limpar_tela()
-        self.criar_status_bar()
-        self.atualizar_status_bar()
-
-        tabview = ctk.CTkTabview(self)
+        self.mostrar_tela('historico', self._construir_tela_historico, self._atualizar_tela_historico)
+
+    def _atualizar_tela_historico(self, tela=None):
+        # gráficos só são redesenhados se a chave dos totais mudou; a lista relê só a página visível
+        self._assinatura_historico = self.backend.assinatura()
+        self.atualizar_historico(self.lista_historico)
+        self.gerar_graficos_historicos(self.frame_graficos)
+        self._indicadores_defasados = True
+        self._ao_trocar_aba_historico()
+        self._sincronizar_historico()
+        self.acompanhar_historico()
+
+    def _sincronizar_historico(self):
+        # o que outros terminais gravaram é juntado pelo gravador, fora da thread da interface;
+        # a tela só é relida se a sincronização trouxe algo
+        backend = self.backend
+        resultado = {}
+
+        def sincronizar():
+            resultado['mudou'] = backend.sincronizar()
+
+        def ao_concluir(erro):
+            if erro is None and resultado.get('mudou') and backend is self.backend and self.tela_atual == 'historico':
+                self._recarregar_historico()
+
+        self.gravador.executar(sincronizar, ao_concluir)
+
+    def _recarregar_historico(self):
+        self.atualizar_historico(self.lista_historico, manter_posicao=True)
+        self.gerar_graficos_historicos(self.frame_graficos)
+        self._indicadores_defasados = True
+        self._ao_trocar_aba_historico()
+
+    def acompanhar_historico(self):
+        # enquanto o histórico está na frente, um after() confere só mtime e tamanho do
+        # armazenamento; se mudou, a lista e os rollups leem apenas o que foi anexado desde
+        # a última leitura. para sozinho quando a tela sai da frente
+        if self.id_acompanhamento is not None:
+            self.after_cancel(self.id_acompanhamento)
+            self.id_acompanhamento = None
+        intervalo = self.config.get('intervalo_acompanhamento_historico', 0)
+        if self.tela_atual != 'historico' or not intervalo:
+            return
+        try:
+            assinatura = self.backend.assinatura()
+        except OSError:
+            assinatura = self._assinatura_historico  # pasta de rede fora do ar: tenta de novo depois
+        if assinatura != self._assinatura_historico:
+            self._assinatura_historico = assinatura
+            self._recarregar_historico()
+            self._sincronizar_historico()
+        self.id_acompanhamento = self.after(int(intervalo * 1000), self.acompanhar_historico)
+
+    def _ao_trocar_aba_historico(self):
+        # os indicadores releem o histórico inteiro: só são recalculados com a aba à vista
+        if self._indicadores_defasados and self.abas_historico.get() == "Indicadores":
+            self._indicadores_defasados = False
+            self.gerar_indicadores(self.texto_indicadores)
+
+    def _construir_tela_historico(self, tela):
+        tabview = ctk.CTkTabview(tela, command=self._ao_trocar_aba_historico)
         tabview.pack(expand=True, fill='both', padx=10, pady=10)
+        self.abas_historico = tabview
 
-        # Aba de Histórico
+        # Aba de Histórico: filtros + lista virtual, só as linhas visíveis viram widgets
         tabview.add("Histórico")
-        container_historico = ctk.CTkFrame(tabview.tab("Histórico"))
-        container_historico.pack(expand=True, fill='both')
-        container_historico.columnconfigure(0, weight=1)
-
-        canvas_historico = ctk.CTkCanvas(container_historico, highlightthickness=0)
-        barra_rolagem_historico = ctk.CTkScrollbar(container_historico, orientation="vertical", command=canvas_historico.yview)
-        frame_rolavel_historico = ctk.CTkFrame(canvas_historico)
-        frame_rolavel_historico.columnconfigure(0, weight=1)
-        frame_rolavel_historico.bind("<Configure>", lambda e: canvas_historico.configure(scrollregion=canvas_historico.bbox("all")))
-        canvas_historico.create_window((0, 0), window=frame_rolavel_historico, anchor="nw")
-        canvas_historico.configure(yscrollcommand=barra_rolagem_historico.set)
-        canvas_historico.pack(side="left", fill="both", expand=True)
-        barra_rolagem_historico.pack(side="right", fill="y")
-        self.atualizar_historico(frame_rolavel_historico)
+        self.criar_filtros_historico(tabview.tab("Histórico"))
+        self.lista_historico = ListaVirtual(
+            tabview.tab("Histórico"),
+            formatar=self.texto_linha_historico,
+            estilo_linha={'fg_color': self.cor_card, 'border_color': self.cor_borda_card, 'border_width': 1},
+            estilo_texto={'font': self.font_texto, 'text_color': self.cor_texto_principal}
+        )
+        self.lista_historico.pack(expand=True, fill='both')
 
         # Aba de Gráficos com rolagem na aba inteira e gráficos na vertical
         tab_graficos = tabview.add("Gráficos")
@@ -451,62 +906,59 @@ class AplicativoMobile(ctk.CTk):
         canvas_graficos_aba.configure(yscrollcommand=barra_rolagem_graficos_aba.set)
         canvas_graficos_aba.pack(side="left", fill="both", expand=True)
         barra_rolagem_graficos_aba.pack(side="right", fill="y")
-        self.gerar_graficos_historicos(self.frame_graficos) # Gerar os gráficos dentro do self.frame_graficos
+
+        # Aba de Indicadores (MTTR, MTBF, percentis e Pareto)
+        tab_indicadores = tabview.add("Indicadores")
+        self.texto_indicadores = ctk.CTkTextbox(tab_indicadores, font=self.font_texto, wrap='none')
+        self.texto_indicadores.pack(expand=True, fill='both')
 
         # Cabeçalho e botões (sem alterações para esta questão)
-        cabecalho = ctk.CTkFrame(self, fg_color=self.cor_card)
+        cabecalho = ctk.CTkFrame(tela, fg_color=self.cor_card)
         cabecalho.pack(fill='x', padx=10, pady=10)
         ctk.CTkButton(cabecalho, text="← Voltar", font=self.font_botao, text_color=self.cor_botao_texto, fg_color=self.cor_principal, hover_color="#2980b9", command=self.criar_tela_processos).pack(side='left')
         ctk.CTkLabel(cabecalho, text="Histórico e Gráficos", font=self.font_texto, text_color=self.cor_texto_principal).pack(side='left', padx=10)
 
         frame_botoes_rodape = ctk.CTkFrame(cabecalho)
         frame_botoes_rodape.pack(side='right')
-        ctk.CTkButton(frame_botoes_rodape, text="🔄", font=self.font_botao, text_color=self.cor_botao_texto, fg_color=self.cor_principal, hover_color="#2980b9", command=self.atualizar_historico).pack(side='left', padx=2)
+        if self.exporta_planilha():
+            ctk.CTkButton(frame_botoes_rodape, text="📤", font=self.font_botao, text_color=self.cor_botao_texto, fg_color=self.cor_principal, hover_color="#2980b9", command=self.exportar_historico_excel).pack(side='left', padx=2)
+        ctk.CTkButton(frame_botoes_rodape, text="🔄", font=self.font_botao, text_color=self.cor_botao_texto, fg_color=self.cor_principal, hover_color="#2980b9", command=self._atualizar_tela_historico).pack(side='left', padx=2)
         ctk.CTkButton(frame_botoes_rodape, text="🗑️", font=self.font_botao, text_color=self.cor_botao_texto, fg_color=self.cor_principal, hover_color="#2980b9", command=self.apagar_relatorio).pack(side='left', padx=2)
 
+    def renderizador(self):
+        if self._renderizador is None:
+            self._renderizador = graficos.RenderizadorGraficos()
+        return self._renderizador
+
+    @cronometrado()
     def gerar_graficos_historicos(self, container):
-        for widget in container.winfo_children():
-            widget.destroy()
         container.columnconfigure(0, weight=1) # Garante que o conteúdo se expande horizontalmente
 
         try:
-            arquivo_excel = self.caminho_arquivo('paradas.xlsx')
-            with self.abrir_planilha(arquivo_excel) as wb:
-                if 'Paradas' not in wb.sheetnames:
-                    ctk.CTkLabel(container, text="Nenhum dado de parada registrado.", text_color='red').pack(pady=20)
-                    return
-                ws_paradas = wb['Paradas']
-
-                dados_processos = {}
-                dados_motivos = {}
-                total_tempo = 0
-
-                for row in ws_paradas.iter_rows(min_row=2, max_col=7, values_only=True):
-                    if row and row[0] != 'TOTAL' and row[1] and row[3] and row[6]:
-                        processo = row[1]
-                        motivo = row[3]
-                        duracao = row[6] or 0
-                        total_tempo += duracao
-                        dados_processos[processo] = dados_processos.get(processo, 0) + duracao
-                        dados_motivos[motivo] = dados_motivos.get(motivo, 0) + duracao
-
-                frame_processos = ctk.CTkFrame(container)
-                frame_processos.pack(fill='x', pady=5) # Use pack para empilhar verticalmente
-                self.criar_grafico_barras_porcentagem(
-                    frame_processos,
-                    dados_processos,
-                    "Tempo de Parada por Processo",
-                    total_tempo
-                )
-
-                frame_motivos = ctk.CTkFrame(container)
-                frame_motivos.pack(fill='x', pady=5) # Use pack para empilhar verticalmente
-                self.criar_grafico_barras_porcentagem(
-                    frame_motivos,
-                    dados_motivos,
-                    "Tempo de Parada por Motivo",
-                    total_tempo
-                )
+            # cada backend agrega do seu jeito: rollups no journal, GROUP BY no SQLite
+            totais = self.backend.totais()
+            if totais is None:
+                self._limpar_graficos(container)
+                ctk.CTkLabel(container, text="Nenhum dado de parada registrado.", text_color='red').pack(pady=20)
+                return
+            dados_processos, dados_motivos, total_tempo = totais
+
+            largura_px = max(self.winfo_width() - 60, 320)
+            lista_graficos = [
+                (dados_processos, "Tempo de Parada por Processo"),
+                (dados_motivos, "Tempo de Parada por Motivo"),
+            ]
+            chaves = [graficos.chave_grafico(dados, titulo, total_tempo, largura_px, self.cor_fundo) for dados, titulo in lista_graficos]
+            # dados iguais aos já exibidos neste container: mantém as imagens como estão
+            if getattr(container, 'chaves_graficos', None) == chaves and container.winfo_children():
+                return
+            self._limpar_graficos(container)
+            container.chaves_graficos = chaves
+
+            for (dados, titulo), chave in zip(lista_graficos, chaves):
+                frame = ctk.CTkFrame(container)
+                frame.pack(fill='x', pady=5) # Use pack para empilhar verticalmente
+                self.criar_grafico_barras_porcentagem(frame, dados, titulo, total_tempo, chave, largura_px)
 
         except FileNotFoundError:
             ctk.CTkLabel(container, text="Arquivo de histórico não encontrado.", text_color='red').pack(pady=20)
@@ -515,92 +967,196 @@ class AplicativoMobile(ctk.CTk):
         except Exception as e:
             ctk.CTkLabel(container, text=f"Erro ao gerar gráficos: {str(e)}", text_color='red').pack()
 
-    def criar_grafico_barras_porcentagem(self, container, dados, titulo, total_tempo):
+    def _limpar_graficos(self, container):
+        for widget in container.winfo_children():
+            widget.destroy()
+        container.chaves_graficos = None
+
+    def colunas_historico(self):
+        # histórico em colunas NumPy, reaproveitado enquanto o backend não mudar
+        chave = (id(self.backend), self.backend.modificado_em())
+        cache = getattr(self, '_cache_colunas', None)
+        if cache and chave[1] is not None and cache[0] == chave:
+            return cache[1]
+        colunas = analise.carregar_colunas(self.backend.iterar())
+        self._cache_colunas = (chave, colunas)
+        return colunas
+
+    @cronometrado()
+    def gerar_indicadores(self, caixa):
+        try:
+            if not self.backend.existe():
+                texto = "Nenhum dado de parada registrado."
+            else:
+                colunas = self.colunas_historico()
+                disponibilidade = analise.calcular_disponibilidade(
+                    colunas, self.config['tempo_planejado_turno_min'], self.config['dias_producao'])
+                texto = (analise.formatar_disponibilidade(disponibilidade, "Disponibilidade (paradas simultâneas contam uma vez)")
+                         + "\n\n"
+                         + analise.formatar_indicadores(analise.calcular_indicadores(colunas, 'processo'), "Por processo")
+                         + "\n\n"
+                         + analise.formatar_indicadores(analise.calcular_indicadores(colunas, 'motivo'), "Por motivo"))
+        except Exception as e:
+            texto = f"Erro ao calcular indicadores: {str(e)}"
+        caixa.configure(state='normal')
+        caixa.delete('1.0', 'end')
+        caixa.insert('1.0', texto)
+        caixa.configure(state='disabled')
+
+    @cronometrado()
+    def criar_grafico_barras_porcentagem(self, container, dados, titulo, total_tempo, chave=None, largura_px=None):
         try:
             if not dados:
                 raise ValueError("Nenhum dado disponível")
 
-            fig = plt.figure(figsize=(8, 6), dpi=100, facecolor=self.cor_fundo)
-            ax = fig.add_subplot(111)
-
-            labels = list(dados.keys())
-            tempos = list(dados.values())
-            porcentagens = [(t / total_tempo) * 100 if total_tempo > 0 else 0 for t in tempos]
-
-            num_labels = len(labels)
-            cores = plt.cm.viridis(np.linspace(0, 1, num_labels)) # Usar o mapa de cores 'viridis'
-
-            x = range(num_labels)
-            bars = ax.bar(x, tempos, color=cores, align='center') # Aplicar as cores
-
-            ax.set_ylabel("Tempo Total (minutos)", fontsize=12)
-            ax.set_xlabel("Processo/Motivo", fontsize=12)
-            ax.set_title(titulo, fontsize=14)
-
-            ax.set_xticks(x)
-            ax.set_xticklabels(labels, rotation=45, ha='right', fontsize=10)
-
-            ax.tick_params(axis='y', labelsize=10)
-            ax.grid(axis='y', linestyle='--')
+            largura_px = largura_px or max(self.winfo_width() - 60, 320)
+            chave = chave or graficos.chave_grafico(dados, titulo, total_tempo, largura_px, self.cor_fundo)
 
-            for bar, porcentagem in zip(bars, porcentagens):
-                height = bar.get_height()
-                ax.text(bar.get_x() + bar.get_width()/2, height + 0.5, f'{porcentagem:.1f}%', ha='center', va='bottom', fontsize=9)
+            label = tk.Label(container, text="Gerando gráfico...", bd=0, bg=self.cor_fundo)
+            label.pack(fill='both', expand=True)
 
-            plt.tight_layout(pad=1.5, w_pad=2.0, h_pad=2.0)
-
-            canvas = FigureCanvasTkAgg(fig, master=container)
-            canvas.draw()
-            canvas.get_tk_widget().pack(fill='both', expand=True)
+            png = self.renderizador().obter(chave)
+            if png is not None:
+                self._exibir_grafico(label, png)
+                return
+            futuro = self.renderizador().renderizar(chave, dict(dados), titulo, total_tempo, largura_px, self.cor_fundo)
+            self._aguardar_grafico(label, futuro, titulo)
 
         except ValueError as ve:
             ctk.CTkLabel(container, text=f"Erro no gráfico ({titulo}): {str(ve)}", text_color='red').pack()
         except Exception as e:
             ctk.CTkLabel(container, text=f"Erro no gráfico ({titulo}): {str(e)}", text_color='red').pack()
 
-    def atualizar_historico(self, container):
-        if container:
-            for widget in container.winfo_children():
-                widget.destroy()
-
+    def _aguardar_grafico(self, label, futuro, titulo):
+        # o Agg roda na thread do renderizador; aqui só se confere o resultado pelo after()
+        if not label.winfo_exists():
+            return
+        if not futuro.done():
+            self.after(50, self._aguardar_grafico, label, futuro, titulo)
+            return
+        try:
+            self._exibir_grafico(label, futuro.result())
+        except Exception as e:
+            label.configure(text=f"Erro no gráfico ({titulo}): {str(e)}", fg='red')
+
+    def _exibir_grafico(self, label, png):
+        imagem = tk.PhotoImage(master=label, data=base64.b64encode(png))
+        label.configure(image=imagem, text='')
+        label.imagem = imagem  # mantém a referência enquanto o label existir
+
+    def criar_filtros_historico(self, master):
+        # filtros respondidos pelo índice do histórico: só as linhas encontradas são lidas.
+        # o painel faz parte da tela em cache, então os campos guardam o que foi digitado
+        self.filtros_historico = {}
+        barra = ctk.CTkFrame(master, fg_color='transparent')
+        barra.pack(fill='x', pady=(0, 5))
+        painel = ctk.CTkFrame(master, fg_color=self.cor_card)
+        painel.columnconfigure((0, 1), weight=1)
+
+        def alternar():
+            if painel.winfo_manager():
+                painel.pack_forget()
+            else:
+                painel.pack(fill='x', pady=(0, 5), after=barra)
+
+        botao_filtros = ctk.CTkButton(barra, text="Filtros ▾", font=self.font_botao, text_color=self.cor_botao_texto, fg_color=self.cor_principal, hover_color="#2980b9", command=alternar)
+        botao_filtros.pack(side='left')
+
+        entry_de = ctk.CTkEntry(painel, placeholder_text='De (DD/MM/AAAA)')
+        entry_ate = ctk.CTkEntry(painel, placeholder_text='Até (DD/MM/AAAA)')
+        entry_de.grid(row=0, column=0, padx=5, pady=5, sticky='ew')
+        entry_ate.grid(row=0, column=1, padx=5, pady=5, sticky='ew')
+
+        turno = ctk.StringVar(value='Todos os turnos')
+        ctk.CTkOptionMenu(painel, variable=turno, values=['Todos os turnos'] + [nome for nome, _, _ in TURNOS]).grid(row=1, column=0, padx=5, pady=5, sticky='ew')
+        processo = ctk.StringVar(value='Todos os processos')
+        ctk.CTkOptionMenu(painel, variable=processo, values=['Todos os processos'] + PROCESSOS).grid(row=1, column=1, padx=5, pady=5, sticky='ew')
+
+        motivos = sorted({motivo for lista in MOTIVOS_POR_PROCESSO.values() for motivo in lista})
+        combo_motivo = ctk.CTkComboBox(painel, values=[''] + motivos)
+        combo_motivo.set('')
+        combo_motivo.grid(row=2, column=0, padx=5, pady=5, sticky='ew')
+        entry_funcionario = ctk.CTkEntry(painel, placeholder_text='Funcionário')
+        entry_funcionario.grid(row=2, column=1, padx=5, pady=5, sticky='ew')
+
+        def definir(filtros):
+            self.filtros_historico = filtros
+            botao_filtros.configure(text=f"Filtros ({len(filtros)}) ▾" if filtros else "Filtros ▾")
+            self.atualizar_historico()
+
+        def aplicar():
+            novos = {}
             try:
-                arquivo_excel = self.caminho_arquivo('paradas.xlsx')
-                if not os.path.exists(arquivo_excel):
-                    ctk.CTkLabel(container, text="Nenhum registro encontrado", font=self.font_texto, text_color=self.cor_texto_principal).pack()
-                    return
-
-                with self.abrir_planilha(arquivo_excel) as wb:
-                    if 'Paradas' not in wb.sheetnames:
-                        ctk.CTkLabel(container, text="Nenhum registro de paradas encontrado.", font=self.font_texto, text_color=self.cor_texto_principal).pack()
-                        return
-                    ws_paradas = wb['Paradas']
-
-                    for row in ws_paradas.iter_rows(min_row=2, values_only=True):
-                        if row and row[0] == 'TOTAL':
-                            continue
-
-                        frame = ctk.CTkFrame(container, fg_color=self.cor_card, border_color=self.cor_borda_card, border_width=1)
-                        frame.pack(fill='x', pady=8)
-                        frame.columnconfigure(0, weight=1)
-
-                        texto = (f"Data: {row[0]}\n"
-                                 f"Processo: {row[1]}\n"
-                                 f"Motivo: {row[3]}\n"
-                                 f"Duração: {row[6]:.2f} min ({row[4]} - {row[5]})")
-
-                        ctk.CTkLabel(frame, text=texto, font=self.font_texto, text_color=self.cor_texto_principal, anchor='w', padx=20).pack(side='left', fill='x', expand=True, pady=20)
-
-            except FileNotFoundError:
-                ctk.CTkLabel(container, text="Nenhum registro encontrado", font=self.font_texto, text_color=self.cor_texto_principal).pack()
-            except KeyError:
-                ctk.CTkLabel(container, text="Estrutura do arquivo de histórico inválida.", font=self.font_texto, text_color='red').pack()
+                for entry, chave in ((entry_de, 'data_inicial'), (entry_ate, 'data_final')):
+                    if entry.get().strip():
+                        novos[chave] = self.data_do_filtro(entry.get())
+            except ValueError:
+                messagebox.showerror("Erro", "Data inválida. Use DD/MM/AAAA.")
+                return
+            if turno.get() != 'Todos os turnos':
+                novos['turno'] = turno.get()
+            if processo.get() != 'Todos os processos':
+                novos['processo'] = processo.get()
+            for chave, valor in (('motivo', combo_motivo.get()), ('funcionario', entry_funcionario.get())):
+                if valor.strip():
+                    novos[chave] = valor.strip()
+            definir(novos)
+
+        def limpar():
+            for entry in (entry_de, entry_ate, entry_funcionario):
+                entry.delete(0, 'end')
+            turno.set('Todos os turnos')
+            processo.set('Todos os processos')
+            combo_motivo.set('')
+            definir({})
+
+        ctk.CTkButton(painel, text="Aplicar", font=self.font_botao, text_color=self.cor_botao_texto, fg_color=self.cor_principal, hover_color="#2980b9", command=aplicar).grid(row=3, column=0, padx=5, pady=5, sticky='ew')
+        ctk.CTkButton(painel, text="Limpar", font=self.font_botao, text_color=self.cor_botao_texto, fg_color=self.cor_motivo_botao, hover_color="#2980b9", command=limpar).grid(row=3, column=1, padx=5, pady=5, sticky='ew')
+
+    def data_do_filtro(self, texto):
+        # aceita DD/MM/AAAA (como o operador digita) ou AAAA-MM-DD (como o histórico grava)
+        texto = texto.strip()
+        for formato in ('%d/%m/%Y', '%Y-%m-%d'):
+            try:
+                return datetime.strptime(texto, formato).strftime('%Y-%m-%d')
+            except ValueError:
+                continue
+        raise ValueError(texto)
+
+    def texto_linha_historico(self, row):
+        if row is None:
+            return "Registro ilegível no histórico"
+        return (f"Data: {row[0]}\n"
+                f"Processo: {row[1]}\n"
+                f"Motivo: {row[3]}\n"
+                f"Duração: {row[6] or 0:.2f} min ({row[4]} - {row[5]})")
+
+    @cronometrado()
+    def atualizar_historico(self, container=None, manter_posicao=False):
+        lista = container or getattr(self, 'lista_historico', None)
+        if lista is None or not lista.winfo_exists():
+            return
+        try:
+            # fonte paginada: as linhas são lidas do backend sob demanda
+            filtros = getattr(self, 'filtros_historico', None)
+            if filtros:
+                lista.definir_fonte(self.backend.filtrar(**filtros), "Nenhuma parada atende aos filtros", manter_posicao)
+            else:
+                lista.definir_fonte(self.backend.paginas(), "Nenhum registro encontrado", manter_posicao)
+        except FileNotFoundError:
+            lista.definir_fonte(None, "Nenhum registro encontrado")
+        except KeyError:
+            lista.definir_fonte(None, "Estrutura do arquivo de histórico inválida.")
     def apagar_relatorio(self):
-        arquivo_excel = self.caminho_arquivo('paradas.xlsx')
-        if os.path.exists(arquivo_excel):
+        arquivo_excel = self.caminho_arquivo(ARQUIVO_EXCEL)
+        if os.path.exists(arquivo_excel) or self.backend.existe():
             confirmacao = messagebox.askyesno("Atenção", "Deseja apagar todo o histórico de paradas?")
             if confirmacao:
                 try:
-                    os.remove(arquivo_excel)
+                    # apaga também a exportação, senão ela seria reimportada no próximo início
+                    self.backend.apagar()
+                    if os.path.exists(arquivo_excel):
+                        os.remove(arquivo_excel)
                     messagebox.showinfo("Sucesso", "Histórico de paradas apagado!")
                     # Recarregar a tela para refletir a mudança nas abas
                     self.mostrar_historico()
@@ -612,7 +1168,7 @@ class AplicativoMobile(ctk.CTk):
     def mostrar_configuracoes(self):
         tela_config = ctk.CTkToplevel(self)
         tela_config.title("Configurações")
-        tela_config.geometry("300x150")
+        tela_config.geometry("460x480")
         tela_config.resizable(False, False)
 
         ctk.CTkLabel(tela_config, text="Diretório de Salvamento:", font=self.font_texto).pack(pady=10)
@@ -624,24 +1180,90 @@ class AplicativoMobile(ctk.CTk):
         btn_selecionar_diretorio = ctk.CTkButton(tela_config, text="Alterar Diretório", command=self.selecionar_diretorio)
         btn_selecionar_diretorio.pack(pady=10)
 
+        # tempos das operações de disco e de desenho desde que o aplicativo foi aberto
+        ctk.CTkLabel(tela_config, text="Desempenho:", font=self.font_texto).pack(pady=(10, 5))
+        caixa_desempenho = ctk.CTkTextbox(tela_config, height=180, wrap='none',
+                                          font=ctk.CTkFont(family="Courier", size=12))
+        caixa_desempenho.pack(fill='both', expand=True, padx=10)
+
+        perfil_var = ctk.BooleanVar(value=self.config.get('perfil_cprofile', False))
+
+        def alternar_perfil():
+            self.config['perfil_cprofile'] = perfil_var.get()
+            self.salvar_config()
+            self.configurar_instrumentacao()
+
+        ctk.CTkCheckBox(tela_config, text="Gravar perfil (cProfile) das operações lentas", variable=perfil_var,
+                        command=alternar_perfil).pack(pady=5)
+        ctk.CTkButton(tela_config, text="Atualizar", command=lambda: self.mostrar_desempenho(caixa_desempenho)).pack(pady=(0, 10))
+        self.mostrar_desempenho(caixa_desempenho)
+
+    def mostrar_desempenho(self, caixa):
+        # p50/p95/máximo das últimas medições de cada operação, em milissegundos
+        linhas = monitor.resumo()
+        if not linhas:
+            texto = "Nenhuma operação medida ainda."
+        else:
+            texto = f"{'operação':<28}{'n':>6}{'p50':>9}{'p95':>9}{'máx':>9}  histograma\n"
+            for nome, total, p50, p95, maximo in linhas:
+                # uma barra por faixa do histograma (de ≤1 ms até >5 s), proporcional à contagem
+                faixas = monitor.faixas(nome)
+                maior = max(faixas) or 1
+                barras = ''.join(' ▁▂▃▄▅▆▇█'[round(c / maior * 8)] for c in faixas)
+                texto += (f"{nome:<28}{total:>6}{p50 * 1000:>9.1f}{p95 * 1000:>9.1f}{maximo * 1000:>9.1f}"
+                          f"  {barras}\n")
+            texto += (f"\nem ms; histograma de ≤{FAIXAS_MS[0]} ms a >{FAIXAS_MS[-1]} ms. Acima de "
+                      f"{monitor.limite_lento * 1000:.0f} ms a operação é registrada em "
+                      f"{os.path.join(self.config['diretorio'], ARQUIVO_OPERACOES_LENTAS)}")
+        caixa.configure(state='normal')
+        caixa.delete('1.0', 'end')
+        caixa.insert('1.0', texto)
+        caixa.configure(state='disabled')
+
     def criar_status_bar(self):
-        # adiciona barra de status na parte inferior da janela
-        if hasattr(self, 'status_bar') and self.status_bar.winfo_exists():
-            return
-        self.status_bar = ctk.CTkLabel(self, text="", font=self.font_texto, fg_color=self.cor_card, anchor='w')
-        self.status_bar.pack(side='bottom', fill='x')
+        # adiciona barra de status na parte inferior da janela (criada uma vez, só escondida no login)
+        if not hasattr(self, 'status_bar'):
+            self.status_bar = ctk.CTkLabel(self, text="", font=self.font_texto, fg_color=self.cor_card, anchor='w')
+        if not self.status_bar.winfo_manager():
+            self.status_bar.pack(side='bottom', fill='x', before=self.area_telas)
 
     def atualizar_status_bar(self):
         # mostra número de paradas ativas e usuário logado
         try:
             count = len(self.paradas_em_andamento)
             user = self.nome_funcionario.get()
-            self.status_bar.configure(text=f"Paradas ativas: {count} • Usuário: {user}")
+            texto = f"Paradas ativas: {count} • Usuário: {user}"
+            estacao = getattr(self.backend, 'estacao', None)
+            if estacao:
+                texto += f" • Estação: {estacao}"
+            self.status_bar.configure(text=texto)
         except Exception:
             pass
 
     def ao_fechar(self):
-        self.salvar_paradas_ativas()
+        if self.servico_clp is not None:
+            # para de receber sinais e aplica os lotes que já estavam gravados no log das ativas
+            self.servico_clp.encerrar()
+            self.servico_clp.processar_lotes(self.aplicar_eventos_clp)
+            self.servico_clp = None
+        self.salvar_paradas_ativas(forcar=True)
+        # espera o gravador esvaziar a fila antes de fechar a janela
+        self.thread_salvamento_ativa = False
+        self.after_cancel(self.id_verificacao_gravacoes)
+        if self.id_cronometro is not None:
+            self.after_cancel(self.id_cronometro)
+        if self.id_acompanhamento is not None:
+            self.after_cancel(self.id_acompanhamento)
+        if self.id_exportacao is not None:
+            self.after_cancel(self.id_exportacao)
+        if self.id_arquivamento is not None:
+            self.after_cancel(self.id_arquivamento)
+        self.gravador.encerrar()
+        self.gravador.processar_confirmacoes()
+        # uma exportação em andamento é abandonada: a planilha só é trocada quando fica pronta
+        self.exportador.encerrar(timeout=0)
+        if self._renderizador is not None:
+            self._renderizador.encerrar()
         self.destroy()
 
 if __name__ == "__main__":
@@ -0,0 +1,247 @@
+import json
+import math
+import os
+import unicodedata
+from bisect import bisect_left
+from difflib import SequenceMatcher
+from heapq import nlargest
+from catalogo import MOTIVOS_POR_PROCESSO
+
+# motivos digitados no campo 'Outros': sugestões enquanto o operador digita e agrupamento
+# das variantes de digitação ("falta de energia", "Falta  de Energia.", "Falta de enrgia")
+# num motivo canônico. o mapa variante -> canônico fica em motivos_canonicos.json, no
+# diretório de dados, e vale tanto para o histórico reescrito quanto para as novas paradas:
+#   python paradas_cli.py normalizar-motivos            mostra o que seria agrupado
+#   python paradas_cli.py normalizar-motivos --aplicar  grava o mapa e reescreve o histórico
+
+ARQUIVO_CANONICOS = 'motivos_canonicos.json'
+MOTIVOS_CATALOGO = sorted({motivo for motivos in MOTIVOS_POR_PROCESSO.values() for motivo in motivos
+                           if motivo != 'Outros'})
+# prefixos até este tamanho têm o ranking pronto; acima disso o intervalo na lista ordenada é pequeno
+PREFIXO_PRECALCULADO = 3
+SUGESTOES_POR_PREFIXO = 8
+SEMELHANCA_SUGESTAO = 0.5
+# teto de motivos comparados por busca aproximada: acima disso a busca fica aproximada
+ORCAMENTO_CANDIDATOS = 256
+SEMELHANCA_AGRUPAMENTO = 0.85
+SEMELHANCA_PALAVRA = 0.75
+TAMANHO_LOTE = 5000
+ARQUIVO_TRABALHO = 'motivos_normalizados.jsonl'
+
+
+def normalizar(texto):
+    # sem acento, caixa, pontuação e espaços repetidos: a chave de comparação dos motivos
+    sem_acento = ''.join(c for c in unicodedata.normalize('NFKD', texto) if not unicodedata.combining(c))
+    return ' '.join(''.join(c if c.isalnum() else ' ' for c in sem_acento.casefold()).split())
+
+
+def trigramas(chave):
+    chave = f'  {chave} '
+    return {chave[i:i + 3] for i in range(len(chave) - 2)}
+
+
+def _mesma_forma(chave, outra):
+    # erro de digitação estraga uma palavra, não troca uma por outra: "Máquina 1" e "Máquina 2",
+    # ou "motor travado" e "robo travado", são motivos diferentes por mais parecidos que sejam
+    palavras, outras = chave.split(), outra.split()
+    if len(palavras) != len(outras):
+        return False
+    diferentes = [(p, o) for p, o in zip(palavras, outras) if p != o]
+    return len(diferentes) <= 1 and all(
+        not p.isdigit() and not o.isdigit() and SequenceMatcher(None, p, o).ratio() >= SEMELHANCA_PALAVRA
+        for p, o in diferentes)
+
+
+def ler_canonicos(diretorio):
+    try:
+        with open(os.path.join(diretorio, ARQUIVO_CANONICOS), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def gravar_canonicos(diretorio, canonicos):
+    caminho = os.path.join(diretorio, ARQUIVO_CANONICOS)
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(canonicos, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(temporario, caminho)
+
+
+class IndiceMotivos:
+    # um item por motivo normalizado, com o texto mais usado para exibir e o número de paradas.
+    # prefixos curtos respondem de um dicionário com o ranking pronto, os longos por bisect na
+    # lista ordenada das chaves; se faltar sugestão, os trigramas acham as grafias parecidas
+    def __init__(self, contagens=None, canonicos=None):
+        # canonicos: {variante: texto canônico}, como em motivos_canonicos.json
+        self.canonicos = {normalizar(variante): canonico for variante, canonico in (canonicos or {}).items()}
+        self.chaves = []        # por id
+        self.textos = []
+        self.frequencias = []
+        self._grafias = []      # {texto: paradas} de cada id, para escolher o texto exibido
+        self._ids = {}
+        self._ordenadas = []    # chaves em ordem alfabética, com os ids na mesma posição
+        self._ids_ordenados = []
+        self._prefixos = {}
+        self._trigramas = {}
+        self._trigramas_ids = []   # conjunto de trigramas de cada id, para não refazer na comparação
+        for texto, quantidade in (contagens or {}).items():
+            self.registrar(texto, quantidade)
+
+    def _chave(self, texto):
+        chave = normalizar(texto)
+        canonico = self.canonicos.get(chave)
+        return (normalizar(canonico), canonico) if canonico else (chave, None)
+
+    def registrar(self, texto, quantidade=1):
+        # chamado na construção e a cada parada nova com texto livre
+        if not texto or not texto.strip():
+            return
+        chave, canonico = self._chave(texto)
+        if not chave:
+            return
+        texto = canonico or ' '.join(texto.split())
+        id_motivo = self._ids.get(chave)
+        if id_motivo is None:
+            id_motivo = self._ids[chave] = len(self.chaves)
+            self.chaves.append(chave)
+            self.textos.append(texto)
+            self.frequencias.append(0)
+            self._grafias.append({})
+            posicao = bisect_left(self._ordenadas, chave)
+            self._ordenadas.insert(posicao, chave)
+            self._ids_ordenados.insert(posicao, id_motivo)
+            tri = trigramas(chave)
+            self._trigramas_ids.append(tri)
+            for trigrama in tri:
+                self._trigramas.setdefault(trigrama, []).append(id_motivo)
+        grafias = self._grafias[id_motivo]
+        grafias[texto] = grafias.get(texto, 0) + quantidade
+        self.frequencias[id_motivo] += quantidade
+        self.textos[id_motivo] = canonico or max(grafias, key=grafias.get)
+        # rankings prontos dos prefixos curtos: só os desta chave mudam
+        for tamanho in range(1, min(PREFIXO_PRECALCULADO, len(chave)) + 1):
+            ranking = self._prefixos.setdefault(chave[:tamanho], [])
+            if id_motivo not in ranking:
+                ranking.append(id_motivo)
+            ranking.sort(key=lambda i: -self.frequencias[i])
+            del ranking[SUGESTOES_POR_PREFIXO:]
+
+    def canonico(self, texto):
+        # texto que deve ser gravado: o canônico do mapa, ou a grafia mais usada do mesmo motivo
+        chave, canonico = self._chave(texto)
+        if canonico:
+            return canonico
+        id_motivo = self._ids.get(chave)
+        return self.textos[id_motivo] if id_motivo is not None else ' '.join(texto.split())
+
+    def sugerir(self, texto, limite=5):
+        chave = normalizar(texto)
+        if not chave:
+            return []
+        if len(chave) <= PREFIXO_PRECALCULADO:
+            ids = self._prefixos.get(chave, [])[:limite]
+        else:
+            inicio = bisect_left(self._ordenadas, chave)
+            fim = bisect_left(self._ordenadas, chave + '\uffff')
+            ids = nlargest(limite, self._ids_ordenados[inicio:fim], key=self.frequencias.__getitem__)
+        if not ids and len(chave) >= 3:
+            # nenhum motivo começa assim: provavelmente erro de digitação
+            ids = self._parecidos(chave, limite)
+        return [self.textos[i] for i in ids]
+
+    def _parecidos(self, chave, limite, semelhanca=SEMELHANCA_SUGESTAO):
+        # coeficiente de Dice dos trigramas: 2 * comuns / (trigramas da consulta + do motivo).
+        # para passar do limite um motivo precisa ter pelo menos `minimo` trigramas em comum com
+        # a consulta, então basta procurar candidatos nas listas dos trigramas mais raros da
+        # consulta e pular as mais longas (' fa', 'de ', ...), que custariam quase tudo. se nem as
+        # raras cabem no orçamento, para nas que cabem: pode perder um parecido, nunca trava a tela
+        tri = trigramas(chave)
+        minimo = max(1, math.ceil(semelhanca * len(tri) / 2))
+        listas = sorted((self._trigramas.get(t, ()) for t in tri), key=len)[:len(tri) - minimo + 1]
+        maior = len(tri) * (2 - semelhanca) / semelhanca
+        candidatos = set()
+        for lista in listas:
+            if candidatos and len(candidatos) + len(lista) > ORCAMENTO_CANDIDATOS:
+                break
+            candidatos.update(lista)
+        notas = []
+        for id_motivo in candidatos:
+            outros = self._trigramas_ids[id_motivo]
+            if len(outros) > maior:
+                continue
+            nota = 2 * len(tri & outros) / (len(tri) + len(outros))
+            if nota >= semelhanca:
+                notas.append((nota, self.frequencias[id_motivo], id_motivo))
+        return [id_motivo for _, _, id_motivo in nlargest(limite, notas)]
+
+
+def agrupar_motivos(contagens, semelhanca=SEMELHANCA_AGRUPAMENTO, catalogo=MOTIVOS_CATALOGO):
+    # {texto: paradas} -> {variante: canônico}, só com os textos que mudam. o mesmo motivo
+    # normalizado vira a grafia mais usada (ou a do catálogo); depois, do mais frequente para
+    # o menos, cada motivo livre é juntado ao canônico mais parecido já escolhido
+    grupos = {}
+    for texto, quantidade in contagens.items():
+        chave = normalizar(texto or '')
+        if chave:
+            grafias = grupos.setdefault(chave, {})
+            grafias[texto] = grafias.get(texto, 0) + quantidade
+
+    canonicos = IndiceMotivos()
+    destino = {}
+    for motivo in catalogo:
+        canonicos.registrar(motivo, float('inf'))
+        destino[normalizar(motivo)] = motivo
+
+    ordem = sorted(grupos, key=lambda chave: -sum(grupos[chave].values()))
+    for chave in ordem:
+        if chave in destino:
+            continue
+        grafias = grupos[chave]
+        escolhido = None
+        for id_motivo in canonicos._parecidos(chave, 5, semelhanca=semelhanca * 0.8):
+            candidata = canonicos.chaves[id_motivo]
+            if _mesma_forma(chave, candidata) and SequenceMatcher(None, chave, candidata).ratio() >= semelhanca:
+                escolhido = destino[candidata]
+                break
+        if escolhido is None:
+            escolhido = ' '.join(max(grafias, key=grafias.get).split())
+            canonicos.registrar(escolhido, sum(grafias.values()))
+        destino[chave] = escolhido
+
+    return {texto: destino[chave] for chave, grafias in grupos.items() for texto in grafias
+            if texto != destino[chave]}
+
+
+def reescrever_motivos(backend, diretorio, mapa):
+    # troca os motivos de todo o histórico pelo canônico. os registros (com os mesmos ids) vão
+    # primeiro para um arquivo de trabalho no formato do journal; se algo falhar no meio, ele
+    # continua na pasta com o histórico completo. não serve para o 'compartilhado', em que
+    # cada estação grava no próprio shard
+    if backend.nome == 'compartilhado':
+        raise ValueError("o armazenamento 'compartilhado' não pode ser reescrito")
+    trabalho = os.path.join(diretorio, ARQUIVO_TRABALHO)
+    alterados = 0
+    with open(trabalho, 'w', encoding='utf-8') as f:
+        for registro in backend.iterar():
+            novo = mapa.get(registro.get('motivo'))
+            if novo:
+                registro = dict(registro, motivo=novo)
+                alterados += 1
+            f.write(json.dumps(registro, ensure_ascii=False) + '\n')
+    if not alterados:
+        os.remove(trabalho)
+        return 0
+    backend.apagar()
+    with open(trabalho, 'r', encoding='utf-8') as f:
+        lote = []
+        for linha in f:
+            lote.append(json.loads(linha))
+            if len(lote) >= TAMANHO_LOTE:
+                backend.anexar_varios(lote)
+                lote = []
+        if lote:
+            backend.anexar_varios(lote)
+    backend.apos_gravar()
+    os.remove(trabalho)
+    return alterados
@@ -0,0 +1,27 @@
+import os
+import sys
+import uuid
+
+import pytest
+
+# os módulos ficam na raiz do repositório, sem pacote
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def novo_registro():
+    # registro finalizado no formato do journal; os campos podem ser trocados por argumento
+    def criar(**campos):
+        registro = {
+            'id': uuid.uuid4().hex,
+            'data': '2024-05-02',
+            'processo': 'Raku-Raku',
+            'funcionario': 'Ana',
+            'motivo': 'Falta de bandeja',
+            'inicio': '10:00:00',
+            'fim': '10:05:00',
+            'duracao': 5.0
+        }
+        registro.update(campos)
+        return registro
+    return criar
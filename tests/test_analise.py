@@ -0,0 +1,28 @@
+import pytest
+
+from analise import NOME_LINHA, calcular_disponibilidade, carregar_colunas, formatar_disponibilidade
+from armazenamento import TURNOS
+
+
+def test_parado_exibido_so_conta_dias_de_producao(novo_registro):
+    registros = [
+        novo_registro(data='2024-05-04', inicio='08:00:00', duracao=300.0),  # sábado
+        novo_registro(data='2024-05-06', inicio='08:00:00', duracao=30.0),   # segunda
+        novo_registro(data='2024-05-06', inicio='08:10:00', duracao=10.0),   # sobreposta à anterior
+    ]
+    planejado_turno = {nome: 60 for nome, _, _ in TURNOS}
+    disponibilidade = calcular_disponibilidade(carregar_colunas(registros), planejado_turno, dias_producao=range(5))
+
+    for item in disponibilidade:
+        assert item['planejado'] == 180.0  # só a segunda é dia de produção
+        assert item['parado'] == 30.0
+        assert item['fora_do_planejado'] == 300.0
+        assert item['parado_somado'] == 340.0
+        assert item['sobreposto'] == 10.0
+        assert item['disponibilidade'] == pytest.approx(100.0 * 150 / 180)
+        assert item['parado'] <= item['planejado']
+    assert disponibilidade[-1]['nome'] == NOME_LINHA
+
+    texto = formatar_disponibilidade(disponibilidade, 'Disponibilidade')
+    assert 'Parado: 30.0 min de 180 planejados' in texto
+    assert 'Fora dos dias de produção: 300.0 min' in texto
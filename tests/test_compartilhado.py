@@ -0,0 +1,74 @@
+import os
+
+from backends_historico import ARQUIVO_MANIFESTO, BackendCompartilhado
+
+
+def _ids(backend):
+    return sorted(r['id'] for r in backend.iterar())
+
+
+def test_consolida_shards_de_duas_estacoes(tmp_path, novo_registro):
+    a = BackendCompartilhado(str(tmp_path), 'linha-a')
+    b = BackendCompartilhado(str(tmp_path), 'linha-b')
+    registros_a = [novo_registro(id=f'a{i}', inicio=f'10:0{i}:00') for i in range(3)]
+    registros_b = [novo_registro(id=f'b{i}', inicio=f'09:0{i}:00', processo='Pintura') for i in range(2)]
+    a.anexar_varios(registros_a)
+    a.apos_gravar()
+    b.anexar_varios(registros_b)
+    b.apos_gravar()
+
+    esperado = sorted(r['id'] for r in registros_a + registros_b)
+    assert _ids(a) == esperado
+    assert _ids(b) == esperado
+    processos, _, total = a.totais()
+    assert processos == {'Raku-Raku': 15.0, 'Pintura': 10.0}
+    assert total == 25.0
+    assert sorted(r['id'] for r in b.consultar(processo='Pintura')) == ['b0', 'b1']
+
+
+def test_leitura_nao_consolida_nem_regrava_o_manifesto(tmp_path, novo_registro):
+    a = BackendCompartilhado(str(tmp_path), 'linha-a')
+    b = BackendCompartilhado(str(tmp_path), 'linha-b')
+    a.anexar_varios([novo_registro(id='a0')])
+    a.apos_gravar()
+    manifesto = os.path.join(str(tmp_path), ARQUIVO_MANIFESTO)
+    antes = os.stat(manifesto).st_mtime_ns
+
+    b.anexar_varios([novo_registro(id='b0')])  # gravado, mas o gravador de b ainda não consolidou
+    assert b.existe()
+    assert _ids(a) == ['a0']
+    a.totais()
+    assert os.stat(manifesto).st_mtime_ns == antes
+
+    assert a.sincronizar() is True
+    assert _ids(a) == ['a0', 'b0']
+    assert a.sincronizar() is False
+    assert a.totais()[2] == 10.0
+
+
+def test_mesmo_id_em_dois_shards_entra_uma_vez(tmp_path, novo_registro):
+    # a mesma planilha importada em duas estações gera os mesmos ids
+    registro = novo_registro(id='repetido')
+    for estacao in ('linha-a', 'linha-b'):
+        backend = BackendCompartilhado(str(tmp_path), estacao)
+        backend.anexar_varios([registro])
+        backend.apos_gravar()
+    assert _ids(BackendCompartilhado(str(tmp_path), 'linha-c')) == ['repetido']
+
+
+def test_shard_truncado_refaz_o_consolidado(tmp_path, novo_registro):
+    a = BackendCompartilhado(str(tmp_path), 'linha-a')
+    b = BackendCompartilhado(str(tmp_path), 'linha-b')
+    a.anexar_varios([novo_registro(id='a0'), novo_registro(id='a1')])
+    a.apos_gravar()
+    b.anexar_varios([novo_registro(id='b0')])
+    b.apos_gravar()
+    geracao = a._ler_manifesto()['geracao']
+
+    a.shard.apagar()
+    a.anexar_varios([novo_registro(id='a2')])
+    a.apos_gravar()
+
+    assert a._ler_manifesto()['geracao'] == geracao + 1
+    assert _ids(b) == ['a2', 'b0']
+    assert b.totais()[2] == 10.0
@@ -0,0 +1,70 @@
+import json
+import socket
+import time
+
+from armazenamento import ParadasAtivasWAL
+from eventos_clp import ServicoEventosCLP
+
+
+def _servico(pasta, porta=0):
+    registro_ativas = ParadasAtivasWAL(str(pasta / 'ativas.json'), str(pasta / 'ativas.wal'))
+    registro_ativas.carregar()
+    return ServicoEventosCLP(registro_ativas, porta=porta, janela_debounce=0.2, intervalo_lote=0.05)
+
+
+def _enviar(porta, *eventos):
+    with socket.create_connection(('127.0.0.1', porta)) as conexao:
+        for evento in eventos:
+            conexao.sendall((json.dumps(evento) + '\n').encode('utf-8'))
+            time.sleep(0.02)
+
+
+def _esperar_lotes(servico, quantidade, timeout=5):
+    lotes = []
+    limite = time.monotonic() + timeout
+    while len(lotes) < quantidade and time.monotonic() < limite:
+        servico.processar_lotes(lotes.append)
+        time.sleep(0.02)
+    return lotes
+
+
+def test_sinais_viram_lotes_depois_do_debounce(tmp_path):
+    servico = _servico(tmp_path)
+    servico.iniciar()  # não bloqueia: a porta é aberta na thread do serviço
+    try:
+        assert servico.aguardar_porta(5)
+        sinal = {'processo': 'Raku-Raku', 'motivo': 'Falta de bandeja', 'equipamento': 'Prensa 1'}
+        # oscilação: o fim descarta o primeiro início; o segundo, estável pela janela, vira a parada
+        _enviar(servico.porta, dict(sinal, tipo='inicio', instante='2024-05-02T09:59:59'),
+                dict(sinal, tipo='fim'), dict(sinal, tipo='inicio', instante='2024-05-02T10:00:00'))
+        [inicio] = _esperar_lotes(servico, 1)
+        [parada] = inicio['inicios']
+        assert inicio['fins'] == []
+        assert parada['funcionario'] == 'Prensa 1'
+        assert parada['inicio'].isoformat() == '2024-05-02T10:00:00'
+
+        _enviar(servico.porta, dict(sinal, tipo='fim', instante='2024-05-02T10:05:00'))
+        [fim] = _esperar_lotes(servico, 1)
+        assert fim['inicios'] == []
+        assert [(id_parada, duracao) for id_parada, _, duracao in fim['fins']] == [(parada['id'], 5.0)]
+    finally:
+        servico.encerrar()
+
+    ativas, pendentes = servico.registro_ativas.carregar()
+    assert ativas == []
+    assert [registro['id'] for registro in pendentes] == [parada['id']]
+
+
+def test_porta_ocupada_chega_pela_fila(tmp_path):
+    ocupado = socket.socket()
+    ocupado.bind(('127.0.0.1', 0))
+    ocupado.listen()
+    try:
+        servico = _servico(tmp_path, ocupado.getsockname()[1])
+        servico.iniciar()
+        assert not servico.aguardar_porta(5)
+        [lote] = _esperar_lotes(servico, 1)
+        assert isinstance(lote['erro_porta'], OSError)
+        servico.encerrar()
+    finally:
+        ocupado.close()
@@ -0,0 +1,69 @@
+import csv
+
+import pytest
+
+import paradas_cli
+from armazenamento import importar_csv_legado
+from backends_historico import criar_backend
+
+LINHAS = [
+    ['Raku-Raku', 'Ana', 'Falta de bandeja', '2024-05-02 10:00:00', '2024-05-02 10:05:00', '5.0'],
+    ['Pintura', 'Bruno', 'Troca de cor', '2024-05-02 23:50:00', '2024-05-03 00:10:00', '20.0'],
+    ['linha inválida'],
+    ['Raku-Raku', 'Ana', 'Setup', '2024-05-03 07:00:00', '2024-05-03 07:30:00', '30'],
+]
+
+
+def _gravar_csv(caminho, linhas):
+    with open(caminho, 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows(linhas)
+
+
+@pytest.mark.parametrize('armazenamento', ['journal', 'sqlite', 'mensal'])
+def test_csv_importado_volta_igual(tmp_path, armazenamento):
+    arquivo = tmp_path / 'paradas.csv'
+    _gravar_csv(arquivo, LINHAS)
+    backend = criar_backend(armazenamento, str(tmp_path))
+
+    assert importar_csv_legado(str(arquivo), backend, tamanho_lote=2) == (3, 1, 0)
+    backend.apos_gravar()
+
+    registros = sorted(backend.iterar(), key=lambda r: (r['data'], r['inicio']))
+    assert [(r['data'], r['processo'], r['funcionario'], r['motivo'], r['inicio'], r['fim'], r['duracao'])
+            for r in registros] == [
+        ('2024-05-02', 'Raku-Raku', 'Ana', 'Falta de bandeja', '10:00:00', '10:05:00', 5.0),
+        ('2024-05-02', 'Pintura', 'Bruno', 'Troca de cor', '23:50:00', '00:10:00', 20.0),
+        ('2024-05-03', 'Raku-Raku', 'Ana', 'Setup', '07:00:00', '07:30:00', 30.0),
+    ]
+    assert backend.totais()[2] == 55.0
+
+
+def test_reimportar_o_mesmo_csv_nao_duplica(tmp_path):
+    arquivo = tmp_path / 'paradas.csv'
+    _gravar_csv(arquivo, LINHAS)
+    backend = criar_backend('journal', str(tmp_path))
+    importar_csv_legado(str(arquivo), backend)
+    backend.apos_gravar()
+
+    assert importar_csv_legado(str(arquivo), backend) == (0, 1, 3)
+
+    # o csv da ferramenta antiga só cresce no fim: só a linha nova entra
+    _gravar_csv(arquivo, LINHAS + [['Pintura', 'Bruno', 'Setup', '2024-05-04 08:00:00', '2024-05-04 08:10:00', '10']])
+    assert importar_csv_legado(str(arquivo), backend) == (1, 1, 3)
+    backend.apos_gravar()
+    assert len(list(backend.iterar())) == 4
+
+
+def test_cli_importar_csv_duas_vezes_e_arquivo_inexistente(tmp_path, capsys):
+    arquivo = tmp_path / 'paradas.csv'
+    _gravar_csv(arquivo, LINHAS)
+    base = ['--diretorio', str(tmp_path / 'dados'), '--armazenamento', 'journal']
+
+    assert paradas_cli.main(base + ['importar-csv', str(arquivo)]) == 0
+    assert paradas_cli.main(base + ['importar-csv', str(arquivo)]) == 0
+    assert "0 paradas importadas, 3 já estavam no histórico" in capsys.readouterr().out
+    with open(tmp_path / 'dados' / 'paradas.jsonl', encoding='utf-8') as f:
+        assert len(f.readlines()) == 3
+
+    assert paradas_cli.main(base + ['importar-csv', str(tmp_path / 'nao_existe.csv')]) == 2
+    assert capsys.readouterr().err.startswith("erro:")
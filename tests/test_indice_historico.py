@@ -0,0 +1,77 @@
+import os
+
+from armazenamento import JournalHistorico
+from indice_historico import SUFIXO_DELTA, IndiceHistorico, ler_registros
+
+
+def _journal(pasta):
+    return JournalHistorico(str(pasta / 'paradas.jsonl'))
+
+
+def _indice(pasta, journal):
+    return IndiceHistorico(str(pasta / 'paradas.indice.bin'), journal)
+
+
+def _ids(indice, **filtros):
+    indice.atualizar()
+    return sorted(r['id'] for r in ler_registros(indice.journal, indice.offsets_de(indice.consultar(**filtros))))
+
+
+def _encher(journal, indice, novo_registro):
+    # primeira atualização grava o índice completo; as seguintes, segmentos no .delta
+    pintura = []
+    for lote in range(3):
+        registros = [novo_registro(processo='Pintura' if i % 2 else 'Raku-Raku', data=f'2024-05-0{lote + 1}')
+                     for i in range(4)]
+        journal.anexar_varios(registros)
+        indice.atualizar()
+        pintura += [r['id'] for r in registros if r['processo'] == 'Pintura']
+    return sorted(pintura)
+
+
+def test_delta_truncado_e_reindexado_do_journal(tmp_path, novo_registro):
+    journal = _journal(tmp_path)
+    pintura = _encher(journal, _indice(tmp_path, journal), novo_registro)
+    delta = str(tmp_path / 'paradas.indice.bin') + SUFIXO_DELTA
+    tamanho = os.path.getsize(delta)
+    with open(delta, 'r+b') as f:
+        f.truncate(tamanho - 10)  # queda de energia no meio do último segmento
+
+    reaberto = _indice(tmp_path, journal)
+    assert os.path.getsize(delta) < tamanho - 10  # o segmento incompleto foi descartado
+    assert reaberto.indexado < journal.tamanho()
+    assert _ids(reaberto, processo='Pintura') == pintura
+    assert _ids(reaberto, data_inicial='2024-05-03') == sorted(r['id'] for r in journal.iterar()
+                                                                  if r['data'] == '2024-05-03')
+    assert reaberto.indexado == journal.tamanho()
+
+
+def test_indice_truncado_e_refeito(tmp_path, novo_registro):
+    journal = _journal(tmp_path)
+    indice = _indice(tmp_path, journal)
+    pintura = _encher(journal, indice, novo_registro)
+    indice.salvar()
+    with open(indice.caminho, 'r+b') as f:
+        f.truncate(os.path.getsize(indice.caminho) // 2)
+
+    reaberto = _indice(tmp_path, journal)
+    assert reaberto.indexado == 0
+    assert _ids(reaberto, processo='Pintura') == pintura
+    assert len(reaberto.offsets) == 12
+
+
+def test_journal_substituido_refaz_o_indice(tmp_path, novo_registro):
+    journal = _journal(tmp_path)
+    indice = _indice(tmp_path, journal)
+    _encher(journal, indice, novo_registro)
+
+    # outro arquivo no lugar (restaurado de backup, consolidado): maior, com outras linhas
+    os.remove(journal.caminho)
+    novos = [novo_registro(processo='Solda') for _ in range(20)]
+    journal.anexar_varios(novos)
+    assert journal.tamanho() > indice.indexado
+
+    reaberto = _indice(tmp_path, journal)
+    assert _ids(reaberto, processo='Pintura') == []
+    assert _ids(reaberto, processo='Solda') == sorted(r['id'] for r in novos)
+    assert len(reaberto.offsets) == 20
@@ -0,0 +1,94 @@
+import os
+from datetime import datetime
+
+from backends_historico import BackendMensal
+
+
+def _ids(backend):
+    return sorted(r['id'] for r in backend.iterar())
+
+
+def _mensal(pasta, retencao_meses=0):
+    return BackendMensal(str(pasta), carencia_dias=2, retencao_meses=retencao_meses)
+
+
+def test_gravar_nao_fecha_o_mes(tmp_path, novo_registro):
+    backend = _mensal(tmp_path)
+    backend.anexar_varios([novo_registro(data='2020-01-10')])
+    backend.apos_gravar()
+    assert backend._fechadas() == {}
+    assert os.path.exists(os.path.join(backend.pasta, 'paradas-2020-01.jsonl'))
+
+
+def test_fecha_mes_depois_da_carencia_e_mantem_totais(tmp_path, novo_registro):
+    backend = _mensal(tmp_path)
+    registros = [novo_registro(data='2024-05-02'), novo_registro(data='2024-05-20', processo='Pintura'),
+                 novo_registro(data='2024-06-01')]
+    backend.anexar_varios(registros)
+    backend.apos_gravar()
+    totais = backend.totais()
+
+    assert backend.arquivar(agora=datetime(2024, 6, 2)) == ([], [])  # ainda na carência
+    assert backend.arquivar(agora=datetime(2024, 6, 3)) == (['2024-05'], [])
+    journal = os.path.join(backend.pasta, 'paradas-2024-05.jsonl')
+    # fora das consultas já, mas o journal só é apagado depois que a tela trocou as páginas
+    assert os.path.exists(journal)
+    assert _ids(backend) == sorted(r['id'] for r in registros)
+    assert backend.totais() == totais
+    assert backend._fechadas()['2024-05']['linhas'] == 2
+
+    backend.liberar_fechadas()
+    assert not os.path.exists(journal)
+    assert _ids(_mensal(tmp_path)) == sorted(r['id'] for r in registros)
+
+
+def test_parada_atrasada_reabre_o_mes_sem_duplicar(tmp_path, novo_registro):
+    backend = _mensal(tmp_path)
+    primeira = novo_registro(data='2024-05-02')
+    backend.anexar_varios([primeira])
+    backend.apos_gravar()
+    backend.arquivar(agora=datetime(2024, 7, 1))
+
+    atrasada = novo_registro(data='2024-05-31')
+    backend.anexar_varios([atrasada])  # antes de liberar_fechadas: o journal antigo some primeiro
+    backend.apos_gravar()
+    assert _ids(backend) == sorted([primeira['id'], atrasada['id']])
+
+    assert backend.arquivar(agora=datetime(2024, 7, 1)) == (['2024-05'], [])
+    backend.liberar_fechadas()
+    assert _ids(backend) == sorted([primeira['id'], atrasada['id']])
+    assert backend._fechadas()['2024-05']['linhas'] == 2
+    assert backend.totais()[2] == 10.0
+
+
+def test_fechamento_interrompido_nao_duplica(tmp_path, novo_registro):
+    backend = _mensal(tmp_path)
+    registro = novo_registro(data='2024-05-02')
+    backend.anexar_varios([registro])
+    backend.apos_gravar()
+    backend.arquivar(agora=datetime(2024, 7, 1))  # fechou, mas o journal não chegou a ser apagado
+
+    reaberto = _mensal(tmp_path)
+    assert reaberto.arquivar(agora=datetime(2024, 7, 1)) == (['2024-05'], [])
+    reaberto.liberar_fechadas()
+    assert _ids(reaberto) == [registro['id']]
+    assert reaberto._fechadas()['2024-05']['linhas'] == 1
+
+
+def test_retencao_descarta_meses_antigos(tmp_path, novo_registro):
+    backend = _mensal(tmp_path, retencao_meses=2)
+    antigo = novo_registro(data='2024-01-15')
+    recente = novo_registro(data='2024-04-15')
+    backend.anexar_varios([antigo, recente])
+    backend.apos_gravar()
+
+    fechados, descartados = backend.arquivar(agora=datetime(2024, 5, 10))
+    assert fechados == ['2024-01', '2024-04']
+    assert descartados == ['2024-01']
+    assert _ids(backend) == [recente['id']]
+    arquivo_antigo = os.path.join(backend.pasta, 'paradas-2024-01.jsonl.gz')
+    assert os.path.exists(arquivo_antigo)  # ainda lido por páginas abertas até liberar_fechadas
+
+    backend.liberar_fechadas()
+    assert not os.path.exists(arquivo_antigo)
+    assert sorted(os.listdir(backend.pasta)) == ['paradas-2024-04.jsonl.gz', 'particoes.json']
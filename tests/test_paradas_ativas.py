@@ -0,0 +1,108 @@
+import types
+
+from armazenamento import GravadorEmSegundoPlano, ParadasAtivasWAL
+from backends_historico import BackendPlanilha, criar_backend
+from sistemaP import AplicativoMobile
+
+
+def _wal(pasta):
+    return ParadasAtivasWAL(str(pasta / 'ativas.json'), str(pasta / 'ativas.wal'), limite_compactacao=3)
+
+
+def _parada(id_parada):
+    return {'id': id_parada, 'funcionario': 'Ana', 'processo': 'Raku-Raku', 'motivo': 'Falta de bandeja',
+            'inicio': '2024-05-02 10:00:00', 'fim': None, 'duracao': None}
+
+
+def _reenviar(backend, registro_ativas, pendentes):
+    # só o que reenviar_paradas_pendentes usa da janela, sem criar o Tk
+    gravador = GravadorEmSegundoPlano(intervalo=0)
+    gravador.iniciar()
+    app = types.SimpleNamespace(backend=backend, registro_ativas=registro_ativas, gravador=gravador,
+                                finalizadas_pendentes=pendentes)
+    for nome in ('reenviar_paradas_pendentes', '_confirmacao_historico', 'salvar_paradas_ativas',
+                 '_paradas_ativas_gravadas'):
+        setattr(app, nome, types.MethodType(getattr(AplicativoMobile, nome), app))
+    app.reenviar_paradas_pendentes()
+    gravador.encerrar()
+    gravador.processar_confirmacoes()
+
+
+def test_replay_do_log_recupera_ativas_e_fins_pendentes(tmp_path, novo_registro):
+    wal = _wal(tmp_path)
+    wal.carregar()
+    wal.iniciar(_parada('a'))
+    wal.iniciar(_parada('b'))
+    registro = novo_registro(id='a')
+    wal.finalizar('a', registro)
+
+    ativas, pendentes = _wal(tmp_path).carregar()
+    assert [p['id'] for p in ativas] == ['b']
+    assert pendentes == [registro]
+
+
+def test_replay_descarta_linha_incompleta(tmp_path):
+    wal = _wal(tmp_path)
+    wal.carregar()
+    wal.iniciar(_parada('a'))
+    with open(wal.arquivo_log, 'ab') as f:
+        f.write(b'{"op": "inicio", "parada": {"id": "b"')  # queda no meio da gravação
+
+    novo = _wal(tmp_path)
+    ativas, _ = novo.carregar()
+    assert [p['id'] for p in ativas] == ['a']
+    novo.iniciar(_parada('c'))
+    ativas, _ = _wal(tmp_path).carregar()
+    assert [p['id'] for p in ativas] == ['a', 'c']
+
+
+def test_compactacao_mantem_so_ativas_e_fins_nao_confirmados(tmp_path, novo_registro):
+    wal = _wal(tmp_path)
+    wal.carregar()
+    for id_parada in 'abc':
+        wal.iniciar(_parada(id_parada))
+    wal.finalizar('a', novo_registro(id='a'))
+    wal.finalizar('b', novo_registro(id='b'))
+    wal.confirmar('a')
+    assert wal.precisa_compactar()
+    wal.compactar()
+
+    with open(wal.arquivo_log, 'rb') as f:
+        assert len(f.readlines()) == 1
+    ativas, pendentes = _wal(tmp_path).carregar()
+    assert [p['id'] for p in ativas] == ['c']
+    assert [r['id'] for r in pendentes] == ['b']
+
+
+def test_fim_pendente_ja_gravado_na_planilha_nao_duplica(tmp_path, novo_registro):
+    backend = BackendPlanilha(str(tmp_path))
+    wal = _wal(tmp_path)
+    wal.carregar()
+    registro = novo_registro()  # ids reais são uuid4: a planilha os guarda em binário na tabela
+    wal.iniciar(_parada(registro['id']))
+    wal.finalizar(registro['id'], registro)
+    backend.anexar_varios([registro])  # gravado, mas a confirmação não chegou antes da queda
+
+    registro_ativas = _wal(tmp_path)
+    _, pendentes = registro_ativas.carregar()
+    _reenviar(backend, registro_ativas, pendentes)
+
+    assert len(list(BackendPlanilha(str(tmp_path)).iterar())) == 1
+    assert _wal(tmp_path).carregar()[1] == []
+
+
+def test_fim_pendente_nao_gravado_vai_para_o_historico(tmp_path, novo_registro):
+    backend = criar_backend('journal', str(tmp_path))
+    wal = _wal(tmp_path)
+    wal.carregar()
+    wal.iniciar(_parada('a'))
+    wal.finalizar('a', novo_registro(id='a'))
+
+    registro_ativas = _wal(tmp_path)
+    _, pendentes = registro_ativas.carregar()
+    _reenviar(backend, registro_ativas, pendentes)
+
+    assert [r['id'] for r in backend.iterar()] == ['a']
+    # a confirmação chega depois da compactação do reenvio: o fim sai do log na próxima
+    registro_ativas.compactar()
+    assert _wal(tmp_path).carregar()[1] == []
@@ -0,0 +1,51 @@
+import os
+
+from armazenamento import JournalHistorico, RollupsHistorico
+
+
+def _rollups(pasta):
+    journal = JournalHistorico(str(pasta / 'paradas.jsonl'))
+    return RollupsHistorico(str(pasta / 'paradas.rollups.json'), journal)
+
+
+def test_atualizar_so_le_o_que_foi_anexado(tmp_path, novo_registro):
+    rollups = _rollups(tmp_path)
+    rollups.journal.anexar_varios([novo_registro(), novo_registro(processo='Pintura', duracao=2.5)])
+    assert rollups.atualizar()
+    assert not rollups.atualizar()
+    rollups.journal.anexar_varios([novo_registro(duracao=1.0)])
+    assert rollups.atualizar()
+
+    reaberto = _rollups(tmp_path)
+    assert reaberto.totais_processos() == {'Raku-Raku': 6.0, 'Pintura': 2.5}
+    assert reaberto.contagem_motivos() == {'Falta de bandeja': 3}
+    assert reaberto.offset == reaberto.journal.tamanho()
+
+
+def test_arquivo_de_rollups_truncado_e_refeito(tmp_path, novo_registro):
+    rollups = _rollups(tmp_path)
+    rollups.journal.anexar_varios([novo_registro(), novo_registro()])
+    rollups.atualizar()
+    with open(rollups.caminho, 'r+b') as f:
+        f.truncate(os.path.getsize(rollups.caminho) // 2)
+
+    reaberto = _rollups(tmp_path)
+    assert reaberto.offset == 0
+    reaberto.atualizar()
+    assert reaberto.totais_processos() == {'Raku-Raku': 10.0}
+
+
+def test_journal_substituido_refaz_os_totais(tmp_path, novo_registro):
+    rollups = _rollups(tmp_path)
+    rollups.journal.anexar_varios([novo_registro(processo='Pintura')])
+    rollups.atualizar()
+
+    # outro journal no lugar, maior que o offset já processado
+    os.remove(rollups.journal.caminho)
+    rollups.journal.anexar_varios([novo_registro(processo='Solda') for _ in range(5)])
+    assert rollups.journal.tamanho() > rollups.offset
+
+    reaberto = _rollups(tmp_path)
+    assert reaberto.atualizar()
+    assert reaberto.totais_processos() == {'Solda': 25.0}
+    assert reaberto.linhas == 5